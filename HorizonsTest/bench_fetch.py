@@ -0,0 +1,34 @@
+import time
+from sagan.fetch import fetch_many
+from sagan.horizons import fetch_horizons_data
+from sagan.stubserver import StubHorizonsServer
+
+# Wall-clock comparison of serial fetching (one new connection per body, as
+# query.py did) against the pooled concurrent fetcher, served by the local
+# stub so it runs offline. latency stands in for the Horizons round trip.
+def main():
+    latency = 0.1
+    max_workers = 16
+
+    with StubHorizonsServer(latency=latency) as stub:
+        print(f"{'bodies':>8}{'serial [s]':>12}{'pooled [s]':>12}{'speedup':>10}")
+        for n_bodies in (9, 100):
+            objects = {str(100 + i): ('2023-01-01', '2024-01-01') for i in range(n_bodies)}
+            # Warm the stub's response cache so both runs measure transfer only
+            stub.latency = 0.0
+            fetch_many(objects, max_workers=max_workers, url=stub.url)
+            stub.latency = latency
+
+            start = time.perf_counter()
+            serial = {obj_id: fetch_horizons_data(obj_id, s, e, url=stub.url) for obj_id, (s, e) in objects.items()}
+            serial_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pooled = fetch_many(objects, max_workers=max_workers, url=stub.url)
+            pooled_time = time.perf_counter() - start
+
+            assert pooled == serial
+            print(f"{n_bodies:>8}{serial_time:>12.2f}{pooled_time:>12.2f}{serial_time / pooled_time:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
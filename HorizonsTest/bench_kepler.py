@@ -0,0 +1,38 @@
+import time
+import numpy as np
+from sagan.kepler import solve_kepler, solve_kepler_batch
+
+# Timing comparison between the scalar solve_kepler loop used by
+# the original orbit.py and the batched solver, on the same mean anomalies
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    num_points = 500
+    tol = 1e-6
+    M = np.linspace(0, 2 * np.pi, num_points)
+
+    cases = {
+        'Venus (e=0.0068)': np.array([0.00677672]),
+        'Mercury (e=0.2056)': np.array([0.20563593]),
+        '8 planets': np.array([0.20563593, 0.00677672, 0.09339410, 0.04838624,
+                               0.05386179, 0.04725744, 0.00859048, 0.01671123]),
+        '1000 bodies, e in [0, 0.95]': np.random.default_rng(0).uniform(0, 0.95, 1000),
+    }
+
+    print(f"{'case':<30}{'samples':>10}{'loop [s]':>12}{'batch [s]':>12}{'speedup':>10}{'max |dE|':>12}")
+    for name, e in cases.items():
+        loop_time, E_loop = best_of(lambda: np.array([[solve_kepler(m, ei, tol) for m in M] for ei in e]), repeat=1)
+        batch_time, E_batch = best_of(lambda: solve_kepler_batch(M[None, :], e[:, None], tol))
+        max_diff = np.max(np.abs(E_loop - E_batch))
+        print(f"{name:<30}{E_batch.size:>10}{loop_time:>12.4f}{batch_time:>12.4f}{loop_time / batch_time:>9.1f}x{max_diff:>12.2e}")
+        assert max_diff < tol, name
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
 # Position data for Earth at different times
@@ -73,30 +72,36 @@ Z_mercury = mercury_positions[:, 2]
 # Sun position (at the center of the Solar System Barycenter)
 sun_position = np.array([0, 0, 0])
 
-# Plotting
-fig = plt.figure()
-ax = fig.add_subplot(111, projection='3d')
+def main():
+    import matplotlib.pyplot as plt
 
-# Plot Sun
-ax.scatter(sun_position[0], sun_position[1], sun_position[2], color='yellow', s=100, label='Sun')
+    # Plotting
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
 
-# Plot Earth's orbit
-ax.plot(X_earth, Y_earth, Z_earth, color='blue', label='Earth Orbit')
-ax.scatter(X_earth, Y_earth, Z_earth, color='blue', s=20)  # Plot each point on the orbit
+    # Plot Sun
+    ax.scatter(sun_position[0], sun_position[1], sun_position[2], color='yellow', s=100, label='Sun')
 
-# Plot Mars' orbit
-ax.plot(X_mars, Y_mars, Z_mars, color='red', label='Mars Orbit')
-ax.scatter(X_mars, Y_mars, Z_mars, color='red', s=20)  # Plot each point on the orbit
+    # Plot Earth's orbit
+    ax.plot(X_earth, Y_earth, Z_earth, color='blue', label='Earth Orbit')
+    ax.scatter(X_earth, Y_earth, Z_earth, color='blue', s=20)  # Plot each point on the orbit
 
-# Plot Mercury's orbit
-ax.plot(X_mercury, Y_mercury, Z_mercury, color='orange', label='Mercury Orbit')
-ax.scatter(X_mercury, Y_mercury, Z_mercury, color='orange', s=20)  # Plot each point on the orbit
+    # Plot Mars' orbit
+    ax.plot(X_mars, Y_mars, Z_mars, color='red', label='Mars Orbit')
+    ax.scatter(X_mars, Y_mars, Z_mars, color='red', s=20)  # Plot each point on the orbit
 
-# Labeling the plot
-ax.set_xlabel('X (km)')
-ax.set_ylabel('Y (km)')
-ax.set_zlabel('Z (km)')
-ax.set_title('Mercury, Earth, and Mars Orbits Around the Sun')
-ax.legend()
+    # Plot Mercury's orbit
+    ax.plot(X_mercury, Y_mercury, Z_mercury, color='orange', label='Mercury Orbit')
+    ax.scatter(X_mercury, Y_mercury, Z_mercury, color='orange', s=20)  # Plot each point on the orbit
 
-plt.show()
+    # Labeling the plot
+    ax.set_xlabel('X (km)')
+    ax.set_ylabel('Y (km)')
+    ax.set_zlabel('Z (km)')
+    ax.set_title('Mercury, Earth, and Mars Orbits Around the Sun')
+    ax.legend()
+
+    plt.show()
+
+if __name__ == '__main__':
+    main()
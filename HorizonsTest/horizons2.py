@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
 # Position data
@@ -39,30 +38,36 @@ mercury_position = np.array([mercury_data['X'], mercury_data['Y'], mercury_data[
 venus_position = np.array([venus_data['X'], venus_data['Y'], venus_data['Z']])
 sun_position = np.array([sun_data['X'], sun_data['Y'], sun_data['Z']])
 
-# Plotting
-fig = plt.figure()
-ax = fig.add_subplot(111, projection='3d')
+def main():
+    import matplotlib.pyplot as plt
 
-# Plot Sun
-ax.scatter(sun_position[0], sun_position[1], sun_position[2], color='yellow', s=100, label='Sun')
+    # Plotting
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
 
-# Plot Mars
-ax.scatter(mars_position[0], mars_position[1], mars_position[2], color='red', s=50, label='Mars')
+    # Plot Sun
+    ax.scatter(sun_position[0], sun_position[1], sun_position[2], color='yellow', s=100, label='Sun')
 
-# Plot Earth
-ax.scatter(earth_position[0], earth_position[1], earth_position[2], color='blue', s=50, label='Earth')
+    # Plot Mars
+    ax.scatter(mars_position[0], mars_position[1], mars_position[2], color='red', s=50, label='Mars')
 
-# Plot Mercury
-ax.scatter(mercury_position[0], mercury_position[1], mercury_position[2], color='gray', s=50, label='Mercury')
+    # Plot Earth
+    ax.scatter(earth_position[0], earth_position[1], earth_position[2], color='blue', s=50, label='Earth')
 
-# Plot Venus
-ax.scatter(venus_position[0], venus_position[1], venus_position[2], color='orange', s=50, label='Venus')
+    # Plot Mercury
+    ax.scatter(mercury_position[0], mercury_position[1], mercury_position[2], color='gray', s=50, label='Mercury')
 
-# Labeling the plot
-ax.set_xlabel('X (km)')
-ax.set_ylabel('Y (km)')
-ax.set_zlabel('Z (km)')
-ax.set_title('Position of Sun, Mercury, Venus, Earth, and Mars')
-ax.legend()
+    # Plot Venus
+    ax.scatter(venus_position[0], venus_position[1], venus_position[2], color='orange', s=50, label='Venus')
 
-plt.show()
+    # Labeling the plot
+    ax.set_xlabel('X (km)')
+    ax.set_ylabel('Y (km)')
+    ax.set_zlabel('Z (km)')
+    ax.set_title('Position of Sun, Mercury, Venus, Earth, and Mars')
+    ax.legend()
+
+    plt.show()
+
+if __name__ == '__main__':
+    main()
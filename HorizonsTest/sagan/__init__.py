@@ -0,0 +1,51 @@
+# space-sagan: ephemeris fetching, parsing, storage and orbit computation
+# for the Unity scene's PlanetData.
+#
+#   import sagan
+#   E = sagan.solve_kepler_batch(M, e)
+#   dates, positions = sagan.load_planet_data(path)
+#
+# Names below are imported from their modules on first access, so
+# `import sagan` costs nothing and a compute-only worker loads numpy and
+# the modules it touches, never requests or matplotlib. Command line:
+# python -m sagan --help.
+
+_EXPORTS = {
+    'sagan.kepler': ('solve_kepler', 'solve_kepler_batch'),
+    'sagan.orbits': ('AU_KM', 'ELEMENT_DTYPE', 'PLANET_ELEMENTS', 'PLANET_NAMES', 'PLANET_RATES',
+                     'orbit_positions', 'propagate'),
+    'sagan.sampling': ('adaptive_orbit_positions', 'pixel_tolerance'),
+    'sagan.dates': ('DateIndex', 'format_query_time', 'parse_horizons_dates', 'to_jd'),
+    'sagan.horizons': ('fetch_horizons_data', 'horizons_params', 'stream_horizons_vectors'),
+    'sagan.fetch': ('fetch_many', 'iter_fetch', 'make_session'),
+    'sagan.cache': ('ResponseCache',),
+    'sagan.parse': ('VectorTable', 'parse_vector_stream', 'parse_vector_text'),
+    'sagan.planetdata': ('SCALE_SPACE', 'load_planet_data', 'read_positions_jd', 'read_positions_txt',
+                         'write_positions_txt'),
+    'sagan.dataset': ('BodyTrack', 'PlanetDataset'),
+    'sagan.ephemstore': ('EphemerisStore', 'convert_dataset'),
+    'sagan.blockstore': ('BlockStore', 'convert_dataset_blocks', 'open_store', 'write_blocks'),
+    'sagan.interp': ('HermiteEphemeris',),
+    'sagan.frames': ('ECLIPTIC', 'EQUATORIAL', 'dataset_frame', 'plane_rotation', 'recenter', 'ref_plane', 'rotate',
+                     'transform'),
+    'sagan.observer': ('SITE_DTYPE', 'earth_site_offsets', 'iter_observations', 'make_sites', 'observe_dataset',
+                       'observer_vectors', 'read_sites'),
+    'sagan.approach': ('close_approaches', 'conjunctions'),
+    'sagan.spatial': ('SpatialIndex', 'frustum_planes'),
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module 'sagan' has no attribute '{name}'")
+    import importlib
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,47 @@
+import importlib
+import sys
+
+# python -m sagan <command> [options]
+#
+# Each command is the main() of one module, imported only when it runs.
+# Commands marked True hand their own name on to a main() that has
+# subcommands of its own.
+COMMANDS = {
+    'build': ('sagan.build', True, "fetch a new PlanetData folder from Horizons"),
+    'update': ('sagan.build', True, "append the missing tail to a PlanetData folder"),
+    'verify': ('sagan.build', True, "check a PlanetData folder against its manifest"),
+    'store': ('sagan.ephemstore', False, "convert a PlanetData folder to a binary store"),
+    'pack': ('sagan.blockstore', False, "pack a PlanetData folder into a compressed blocks file"),
+    'lod': ('sagan.lod', False, "build and save the LOD pyramid of a PlanetData folder"),
+    'pyramid': ('sagan.pyramid', False, "build and save the temporal pyramids of a PlanetData folder"),
+    'bake': ('sagan.bake', False, "bake frame-aligned float32 tracks for the viewer"),
+    'bench': ('sagan.bench', False, "run the offline benchmarks"),
+    'query': ('sagan.plots', True, "fetch vector tables and scatter them"),
+    'orbits': ('sagan.plots', True, "plot planet orbits from Keplerian elements"),
+    'dataset': ('sagan.plots', True, "plot the tracks of a PlanetData folder"),
+    'render': ('sagan.render', False, "render animation frames of a PlanetData folder to images"),
+    'frame': ('sagan.frames', False, "write a PlanetData folder recentred or on the ecliptic"),
+    'observe': ('sagan.observer', False, "ranges and vectors of bodies from many Earth sites"),
+    'approach': ('sagan.approach', False, "find close approaches and conjunctions between bodies"),
+}
+
+def usage():
+    lines = ["usage: python -m sagan <command> [options]", "", "commands:"]
+    lines += [f"  {name:<10}{help}" for name, (_, _, help) in COMMANDS.items()]
+    lines += ["", "python -m sagan <command> --help shows the options of a command"]
+    return "\n".join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+    if argv[0] not in COMMANDS:
+        print(f"unknown command '{argv[0]}'\n\n{usage()}", file=sys.stderr)
+        return 2
+    module, keep_name, _ = COMMANDS[argv[0]]
+    command_main = importlib.import_module(module).main
+    return command_main(argv if keep_name else argv[1:]) or 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
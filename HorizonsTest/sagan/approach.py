@@ -0,0 +1,257 @@
+import argparse
+from itertools import combinations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from sagan import instrument
+from sagan.dates import format_query_time
+from sagan.interp import HermiteEphemeris
+from sagan.planetdata import SCALE_SPACE
+from sagan.pyramid import SUN_ID
+
+# Close approaches and heliocentric conjunctions between every pair of
+# bodies of a dataset.
+#
+# The range is scanned in time chunks (memory stays bounded whatever its
+# length), each cut into blocks of block samples. A coarse pass bounds
+# every body within every block by a sphere (for distances) or a cone of
+# directions from the Sun (for conjunctions) and drops each (pair, block)
+# whose bound already stays beyond the limit; for 36 planet pairs that
+# leaves a few percent of the blocks. Surviving blocks are searched for
+# sampled local minima, and each minimum is refined to the minimum of the
+# Hermite interpolant by bisection on the sign of its time derivative.
+# Every step is vectorized over pairs, blocks and candidates; pairs are
+# processed pair_chunk at a time so thousands of bodies fit as well.
+
+EVENT_DTYPE = np.dtype([('body_a', 'U16'), ('body_b', 'U16'), ('jd', 'f8'), ('value', 'f8')])
+
+# Iterations of the bisection; brackets are two samples wide, so 40 gives
+# well under a millisecond for daily data
+REFINE_ITERATIONS = 40
+
+# Closeness of two bodies, in a form the coarse pass can bound and the
+# refinement can differentiate. Values grow with separation.
+class _Distance:
+    def __init__(self, scale):
+        self.scale = scale
+
+    def prepare(self, positions, center):
+        return positions
+
+    def bounds(self, windows):
+        # windows: (B, blocks, 3, K + 2) -> sphere centres, radii and largest
+        # step between consecutive samples
+        centre = 0.5 * (windows.min(axis=3) + windows.max(axis=3))
+        radius = np.linalg.norm(windows - centre[..., None], axis=2).max(axis=2)
+        step = np.linalg.norm(np.diff(windows, axis=3), axis=2).max(axis=2)
+        return centre, radius, step
+
+    def lower_bound(self, centre_a, centre_b, radius_a, radius_b):
+        return np.linalg.norm(centre_a - centre_b, axis=-1) - radius_a - radius_b
+
+    def value(self, a, b):
+        return np.linalg.norm(a - b, axis=-1)
+
+    # Sign of the derivative of value at t, for pairs (a, b) of ephemeris rows
+    def slope(self, ephemeris, t, a, b, center):
+        delta = ephemeris(t, a) - ephemeris(t, b)
+        return np.einsum('...i,...i->...', delta, ephemeris.velocity(t, a) - ephemeris.velocity(t, b))
+
+    def at(self, ephemeris, t, a, b, center):
+        return self.value(ephemeris(t, a), ephemeris(t, b))
+
+    def report(self, value):
+        return value * self.scale
+
+# Angle between two bodies as seen from center, in radians. Samples are
+# turned into unit directions, so the bounds are cones.
+class _Separation:
+    # The center's own row comes out as NaN; no pair uses it
+    def prepare(self, positions, center):
+        directions = positions - center[None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return directions / np.linalg.norm(directions, axis=-1, keepdims=True)
+
+    def bounds(self, windows):
+        axis = windows.mean(axis=3)
+        axis /= np.maximum(np.linalg.norm(axis, axis=2, keepdims=True), 1e-300)
+        cosine = np.einsum('bkiw,bki->bkw', windows, axis)
+        radius = np.arccos(np.clip(cosine, -1.0, 1.0)).max(axis=2)
+        steps = np.einsum('bkiw,bkiw->bkw', windows[..., 1:], windows[..., :-1])
+        step = np.arccos(np.clip(steps, -1.0, 1.0)).max(axis=2)
+        return axis, radius, step
+
+    def lower_bound(self, axis_a, axis_b, radius_a, radius_b):
+        cosine = np.einsum('...i,...i->...', axis_a, axis_b)
+        return np.arccos(np.clip(cosine, -1.0, 1.0)) - radius_a - radius_b
+
+    def value(self, a, b):
+        return np.arccos(np.clip(np.einsum('...i,...i->...', a, b), -1.0, 1.0))
+
+    def _vectors(self, ephemeris, t, body, center):
+        position = ephemeris(t, body) - ephemeris(t, center)
+        velocity = ephemeris.velocity(t, body) - ephemeris.velocity(t, center)
+        return position, velocity
+
+    def slope(self, ephemeris, t, a, b, center):
+        pa, va = self._vectors(ephemeris, t, a, center)
+        pb, vb = self._vectors(ephemeris, t, b, center)
+        dot = lambda x, y: np.einsum('...i,...i->...', x, y)
+        na, nb = np.linalg.norm(pa, axis=-1), np.linalg.norm(pb, axis=-1)
+        g = dot(pa, pb)
+        # d/dt of cos(angle) = g / (na nb); the angle falls where it rises
+        dcos = (dot(va, pb) + dot(pa, vb)) * na * nb - g * (dot(pa, va) * nb / na + dot(pb, vb) * na / nb)
+        return -dcos
+
+    def at(self, ephemeris, t, a, b, center):
+        pa, _ = self._vectors(ephemeris, t, a, center)
+        pb, _ = self._vectors(ephemeris, t, b, center)
+        pa = pa / np.linalg.norm(pa, axis=-1, keepdims=True)
+        pb = pb / np.linalg.norm(pb, axis=-1, keepdims=True)
+        return self.value(pa, pb)
+
+    def report(self, value):
+        return np.degrees(value)
+
+# Time of the minimum of metric inside [lo, hi] for every candidate, by
+# bisection on the slope; candidates whose bracket has no sign change keep
+# their sampled time
+def _refine(metric, ephemeris, lo, hi, a, b, center, t_sample):
+    falling = metric.slope(ephemeris, lo, a, b, center) <= 0
+    rising = metric.slope(ephemeris, hi, a, b, center) >= 0
+    bracketed = falling & rising
+    lo, hi = lo.copy(), hi.copy()
+    for _ in range(REFINE_ITERATIONS):
+        mid = 0.5 * (lo + hi)
+        down = metric.slope(ephemeris, mid, a, b, center) < 0
+        lo = np.where(down, mid, lo)
+        hi = np.where(down, hi, mid)
+    t = np.where(bracketed, 0.5 * (lo + hi), t_sample)
+    value = metric.at(ephemeris, t, a, b, center)
+    sampled = metric.at(ephemeris, t_sample, a, b, center)
+    better = value <= sampled
+    return np.where(better, t, t_sample), np.where(better, value, sampled)
+
+def _scan(jd, positions, pairs, metric, limit, center_index, block, chunk_rows, pair_chunk):
+    n = len(jd)
+    events = []
+    for c0 in range(0, n, chunk_rows):
+        c1 = min(c0 + chunk_rows, n)
+        blocks = -(-(c1 - c0) // block)
+
+        # Rows for the interpolant: the chunk plus two samples each side
+        g0, g1 = max(c0 - 2, 0), min(c1 + 2, n)
+        chunk = np.stack([np.asarray(p[g0:g1], dtype=np.float64) for p in positions])
+        ephemeris = HermiteEphemeris(jd[g0:g1], chunk)
+        center = chunk[center_index] if center_index is not None else None
+        prepared = metric.prepare(chunk, center)
+
+        # Block j's window holds its own samples c0 + j K .. c0 + j K + K - 1
+        # plus one neighbour each side (edge samples repeat at the range ends)
+        rows = np.clip(np.arange(c0 - 1, c0 + blocks * block + 1), 0, n - 1)
+        padded = prepared[:, rows - g0]
+        windows = sliding_window_view(padded, block + 2, axis=1)[:, ::block]
+        centre, radius, step = metric.bounds(windows)
+        # Unclipped sample number of every window position
+        owned = sliding_window_view(np.arange(c0 - 1, c0 + blocks * block + 1), block + 2)[::block]
+
+        for p0 in range(0, len(pairs), pair_chunk):
+            a, b = pairs[p0:p0 + pair_chunk, 0], pairs[p0:p0 + pair_chunk, 1]
+            # A minimum between samples can undercut them by half a step of each
+            slack = 0.5 * (step[a] + step[b])
+            bound = metric.lower_bound(centre[a], centre[b], radius[a], radius[b])
+            pair_index, block_index = np.nonzero(bound - slack <= limit)
+            if len(pair_index) == 0:
+                continue
+
+            ia, ib = a[pair_index], b[pair_index]
+            values = metric.value(np.moveaxis(windows[ia, block_index], 1, 2), np.moveaxis(windows[ib, block_index], 1, 2))
+            inner = values[:, 1:-1]
+            is_min = (inner <= values[:, :-2]) & (inner < values[:, 2:])
+            is_min &= inner - slack[pair_index, block_index][:, None] <= limit
+            g = owned[block_index][:, 1:-1]
+            is_min &= (g > 0) & (g < n - 1) & (g < c1)
+            candidate, w = np.nonzero(is_min)
+            if len(candidate) == 0:
+                continue
+
+            sample = owned[block_index[candidate], w + 1]
+            t, value = _refine(metric, ephemeris, jd[sample - 1], jd[sample + 1], ia[candidate], ib[candidate],
+                               center_index, jd[sample])
+            keep = value <= limit
+            events.append((ia[candidate][keep], ib[candidate][keep], t[keep], value[keep]))
+    return events
+
+def _search(dataset, metric, limit, start, end, bodies, center, block, memory_bytes, pair_chunk):
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    track_bodies = list(bodies)
+    center_index = None
+    if center is not None:
+        center = str(center)
+        bodies = [body_id for body_id in bodies if body_id != center]
+        track_bodies = bodies + [center]
+        center_index = len(bodies)
+    jd, tracks = dataset.shared_tracks(track_bodies, start, end)
+    if len(jd) < 3:
+        raise ValueError("Need at least three samples in the range")
+    positions = [track.positions for track in tracks]
+
+    pairs = np.array(list(combinations(range(len(bodies)), 2)), dtype=np.intp).reshape(-1, 2)
+    # Each chunk holds positions, tangents and the prepared windows
+    chunk_rows = max(block, memory_bytes // (len(track_bodies) * 3 * 8 * 4) // block * block)
+
+    with instrument.span('approach.search', 'compute', pairs=len(pairs), rows=len(jd)) as span:
+        found = _scan(jd, positions, pairs, metric, limit, center_index, block, chunk_rows, pair_chunk)
+        events = np.empty(sum(len(t) for _, _, t, _ in found), dtype=EVENT_DTYPE)
+        if len(events):
+            names = np.array(bodies)
+            events['body_a'] = names[np.concatenate([a for a, _, _, _ in found])]
+            events['body_b'] = names[np.concatenate([b for _, b, _, _ in found])]
+            events['jd'] = np.concatenate([t for _, _, t, _ in found])
+            events['value'] = metric.report(np.concatenate([v for _, _, _, v in found]))
+            events = events[np.argsort(events['jd'], kind='stable')]
+        span.add(rows=len(events))
+    return events
+
+# Every local minimum of the distance between two bodies of a
+# PlanetDataset that comes within max_distance_km, over start..end (either
+# may be None). Returns an EVENT_DTYPE array sorted by time whose value is
+# the distance in km. scale converts file units to km.
+def close_approaches(dataset, max_distance_km, start=None, end=None, bodies=None, block=64,
+                     memory_bytes=64 * 2**20, pair_chunk=4096, scale=SCALE_SPACE):
+    return _search(dataset, _Distance(scale), max_distance_km / scale, start, end, bodies, None, block,
+                   memory_bytes, pair_chunk)
+
+# Every local minimum of the angle between two bodies as seen from center
+# (the Sun by default, or e.g. '399' for the sky seen from the Earth) that
+# comes within max_angle_deg. value is the angle in degrees.
+def conjunctions(dataset, max_angle_deg, start=None, end=None, bodies=None, center=SUN_ID, block=64,
+                 memory_bytes=64 * 2**20, pair_chunk=4096):
+    return _search(dataset, _Separation(), np.radians(max_angle_deg), start, end, bodies, center, block,
+                   memory_bytes, pair_chunk)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find close approaches or conjunctions between the bodies of a PlanetData folder")
+    parser.add_argument('data_folder')
+    limit = parser.add_mutually_exclusive_group(required=True)
+    limit.add_argument('--distance', type=float, help="report approaches within this many km")
+    limit.add_argument('--angle', type=float, help="report conjunctions within this many degrees, seen from the Sun")
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--bodies', nargs='+')
+    args = parser.parse_args(argv)
+    instrument.configure_from_env()
+
+    from sagan.dataset import PlanetDataset
+    dataset = PlanetDataset(args.data_folder)
+    if args.distance is not None:
+        events, unit = close_approaches(dataset, args.distance, args.start, args.end, args.bodies), 'km'
+    else:
+        events, unit = conjunctions(dataset, args.angle, args.start, args.end, args.bodies), 'deg'
+    for event in events:
+        print(f"{format_query_time(event['jd'])}  {event['body_a']:>8} {event['body_b']:>8}  {event['value']:.6g} {unit}")
+    print(f"{len(events)} events")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import contextlib
+import os
+import tempfile
+import threading
+
+_umask = None
+_umask_lock = threading.Lock()
+
+# The process umask, read on first use. Linux reports it in
+# /proc/self/status; elsewhere os.umask is the only way to query it, and
+# setting and restoring it is done once, under a lock, not at import.
+def _process_umask():
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            try:
+                with open('/proc/self/status') as status:
+                    _umask = next(int(line.split()[1], 8) for line in status if line.startswith('Umask:'))
+            except (OSError, StopIteration, IndexError, ValueError):
+                _umask = os.umask(0o022)
+                os.umask(_umask)
+        return _umask
+
+# Write path all at once or not at all.
+#
+#   with atomic_write(path) as file:
+#       np.savez(file, **arrays)
+#
+# The file is written to a temporary next to path and renamed over it when
+# the block exits cleanly; on any error the temporary is removed and path
+# is left untouched. The result gets the permissions a plain open() would
+# give it (0o666 & ~umask) instead of mkstemp's 0o600, since Unity and
+# other users read these files too. mode and the keyword arguments go to
+# open().
+@contextlib.contextmanager
+def atomic_write(path, mode='wb', **kwargs):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **kwargs) as file:
+            yield file
+        os.chmod(tmp_path, 0o666 & ~_process_umask())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
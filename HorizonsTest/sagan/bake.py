@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from sagan import instrument
+from sagan.atomic import atomic_write
+from sagan.dataset import PlanetDataset
+from sagan.dates import format_query_time, to_jd
+from sagan.interp import HermiteEphemeris
+
+BAKE_MANIFEST = 'bake.json'
+
+# Epoch of every frame: frames evenly spaced from start to end inclusive,
+# like AnimatePlanets stepping t from 0 to 1
+def frame_epochs(start, end, frames):
+    start_jd, end_jd = to_jd([start, end])
+    if frames < 2 or end_jd <= start_jd:
+        raise ValueError("Need at least two frames and end after start")
+    return np.linspace(start_jd, end_jd, frames)
+
+def _write_bytes(path, array):
+    with atomic_write(path) as file:
+        file.write(np.ascontiguousarray(array, dtype='<f4').tobytes())
+
+# Resample every body of a dataset to frame boundaries.
+#
+# Frame epochs outside a body's data are clipped to its first or last
+# sample, and positions (file units) are multiplied by scale. Bodies
+# sampled on the same epochs share one Hermite evaluation. Returns
+# {body_id: (frames, 3) float32 array} and the frame epochs.
+@instrument.traced('bake.bake_tracks', rows=lambda result: len(result[1]))
+def bake_tracks(dataset, start, end, frames, bodies=None, scale=1.0):
+    t = frame_epochs(start, end, frames)
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    tracks = []
+    for body_id in bodies:
+        track = dataset[body_id]
+        # Only the rows around [start, end] feed the interpolant
+        rows = track.index.range(t[0], t[-1])
+        first = max(rows.start - 2, 0)
+        last = min(rows.stop + 2, len(track))
+        tracks.append(track.between(track.jd[first], track.jd[last - 1]))
+
+    # Group bodies that share their sample epochs, all of them: tracks with
+    # the same ends and length can still differ inside. Bodies of a group
+    # are then stacked without another epoch check.
+    groups = {}
+    for track in tracks:
+        key = np.ascontiguousarray(track.jd, dtype=np.float64).tobytes()
+        groups.setdefault(key, []).append(track)
+
+    baked = {}
+    for group in groups.values():
+        ephemeris = HermiteEphemeris(group[0].jd, np.stack([track.positions for track in group]))
+        clipped = np.clip(t, group[0].jd[0], group[0].jd[-1])
+        positions = ephemeris(clipped)
+        for track, body_positions in zip(group, positions):
+            baked[track.body_id] = (body_positions * scale).astype('<f4')
+    return {body_id: baked[body_id] for body_id in bodies}, t
+
+# Write baked tracks for the viewer: <body_id>.bytes holds frames * 3
+# little-endian float32 values (x, y, z per frame, Unity axes, no header),
+# so it can be read straight into a Vector3[]; bake.json lists the frame
+# epochs and files.
+def bake_dataset(data_folder, out_folder, start, end, frames, bodies=None, scale=1.0):
+    dataset = PlanetDataset(data_folder)
+    baked, t = bake_tracks(dataset, start, end, frames, bodies, scale)
+    os.makedirs(out_folder, exist_ok=True)
+    manifest = {
+        'source': os.path.basename(os.path.normpath(data_folder)),
+        'start': format_query_time(t[0]),
+        'end': format_query_time(t[-1]),
+        'start_jd': float(t[0]),
+        'frame_days': float(t[1] - t[0]),
+        'frames': frames,
+        'scale': scale,
+        'dtype': '<f4',
+        'bodies': {},
+    }
+    for body_id, positions in baked.items():
+        filename = f"{body_id}.bytes"
+        _write_bytes(os.path.join(out_folder, filename), positions)
+        manifest['bodies'][body_id] = {'file': filename, 'shape': list(positions.shape)}
+    with open(os.path.join(out_folder, BAKE_MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+# Read a baked track back as a (frames, 3) float32 memory map
+def load_baked(out_folder, body_id):
+    with open(os.path.join(out_folder, BAKE_MANIFEST), 'r') as file:
+        manifest = json.load(file)
+    entry = manifest['bodies'][str(body_id)]
+    return np.memmap(os.path.join(out_folder, entry['file']), dtype=manifest['dtype'], mode='r', shape=tuple(entry['shape']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bake frame-aligned float32 animation tracks from a PlanetData folder")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', required=True, help="output folder for <body_id>.bytes and bake.json")
+    parser.add_argument('--start', required=True, help="first frame, e.g. 2023-01-01")
+    parser.add_argument('--end', required=True, help="last frame, e.g. 2024-01-01")
+    parser.add_argument('--frames', type=int, required=True)
+    parser.add_argument('--bodies', nargs='+')
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier applied to the file units")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    manifest = bake_dataset(args.data_folder, args.output, args.start, args.end, args.frames, args.bodies, args.scale)
+    print(f"Baked {len(manifest['bodies'])} bodies x {args.frames} frames in {time.perf_counter() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
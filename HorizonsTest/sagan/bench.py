@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+from sagan.blockstore import convert_dataset_blocks
+from sagan.dataset import PlanetDataset
+from sagan.dates import J2000_JD
+from sagan.ephemstore import convert_dataset
+from sagan.horizons import extract_ephemeris
+from sagan.kepler import solve_kepler, solve_kepler_batch
+from sagan.orbits import ELEMENT_DTYPE, orbit_positions, propagate
+from sagan.parse import parse_vector_stream, parse_vector_text
+from sagan.planetdata import horizons_to_file_units, read_positions_jd, write_positions_txt
+from sagan.spatial import SpatialIndex
+from sagan.stubserver import synthetic_state, vector_table_response
+
+# Offline benchmark suite for the orbit, parse and load hot paths.
+#
+#   python -m sagan.bench                      # small and medium scales
+#   python -m sagan.bench --scale large        # 1M rows, 100k bodies
+#   python -m sagan.bench --save base.json     # record a baseline
+#   python -m sagan.bench --compare base.json  # flag regressions, exit 1
+#
+# Every case runs on synthetic data (Horizons responses from
+# sagan.stubserver, PlanetData folders written with write_positions_txt),
+# so runs are reproducible without network access. Each case is timed
+# repeatedly for wall-clock percentiles and run once more under
+# tracemalloc for its peak Python/numpy allocation.
+
+SCALES = {
+    'small': {'rows': 367, 'bodies': 9},
+    'medium': {'rows': 60268, 'bodies': 1000},
+    'large': {'rows': 1000000, 'bodies': 100000},
+}
+
+# PlanetData folders hold the 9 bodies of the Unity scene
+FOLDER_BODIES = ('10', '199', '299', '399', '499', '599', '699', '799', '899')
+
+# Cases whose inputs grow past this are skipped at a scale: the scalar
+# Kepler loop and per-line legacy parsers would take minutes
+SLOW_LIMIT = 100000
+
+Case = namedtuple('Case', ['name', 'setup'])
+CASES = []
+
+# Register a case. setup(scale, workdir) returns (run, items, unit) where
+# run() is the timed call and items/unit describe its throughput, or None
+# to skip the case at that scale.
+def case(name):
+    def register(setup):
+        CASES.append(Case(name, setup))
+        return setup
+    return register
+
+def synthetic_elements(n, seed=0):
+    rng = np.random.default_rng(seed)
+    elements = np.empty(n, dtype=ELEMENT_DTYPE)
+    elements['a'] = rng.uniform(0.3, 40.0, n)
+    elements['e'] = rng.uniform(0.0, 0.3, n)
+    elements['I'] = rng.uniform(0.0, 10.0, n)
+    elements['L'] = rng.uniform(-180.0, 180.0, n)
+    elements['long_peri'] = rng.uniform(-180.0, 180.0, n)
+    elements['long_node'] = rng.uniform(0.0, 360.0, n)
+    return elements
+
+def _daily(rows):
+    return J2000_JD + np.arange(rows, dtype=np.float64)
+
+# Synthetic response of the current scale, shared by the parse cases
+_responses = {}
+
+def _response(scale, workdir):
+    if scale['rows'] not in _responses:
+        _responses.clear()
+        _responses[scale['rows']] = vector_table_response('399', _daily(scale['rows']))
+    return _responses[scale['rows']]
+
+def _folder(scale, workdir):
+    folder = os.path.join(workdir, f"planetdata_{scale['rows']}")
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+        jd = _daily(scale['rows'])
+        for body_id in FOLDER_BODIES:
+            pos, _ = synthetic_state(body_id, jd)
+            write_positions_txt(os.path.join(folder, f"planet_{body_id}_positions.txt"), jd, horizons_to_file_units(pos))
+    return folder
+
+# planetinfo.py's original line-by-line load_planet_data, kept as the
+# reference the new readers are measured against
+def legacy_load_planet_data(file_path):
+    dates = []
+    positions = []
+    with open(file_path, 'r') as file:
+        for line in file.readlines():
+            if line.startswith("Date") or not line.strip():
+                continue
+            parts = line.strip().split(',')
+            dates.append(parts[0].strip())
+            positions.append((float(parts[1].strip()), float(parts[2].strip()), float(parts[3].strip())))
+    return dates, np.array(positions)
+
+# The coordinate loop of query.py, without its prints
+def legacy_parse_xyz(ephemeris_text):
+    coords = []
+    for line in ephemeris_text.strip().split("\n"):
+        if line.strip().startswith("X"):
+            parts = line.replace("=-", "= -").split()
+            coords.append((float(parts[2]) / 10000, float(parts[5]) / 10000, float(parts[8]) / 10000))
+    return coords
+
+@case('kepler.scalar_loop')
+def _kepler_scalar(scale, workdir):
+    n = scale['bodies'] * 100
+    if n > SLOW_LIMIT:
+        return None
+    rng = np.random.default_rng(1)
+    M, e = rng.uniform(0, 2 * np.pi, n), rng.uniform(0, 0.3, n)
+    return (lambda: [solve_kepler(m, ei) for m, ei in zip(M, e)]), n, 'solutions'
+
+@case('kepler.batch')
+def _kepler_batch(scale, workdir):
+    n = scale['bodies'] * 100
+    rng = np.random.default_rng(1)
+    M, e = rng.uniform(0, 2 * np.pi, n), rng.uniform(0, 0.3, n)
+    return (lambda: solve_kepler_batch(M, e)), n, 'solutions'
+
+# orbit.py's original 500 points per body, capped so the output stays < 1 GB
+@case('orbit.positions')
+def _orbit_positions(scale, workdir):
+    elements = synthetic_elements(min(scale['bodies'], 20000))
+    return (lambda: orbit_positions(elements, 500)), elements.size * 500, 'points'
+
+@case('orbit.propagate')
+def _orbit_propagate(scale, workdir):
+    elements = synthetic_elements(scale['bodies'])
+    epochs = J2000_JD + np.arange(8) * 30.0
+    return (lambda: propagate(elements, epochs)), elements.size * epochs.size, 'positions'
+
+@case('parse.extract')
+def _parse_extract(scale, workdir):
+    response = _response(scale, workdir)
+    return (lambda: extract_ephemeris(response)), scale['rows'], 'rows'
+
+@case('parse.legacy_query_loop')
+def _parse_legacy(scale, workdir):
+    if scale['rows'] > SLOW_LIMIT:
+        return None
+    text = extract_ephemeris(_response(scale, workdir))
+    return (lambda: legacy_parse_xyz(text)), scale['rows'], 'rows'
+
+@case('parse.vector_text')
+def _parse_text(scale, workdir):
+    text = extract_ephemeris(_response(scale, workdir))
+    return (lambda: parse_vector_text(text)), scale['rows'], 'rows'
+
+@case('parse.vector_stream')
+def _parse_stream(scale, workdir):
+    data = _response(scale, workdir).encode()
+    chunk = 1 << 16
+    return (lambda: parse_vector_stream(data[i:i + chunk] for i in range(0, len(data), chunk))), scale['rows'], 'rows'
+
+@case('load.legacy_load_planet_data')
+def _load_legacy(scale, workdir):
+    if scale['rows'] > SLOW_LIMIT:
+        return None
+    path = os.path.join(_folder(scale, workdir), 'planet_399_positions.txt')
+    return (lambda: legacy_load_planet_data(path)), scale['rows'], 'rows'
+
+@case('load.read_positions_jd')
+def _load_txt(scale, workdir):
+    path = os.path.join(_folder(scale, workdir), 'planet_399_positions.txt')
+    return (lambda: read_positions_jd(path)), scale['rows'], 'rows'
+
+# Open a folder and touch every body's full track
+@case('load.dataset_store')
+def _load_store(scale, workdir):
+    folder = _folder(scale, workdir)
+    convert_dataset(folder)
+
+    def run():
+        dataset = PlanetDataset(folder)
+        return [float(np.sum(track.positions[:, 0])) for _, track in dataset.items()]
+    return run, scale['rows'] * len(FOLDER_BODIES), 'rows'
+
+# The same from a blocks file, which inflates every block
+@case('load.dataset_blocks')
+def _load_blocks(scale, workdir):
+    folder = _folder(scale, workdir)
+    out_path, _ = convert_dataset_blocks(folder)
+
+    def run():
+        dataset = PlanetDataset(folder, out_path)
+        return [float(np.sum(track.positions[:, 0])) for _, track in dataset.items()]
+    return run, scale['rows'] * len(FOLDER_BODIES), 'rows'
+
+# Bodies spread over orbits, as at one epoch of propagate()
+def _epoch_points(scale):
+    positions = propagate(synthetic_elements(scale['bodies']), np.array([J2000_JD]))
+    return positions.reshape(-1, 3)
+
+@case('spatial.build')
+def _spatial_build(scale, workdir):
+    points = _epoch_points(scale)
+    return (lambda: SpatialIndex(points)), len(points), 'points'
+
+# Eight nearest neighbours of every body, as label placement needs
+@case('spatial.knn')
+def _spatial_knn(scale, workdir):
+    points = _epoch_points(scale)
+    index = SpatialIndex(points)
+    return (lambda: index.knn(points, 8)), len(points), 'queries'
+
+def percentile_stats(times):
+    times = np.asarray(times)
+    return {
+        'runs': int(times.size),
+        'min': float(times.min()),
+        'p50': float(np.percentile(times, 50)),
+        'p90': float(np.percentile(times, 90)),
+        'p99': float(np.percentile(times, 99)),
+    }
+
+# Time run() until min_time seconds have passed (at least min_runs and at
+# most max_runs times), then once more under tracemalloc
+def measure(run, items, min_time=0.5, min_runs=3, max_runs=100):
+    run()  # warm up caches and lazy imports
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = percentile_stats(times)
+    result['items'] = items
+    result['throughput'] = items / result['p50']
+    result['peak_bytes'] = int(peak)
+    return result
+
+def run_suite(scales=('small', 'medium'), pattern=None, **measure_options):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='sagan-bench-') as workdir:
+        for scale_name in scales:
+            for name, setup in CASES:
+                if pattern and pattern not in name:
+                    continue
+                spec = setup(SCALES[scale_name], workdir)
+                if spec is None:
+                    continue
+                run, items, unit = spec
+                result = measure(run, items, **measure_options)
+                result['unit'] = unit
+                key = f"{scale_name}/{name}"
+                results[key] = result
+                print(f"{key:<42}{result['p50'] * 1e3:>11.2f}{result['p90'] * 1e3:>11.2f}"
+                      f"{result['throughput']:>14.3g} {unit:<10}{result['peak_bytes'] / 2**20:>10.1f}")
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def save_baseline(path, results):
+    with open(path, 'w') as file:
+        json.dump({'environment': environment(), 'results': results}, file, indent=2)
+
+# Cases whose median time or peak memory grew by more than threshold
+# (a fraction) against the baseline, as (case, metric, baseline, current)
+def compare(results, baseline, threshold=0.2):
+    regressions = []
+    for key, result in results.items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        for metric in ('p50', 'peak_bytes'):
+            if result[metric] > before[metric] * (1 + threshold):
+                regressions.append((key, metric, before[metric], result[metric]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the orbit, parse and load hot paths")
+    parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('-k', '--filter', help="only run cases whose name contains this")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds to spend timing each case")
+    parser.add_argument('--save', help="write the results to this baseline file")
+    parser.add_argument('--compare', help="baseline file to check the results against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown/growth, as a fraction")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<42}{'p50 [ms]':>11}{'p90 [ms]':>11}{'throughput':>14} {'':<10}{'peak [MB]':>10}")
+    results = run_suite(args.scale, args.filter, min_time=args.min_time)
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for key, metric, before, after in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.4g} -> {after:.4g} ({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
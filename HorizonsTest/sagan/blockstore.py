@@ -0,0 +1,330 @@
+import argparse
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from sagan import instrument
+from sagan.atomic import atomic_write
+from sagan.dates import DateIndex
+from sagan.ephemstore import MAGIC as STORE_MAGIC, EphemerisStore
+from sagan.planetdata import dataset_files, read_positions_jd
+
+# Compressed ephemeris file, one per dataset, for shipping and archiving
+# PlanetData folders:
+#
+#   magic 'SAGANBLK' | uint32 version | uint32 header length | JSON header
+#   followed by the compressed blobs.
+#
+# Each body's track is cut into fixed blocks of block_rows epochs. Positions
+# are rounded to a grid of quantum file units, by default chosen per body
+# from the digits in its txt file (see _body_quantum), and each block keeps
+# its second differences: smooth orbits leave small integers that zlib or
+# lzma pack tightly. Blocks are compressed on their
+# own, so reading a date range only inflates the blocks it touches.
+#
+# The JD column is kept exactly: float64 JDs of the same binade are linear
+# in their bit patterns, so a uniform STEP_SIZE turns into second
+# differences of zero. It is stored whole per body and decoded on open of
+# the body, which gives the row -> block lookup.
+#
+# The JSON header lists, per body, its row count, quantum, the JD blob and
+# [offset, length, dtype] of every block, offsets counted from the end of
+# the header.
+MAGIC = b'SAGANBLK'
+VERSION = 2
+PREAMBLE = struct.Struct('<8sII')
+
+BLOCKS_FILENAME = 'ephemeris.blocks'
+
+BLOCK_ROWS = 4096
+# None: a grid per body from _body_quantum
+QUANTUM = None
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+# Decoded blocks kept by a BlockStore, per store
+CACHE_BLOCKS = 64
+
+# Column-wise second differences of an integer array, first rows included
+# so that _undelta is two cumulative sums
+def _delta(values):
+    first = np.diff(values, axis=0, prepend=np.zeros_like(values[:1]))
+    return np.diff(first, axis=0, prepend=np.zeros_like(values[:1]))
+
+def _undelta(deltas):
+    return np.cumsum(np.cumsum(deltas, axis=0), axis=0)
+
+# Narrowest little-endian signed integer dtype holding values
+def _narrow(values):
+    limit = int(np.abs(values).max()) if len(values) else 0
+    for dtype in ('<i1', '<i2', '<i4'):
+        if limit <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype('<i8')
+
+def _encode_jd(jd, compress):
+    bits = np.ascontiguousarray(jd, dtype='<f8').view('<i8')
+    return compress(_delta(bits).tobytes())
+
+def _decode_jd(blob, decompress):
+    return _undelta(np.frombuffer(decompress(blob), dtype='<i8')).view('<f8')
+
+# Grid for a body's positions. The txt files give 7 significant digits, so
+# the last digit of the body's largest coordinate sits at 10**(e - 6) for
+# a magnitude of 10**e; a tenth of that keeps the rounding error under a
+# twentieth of that digit. A single fixed grid cannot do this for every
+# body: the Sun's coordinates are ~50 units with 1e-5 resolution while the
+# outer planets' are ~1e5 with resolution 0.01.
+def _body_quantum(positions):
+    limit = float(np.abs(positions).max()) if len(positions) else 0.0
+    if limit == 0.0:
+        return 1.0
+    return 10.0 ** (np.floor(np.log10(limit)) - 7)
+
+# One block of positions: rounded to the grid, second differences, stored
+# column by column (all x, then y, then z) in the narrowest integer type
+def _encode_block(positions, quantum, compress):
+    grid = np.rint(np.asarray(positions, dtype=np.float64) / quantum).astype(np.int64)
+    deltas = _delta(grid)
+    dtype = _narrow(deltas)
+    return compress(np.ascontiguousarray(deltas.T, dtype=dtype).tobytes()), dtype.str
+
+def _decode_block(blob, dtype, quantum, decompress):
+    deltas = np.frombuffer(decompress(blob), dtype=dtype).reshape(3, -1).T.astype(np.int64)
+    return _undelta(deltas) * quantum
+
+# Write {body_id: (jd, positions)} to path atomically. quantum=None picks
+# each body's grid with _body_quantum.
+def write_blocks(path, bodies, block_rows=BLOCK_ROWS, quantum=QUANTUM, codec='zlib', attrs=None):
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {sorted(CODECS)}")
+    compress, _ = CODECS[codec]
+    # Readers index the JD columns without checking their order
+    for body_id, (jd, _) in bodies.items():
+        if np.any(np.diff(jd) < 0):
+            raise ValueError(f"Body {body_id}: epochs are not sorted")
+    entries = []
+    blobs = []
+    offset = 0
+
+    def add(blob):
+        nonlocal offset
+        blobs.append(blob)
+        offset += len(blob)
+        return [offset - len(blob), len(blob)]
+
+    with instrument.span('blocks.encode', codec=codec) as span:
+        rows_total = 0
+        for body_id, (jd, positions) in bodies.items():
+            rows = len(jd)
+            body_quantum = quantum or _body_quantum(positions)
+            entry = {'id': str(body_id), 'rows': rows, 'quantum': body_quantum,
+                     'jd': add(_encode_jd(jd, compress)), 'blocks': []}
+            for start in range(0, rows, block_rows):
+                blob, dtype = _encode_block(positions[start:start + block_rows], body_quantum, compress)
+                entry['blocks'].append(add(blob) + [dtype])
+            entries.append(entry)
+            rows_total += rows
+        span.add(bytes=offset, rows=rows_total)
+
+    header = json.dumps({
+        'block_rows': block_rows,
+        'codec': codec,
+        'bodies': entries,
+        'attrs': attrs or {},
+    }).encode()
+
+    with atomic_write(path) as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+
+# Read-only view over a blocks file, with the EphemerisStore interface.
+# Opening only parses the header; a body's JD column is decoded on first
+# use, and positions() / between() inflate just the blocks covering the
+# rows asked for, keeping the last CACHE_BLOCKS of them. Arrays returned
+# are fresh copies, not views of the file.
+class BlockStore:
+    def __init__(self, path, cache_blocks=CACHE_BLOCKS):
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, header_length = PREAMBLE.unpack(file.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a blocks file")
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported blocks version {version}")
+            header = json.loads(file.read(header_length))
+
+        self.attrs = header['attrs']
+        self.block_rows = header['block_rows']
+        self.codec = header['codec']
+        self._decompress = CODECS[self.codec][1]
+        self._entries = {entry['id']: entry for entry in header['bodies']}
+        self._data_start = PREAMBLE.size + header_length
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        self._jd = {}
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+
+    @property
+    def bodies(self):
+        return list(self._entries)
+
+    def __contains__(self, body_id):
+        return str(body_id) in self._entries
+
+    def _blob(self, offset, length):
+        start = self._data_start + offset
+        return self._map[start:start + length].tobytes()
+
+    def jd(self, body_id):
+        body_id = str(body_id)
+        jd = self._jd.get(body_id)
+        if jd is None:
+            jd = _decode_jd(self._blob(*self._entries[body_id]['jd']), self._decompress)
+            jd.flags.writeable = False
+            self._jd[body_id] = jd
+        return jd
+
+    def _block(self, body_id, block):
+        key = (body_id, block)
+        positions = self._cache.get(key)
+        if positions is not None:
+            self._cache.move_to_end(key)
+            return positions
+        offset, length, dtype = self._entries[body_id]['blocks'][block]
+        quantum = self._entries[body_id]['quantum']
+        positions = _decode_block(self._blob(offset, length), dtype, quantum, self._decompress)
+        positions.flags.writeable = False
+        self._cache[key] = positions
+        if len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+        return positions
+
+    # Positions of rows start..stop (a slice of the body's rows)
+    def rows(self, body_id, start=0, stop=None):
+        body_id = str(body_id)
+        count = self._entries[body_id]['rows']
+        start, stop, _ = slice(start, stop).indices(count)
+        out = np.empty((max(stop - start, 0), 3))
+        if stop <= start:
+            return out
+        with instrument.span('blocks.decode', body=body_id) as span:
+            first, last = start // self.block_rows, (stop - 1) // self.block_rows
+            for block in range(first, last + 1):
+                block_start = block * self.block_rows
+                positions = self._block(body_id, block)
+                lo = max(start, block_start) - block_start
+                hi = min(stop, block_start + len(positions)) - block_start
+                out[block_start + lo - start:block_start + hi - start] = positions[lo:hi]
+            span.add(bytes=out.nbytes, rows=len(out))
+        return out
+
+    def positions(self, body_id):
+        return self.rows(body_id)
+
+    # Positions at the row indices rows (any shape), inflating only the
+    # blocks they fall in
+    def take(self, body_id, rows):
+        body_id = str(body_id)
+        rows = np.asarray(rows, dtype=np.intp)
+        out = np.empty(rows.shape + (3,))
+        blocks = rows // self.block_rows
+        for block in np.unique(blocks):
+            inside = blocks == block
+            out[inside] = self._block(body_id, int(block))[rows[inside] - block * self.block_rows]
+        return out
+
+    # (jd, positions) for start <= jd <= end; either bound may be None.
+    # Bounds accept anything sagan.dates.to_jd does.
+    def between(self, body_id, start=None, end=None):
+        jd = self.jd(body_id)
+        rows = DateIndex(jd, assume_sorted=True).range(start, end)
+        return jd[rows], self.rows(body_id, rows.start, rows.stop)
+
+# EphemerisStore or BlockStore, whichever path holds
+def open_store(path):
+    with open(path, 'rb') as file:
+        magic = file.read(len(MAGIC))
+    if magic == MAGIC:
+        return BlockStore(path)
+    if magic == STORE_MAGIC:
+        return EphemerisStore(path)
+    raise ValueError(f"{path} is neither an ephemeris store nor a blocks file")
+
+# Pack a PlanetData folder of planet_<id>_positions.txt files into a blocks
+# file
+def convert_dataset_blocks(data_folder, out_path=None, block_rows=BLOCK_ROWS, quantum=QUANTUM, codec='zlib'):
+    out_path = out_path or os.path.join(data_folder, BLOCKS_FILENAME)
+    bodies = {body_id: read_positions_jd(path) for body_id, path in dataset_files(data_folder).items()}
+    write_blocks(out_path, bodies, block_rows, quantum, codec,
+                 attrs={'source': os.path.basename(os.path.normpath(data_folder))})
+    return out_path, bodies
+
+# Size, error and decode speed of a blocks file against the txt files it
+# was packed from
+def report(out_path, data_folder, bodies, ranges=200, seed=0):
+    text_bytes = sum(os.path.getsize(path) for path in dataset_files(data_folder).values())
+    rows = sum(len(jd) for jd, _ in bodies.values())
+    size = os.path.getsize(out_path)
+    lines = [f"{out_path}: {size / 1e6:.2f} MB for {len(bodies)} bodies, {rows} rows",
+             f"  vs txt     {text_bytes / 1e6:.2f} MB  ratio {text_bytes / size:.1f}x",
+             f"  vs float64 {rows * 32 / 1e6:.2f} MB  ratio {rows * 32 / size:.1f}x"]
+
+    store = BlockStore(out_path, cache_blocks=0)
+    errors = {body_id: float(np.abs(store.positions(body_id) - positions).max())
+              for body_id, (_, positions) in bodies.items()}
+    worst = max(errors, key=lambda body_id: errors[body_id] / store._entries[body_id]['quantum'])
+    exact = all(np.array_equal(store.jd(body_id), jd) for body_id, (jd, _) in bodies.items())
+    lines.append(f"  max position error {max(errors.values()):.3g} file units, worst relative to its grid: body "
+                 f"{worst} {errors[worst]:.3g} (quantum {store._entries[worst]['quantum']:.0e}), "
+                 f"JD {'exact' if exact else 'NOT exact'}")
+
+    started = time.perf_counter()
+    for body_id in bodies:
+        store.positions(body_id)
+    seconds = time.perf_counter() - started
+    lines.append(f"  full decode   {rows / seconds / 1e6:.1f} M rows/s ({rows * 24 / seconds / 1e6:.0f} MB/s of positions)")
+
+    # One month at random epochs, each read cold
+    rng = np.random.default_rng(seed)
+    ids = list(bodies)
+    started = time.perf_counter()
+    for _ in range(ranges):
+        body_id = ids[rng.integers(len(ids))]
+        jd = store.jd(body_id)
+        start = jd[rng.integers(len(jd))]
+        store.between(body_id, start, start + 30)
+    seconds = time.perf_counter() - started
+    lines.append(f"  30-day range  {seconds / ranges * 1e3:.2f} ms per read (cold block)")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack a PlanetData folder into a block-compressed ephemeris file")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', help=f"output file (default: <data_folder>/{BLOCKS_FILENAME})")
+    parser.add_argument('--codec', choices=sorted(CODECS), default='zlib')
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS, help="epochs per compressed block")
+    parser.add_argument('--quantum', type=float, default=QUANTUM, help="position grid in file units for every body (default: per body, a tenth of "
+                             "the last digit its txt file gives)")
+    parser.add_argument('--report', action='store_true', help="print the compression ratio, error and decode speed")
+    args = parser.parse_args(argv)
+    instrument.configure_from_env()
+
+    started = time.perf_counter()
+    out_path, bodies = convert_dataset_blocks(args.data_folder, args.output, args.block_rows, args.quantum, args.codec)
+    print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1e6:.2f} MB) in {time.perf_counter() - started:.2f} s")
+    if args.report:
+        print(report(out_path, args.data_folder, bodies))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from sagan import instrument
+from sagan.atomic import atomic_write
+from sagan.cache import series_key
+from sagan.dates import format_query_time, format_step, parse_horizons_dates, parse_step, to_jd
+from sagan.ephemstore import STORE_FILENAME, EphemerisStore, write_store
+from sagan.horizons import HORIZONS_URL, horizons_params
+from sagan.parse import parse_vector_text
+from sagan.planetdata import HEADER, dataset_files, format_positions_rows, horizons_to_file_units
+
+logger = logging.getLogger(__name__)
+
+# Range HorizonCall.cs requests for the PlanetData sets
+DEFAULT_START = '1900-01-01'
+DEFAULT_END = '2065-01-01'
+
+CHECKPOINT_DIR = '.build'
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+FORMATS = ('txt', 'store')
+
+# Split [start_jd, end_jd] into windows of about window_days on the step
+# grid. Consecutive windows share their boundary epoch, so every epoch is
+# requested at least once and the overlap is dropped when stitching.
+def split_windows(start_jd, end_jd, window_days, step):
+    last = start_jd + np.floor((end_jd - start_jd) / step + 1e-9) * step
+    steps_per_window = max(1, int(round(window_days / step)))
+    edges = np.arange(start_jd, last, steps_per_window * step)
+    edges = np.append(edges, last)
+    if len(edges) < 2:
+        return [(start_jd, last)]
+    return list(zip(edges[:-1], edges[1:]))
+
+def _checkpoint_path(checkpoint_dir, params, url, start, stop):
+    return os.path.join(checkpoint_dir, series_key(params, url), f"{start:.6f}_{stop:.6f}.npz")
+
+def _save_checkpoint(path, table):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with atomic_write(path) as file:
+        np.savez(file, jd=table.jd, pos=table.pos)
+
+def _load_checkpoint(path):
+    with np.load(path) as data:
+        return data['jd'], data['pos']
+
+# Concatenate windows in time order and drop the shared boundary rows
+def stitch_windows(windows):
+    jd = np.concatenate([window[0] for window in windows])
+    pos = np.concatenate([window[1] for window in windows])
+    order = np.argsort(jd, kind='stable')
+    jd, pos = jd[order], pos[order]
+    keep = np.r_[True, np.diff(jd) > 1e-6]
+    return jd[keep], pos[keep]
+
+def _write_txt(path, jd, positions):
+    with atomic_write(path, 'w', newline='\n') as file:
+        file.write(HEADER)
+        file.write(format_positions_rows(jd, positions))
+
+def _step_days(overrides):
+    step = parse_step(horizons_params('', '', '', **overrides)['STEP_SIZE'])
+    if step is None:
+        raise ValueError("Windowed builds need a fixed STEP_SIZE, e.g. '1 DAYS' or '6 HOURS'")
+    return step
+
+# Fetch ranges {body_id: (start_jd, end_jd)} of vector tables in windows of
+# window_days, max_workers requests at a time. Every finished window is
+# saved to checkpoint_dir, so calling this again with the same arguments
+# after an interruption or failed windows only fetches what is missing.
+# Returns ({body_id: (jd, positions_km)}, failed (body_id, start_jd,
+# end_jd) windows); bodies with failed windows are left out.
+def fetch_ranges(ranges, checkpoint_dir, window_days=3650, max_workers=8, timeout=60, retries=3, backoff=0.5,
+                 url=HORIZONS_URL, **overrides):
+    step = _step_days(overrides)
+
+    # Plan every window and pick up the ones that already have a checkpoint
+    windows = {}
+    jobs = {}
+    for body_id, (start_jd, end_jd) in ranges.items():
+        windows[body_id] = {}
+        for window_start, window_stop in split_windows(start_jd, end_jd, window_days, step):
+            window_start_text = format_query_time(window_start)
+            window_stop_text = format_query_time(window_stop)
+            params = horizons_params(body_id, window_start_text, window_stop_text, **overrides)
+            path = _checkpoint_path(checkpoint_dir, params, url, window_start, window_stop)
+            key = (body_id, window_start, window_stop)
+            windows[body_id][key] = path
+            if not os.path.exists(path):
+                jobs[key] = (body_id, window_start_text, window_stop_text)
+
+    # Imported here so verify and manifest reads do not load requests
+    from sagan.fetch import iter_fetch_jobs
+
+    total = sum(len(body_windows) for body_windows in windows.values())
+    logger.info("%d of %d windows already fetched, fetching %d", total - len(jobs), total, len(jobs))
+
+    failed = []
+    for key, text in iter_fetch_jobs(jobs, max_workers=max_workers, timeout=timeout, retries=retries,
+                                     backoff=backoff, url=url, **overrides):
+        table = parse_vector_text(text) if text is not None else None
+        if table is None or len(table.jd) == 0:
+            logger.warning("Window %s - %s of body %s failed", format_query_time(key[1]), format_query_time(key[2]), key[0])
+            failed.append(key)
+            continue
+        _save_checkpoint(windows[key[0]][key], table)
+
+    tables = {}
+    for body_id, body_windows in windows.items():
+        if not any(key[0] == body_id for key in failed):
+            tables[body_id] = stitch_windows([_load_checkpoint(path) for path in body_windows.values()])
+    if failed:
+        logger.warning("%d windows failed; run the same command again to retry them", len(failed))
+    return tables, failed
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def load_manifest(data_folder):
+    path = os.path.join(data_folder, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'bodies': {}}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def _write_manifest(data_folder, manifest):
+    with atomic_write(os.path.join(data_folder, MANIFEST_FILENAME), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+def _segment(offset, data, jd):
+    return {'offset': offset, 'length': len(data), 'sha256': _sha256(data), 'rows': len(jd),
+            'start_jd': float(jd[0]), 'end_jd': float(jd[-1])}
+
+def _manifest_entry(filename, step, segments):
+    return {
+        'file': filename,
+        'step_days': step,
+        'rows': sum(segment['rows'] for segment in segments),
+        'start_jd': segments[0]['start_jd'],
+        'end_jd': segments[-1]['end_jd'],
+        'bytes': segments[-1]['offset'] + segments[-1]['length'],
+        'segments': segments,
+    }
+
+# Check every body file against the manifest. Each append is checksummed
+# as its own segment, so files are verified piece by piece. Returns the IDs
+# of bodies whose files are missing, truncated or modified.
+def verify_manifest(data_folder):
+    bad = []
+    for body_id, entry in load_manifest(data_folder)['bodies'].items():
+        path = os.path.join(data_folder, entry['file'])
+        try:
+            with open(path, 'rb') as file:
+                for segment in entry['segments']:
+                    file.seek(segment['offset'])
+                    if _sha256(file.read(segment['length'])) != segment['sha256']:
+                        bad.append(body_id)
+                        break
+        except FileNotFoundError:
+            bad.append(body_id)
+    return bad
+
+# Build a PlanetData folder from Horizons vector tables with the query
+# HorizonCall.cs sends (overrides change it like in fetch_horizons_data).
+# Windows are fetched and checkpointed by fetch_ranges in checkpoint_dir
+# (default <out_folder>/.build). Positions are written in file units (see
+# planetdata.horizons_to_file_units) as planet_<id>_positions.txt ('txt')
+# and/or one ephemeris.bytes ('store'), with a manifest.json of coverage
+# and checksums. Returns (written paths, failed windows).
+def build_dataset(body_ids, out_folder, start=DEFAULT_START, end=DEFAULT_END, window_days=3650, max_workers=8,
+                  formats=('txt',), checkpoint_dir=None, keep_checkpoints=False, **fetch_options):
+    for output_format in formats:
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {FORMATS}")
+    checkpoint_dir = checkpoint_dir or os.path.join(out_folder, CHECKPOINT_DIR)
+    os.makedirs(out_folder, exist_ok=True)
+
+    start_jd, end_jd = to_jd([start, end])
+    step = _step_days(fetch_options)
+    ranges = {str(body_id): (start_jd, end_jd) for body_id in body_ids}
+    tables, failed = fetch_ranges(ranges, checkpoint_dir, window_days, max_workers, **fetch_options)
+
+    bodies = {}
+    written = []
+    manifest = load_manifest(out_folder)
+    for body_id, (jd, pos) in tables.items():
+        bodies[body_id] = (jd, horizons_to_file_units(pos))
+        if 'txt' in formats:
+            filename = f"planet_{body_id}_positions.txt"
+            path = os.path.join(out_folder, filename)
+            _write_txt(path, *bodies[body_id])
+            with open(path, 'rb') as file:
+                data = file.read()
+            manifest['bodies'][body_id] = _manifest_entry(filename, step, [_segment(0, data, jd)])
+            written.append(path)
+        logger.info("Body %s: %d rows", body_id, len(jd))
+
+    if 'store' in formats and bodies:
+        path = os.path.join(out_folder, STORE_FILENAME)
+        write_store(path, bodies, attrs={'source': os.path.basename(os.path.normpath(out_folder)),
+                                         'start': float(start_jd), 'end': float(end_jd), 'step_days': step})
+        written.append(path)
+    if 'txt' in formats and tables:
+        _write_manifest(out_folder, manifest)
+
+    if not failed and not keep_checkpoints:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return written, failed
+
+# Manifest entry for a file that has none yet: one segment over the whole
+# file up to its last complete line. The file is only read; a partial last
+# line left by an interrupted write lies past the entry's 'bytes' and is
+# dropped by update_dataset with the other tails. Coverage comes from the
+# first and last rows, without parsing the rest.
+def _bootstrap_entry(path, filename):
+    with open(path, 'rb') as file:
+        data = file.read()
+    data = data[:data.rfind(b'\n') + 1]
+    rows = data.count(b'\n') - data.startswith(b'Date')
+    if rows < 2:
+        raise ValueError(f"{path}: need at least two rows to infer the step")
+    head = data.split(b'\n', 2)
+    first = head[1] if head[0].startswith(b'Date') else head[0]
+    tail = data.rsplit(b'\n', 3)[-3:-1]
+    start_jd, last_jd, end_jd = parse_horizons_dates([line.split(b',')[0].strip() for line in [first] + tail])
+    segment = {'offset': 0, 'length': len(data), 'sha256': _sha256(data), 'rows': rows,
+               'start_jd': float(start_jd), 'end_jd': float(end_jd)}
+    return _manifest_entry(filename, float(np.round(end_jd - last_jd, 9)), [segment])
+
+# Extend an existing PlanetData folder up to end. The last epoch of every
+# body comes from the manifest (or, the first time, from the file itself);
+# only the missing tail is fetched, in windows as in build_dataset, and
+# appended to planet_<id>_positions.txt in place. Bytes past the manifest's
+# coverage, e.g. from an interrupted append, are dropped before appending.
+# Only the new rows are checksummed, as a new manifest segment. An existing
+# ephemeris.bytes is rewritten to match. Returns ({body_id: rows appended},
+# failed windows).
+def update_dataset(data_folder, end, window_days=3650, max_workers=8, checkpoint_dir=None, keep_checkpoints=False,
+                   **fetch_options):
+    checkpoint_dir = checkpoint_dir or os.path.join(data_folder, CHECKPOINT_DIR)
+    end_jd = to_jd(end)
+    manifest = load_manifest(data_folder)
+
+    # Check every body before any file is touched
+    entries = {}
+    for body_id, path in dataset_files(data_folder).items():
+        entry = manifest['bodies'].get(body_id)
+        if entry is None:
+            entry = manifest['bodies'][body_id] = _bootstrap_entry(path, os.path.basename(path))
+        elif os.path.getsize(path) < entry['bytes']:
+            raise ValueError(f"{path} is shorter than its manifest entry; rebuild it")
+        if 'STEP_SIZE' in fetch_options and abs(_step_days(fetch_options) - entry['step_days']) > 1e-9:
+            raise ValueError(f"{path} has a {entry['step_days']} day step, not {fetch_options['STEP_SIZE']}")
+        entries[body_id] = (path, entry)
+
+    # Drop partial tails (bytes past the manifest, or a partial last line of a
+    # bootstrapped file), then fetch each body on its own step
+    ranges = {}
+    for body_id, (path, entry) in entries.items():
+        if os.path.getsize(path) > entry['bytes']:
+            with open(path, 'rb+') as file:
+                file.truncate(entry['bytes'])
+        tail_start = entry['end_jd'] + entry['step_days']
+        if tail_start <= end_jd + 1e-9:
+            ranges.setdefault(entry['step_days'], {})[body_id] = (tail_start, end_jd)
+
+    tables, failed = {}, []
+    for step_days, step_ranges in ranges.items():
+        options = dict(fetch_options)
+        options.setdefault('STEP_SIZE', f"'{format_step(step_days)}'")
+        step_tables, step_failed = fetch_ranges(step_ranges, checkpoint_dir, window_days, max_workers, **options)
+        tables.update(step_tables)
+        failed += step_failed
+
+    appended = {}
+    for body_id, (jd, pos) in tables.items():
+        entry = manifest['bodies'][body_id]
+        data = format_positions_rows(jd, horizons_to_file_units(pos)).encode()
+        with open(os.path.join(data_folder, entry['file']), 'ab') as file:
+            file.write(data)
+        segments = entry['segments'] + [_segment(entry['bytes'], data, jd)]
+        manifest['bodies'][body_id] = _manifest_entry(entry['file'], entry['step_days'], segments)
+        appended[body_id] = len(jd)
+        logger.info("Body %s: appended %d rows", body_id, len(jd))
+    _write_manifest(data_folder, manifest)
+
+    store_path = os.path.join(data_folder, STORE_FILENAME)
+    if appended and os.path.exists(store_path):
+        store = EphemerisStore(store_path)
+        bodies = {}
+        for body_id in store.bodies:
+            jd, pos = store.jd(body_id), store.positions(body_id)
+            if body_id in tables:
+                new_jd, new_pos = tables[body_id]
+                jd, pos = np.concatenate([jd, new_jd]), np.concatenate([pos, horizons_to_file_units(new_pos)])
+            bodies[body_id] = (jd, pos)
+        dtype = store.positions(store.bodies[0]).dtype
+        attrs = dict(store.attrs, end=float(end_jd))
+        del store
+        write_store(store_path, bodies, dtype=dtype, attrs=attrs)
+
+    if not failed and not keep_checkpoints:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return appended, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or extend PlanetData folders from JPL Horizons in parallel windows")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="fetch a new dataset")
+    build.add_argument('body_ids', nargs='+', help="Horizons object IDs, e.g. 10 199 299 399")
+    build.add_argument('-o', '--output', required=True, help="output PlanetData folder")
+    build.add_argument('--start', default=DEFAULT_START)
+    build.add_argument('--end', default=DEFAULT_END)
+    build.add_argument('--step', default='1 DAYS', help="Horizons STEP_SIZE (default: 1 DAYS)")
+    build.add_argument('--format', nargs='+', choices=FORMATS, default=['txt'])
+
+    update = commands.add_parser('update', help="append the missing tail to an existing dataset")
+    update.add_argument('data_folder')
+    update.add_argument('--end', required=True)
+
+    verify = commands.add_parser('verify', help="check a dataset against its manifest")
+    verify.add_argument('data_folder')
+
+    for command in (build, update):
+        command.add_argument('--window-days', type=float, default=3650)
+        command.add_argument('--workers', type=int, default=8)
+        command.add_argument('--keep-checkpoints', action='store_true')
+        command.add_argument('--url', default=HORIZONS_URL)
+    args = parser.parse_args(argv)
+    instrument.configure_from_env('INFO')
+
+    if args.command == 'verify':
+        bad = verify_manifest(args.data_folder)
+        print("OK" if not bad else f"Modified or missing: {', '.join(bad)}")
+        return 1 if bad else 0
+    if args.command == 'update':
+        _, failed = update_dataset(args.data_folder, args.end, args.window_days, args.workers,
+                                   keep_checkpoints=args.keep_checkpoints, url=args.url)
+        return 1 if failed else 0
+    _, failed = build_dataset(args.body_ids, args.output, args.start, args.end, args.window_days, args.workers,
+                              args.format, keep_checkpoints=args.keep_checkpoints, url=args.url,
+                              STEP_SIZE=f"'{args.step}'")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
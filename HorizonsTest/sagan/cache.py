@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from sagan.atomic import atomic_write
+from sagan.dates import format_query_time, parse_step, to_jd
+from sagan.horizons import HORIZONS_URL
+
+# Start of one vector-table record: "2459945.500000000 = A.D. ..."
+RECORD_START = re.compile(r'^\s*(\d+\.\d+)\s*=', re.MULTILINE)
+
+# Slack when comparing JDs; well below one second
+JD_EPSILON = 1e-6
+
+def default_cache_dir():
+    return os.environ.get('SAGAN_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'space-sagan', 'horizons'))
+
+def _normalize(params):
+    return {str(key).upper(): str(value).strip().strip("'").strip() for key, value in params.items()}
+
+# Content address of a query: sha256 of the normalized params and the URL
+# they were sent to, so answers of the offline stub server never stand in
+# for real Horizons ones. The time span is left out of the series key so
+# that every cached span of the same body/frame/step lands in one
+# directory and can be reused for overlaps.
+def series_key(params, url=HORIZONS_URL):
+    params = _normalize(params)
+    params.pop('START_TIME', None)
+    params.pop('STOP_TIME', None)
+    key = {'url': url.rstrip('/'), 'params': params}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+# Split ephemeris text into (jd, records); each record is the text of one epoch
+def split_records(text):
+    starts = [match.start() for match in RECORD_START.finditer(text)]
+    jd = np.array([float(match.group(1)) for match in RECORD_START.finditer(text)])
+    ends = starts[1:] + [len(text)]
+    return jd, [text[a:b].strip('\n') for a, b in zip(starts, ends)]
+
+def _format_time(jd):
+    return f"'{format_query_time(jd)}'"
+
+# On-disk cache for the text between $$SOE/$$EOE.
+#
+# Layout: <root>/<series_key>/<start_jd>_<stop_jd>.txt, one file per fetched
+# span. Writes are atomic (temp file + os.replace). A file's mtime is when it
+# was fetched (used for ttl, in seconds) and its atime is set on every hit,
+# so eviction drops the least recently used spans once the cache exceeds
+# max_bytes.
+class ResponseCache:
+    def __init__(self, root=None, max_bytes=512 * 1024**2, ttl=None):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(self.root, exist_ok=True)
+
+    def _expired(self, path):
+        return self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl
+
+    # Cached spans of a series as (start_jd, stop_jd, path), sorted by start
+    def spans(self, params, url=HORIZONS_URL):
+        directory = os.path.join(self.root, series_key(params, url))
+        if not os.path.isdir(directory):
+            return []
+        spans = []
+        for name in os.listdir(directory):
+            if not name.endswith('.txt'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if self._expired(path):
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            start, stop = name[:-4].split('_')
+            spans.append((float(start), float(stop), path))
+        return sorted(spans)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        os.utime(path, (now, os.path.getmtime(path)))
+        return text
+
+    def _write(self, params, url, start, stop, text):
+        directory = os.path.join(self.root, series_key(params, url))
+        os.makedirs(directory, exist_ok=True)
+        with atomic_write(os.path.join(directory, f"{start:.6f}_{stop:.6f}.txt"), 'w') as file:
+            file.write(text)
+        self.evict()
+
+    # Remove least recently used spans until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith('.txt'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.txt'):
+                    os.remove(os.path.join(directory, name))
+
+    # Return the ephemeris text for params, fetching only what is not cached.
+    # fetch(params) must return the $$SOE/$$EOE text or None, as answered by
+    # url (part of the cache key). For a fixed
+    # STEP_SIZE the requested range is assembled from cached spans on the
+    # same time grid and only the gaps are fetched; other queries are cached
+    # by exact range.
+    def get_or_fetch(self, params, fetch, url=HORIZONS_URL):
+        try:
+            start, stop = to_jd([_normalize(params)['START_TIME'], _normalize(params)['STOP_TIME']])
+        except (KeyError, ValueError):
+            return fetch(params)
+        step = parse_step(params.get('STEP_SIZE', ''))
+
+        if step is None:
+            for span_start, span_stop, path in self.spans(params, url):
+                if abs(span_start - start) < JD_EPSILON and abs(span_stop - stop) < JD_EPSILON:
+                    text = self._read(path)
+                    if text is not None:
+                        return text
+            text = fetch(params)
+            if text is not None:
+                self._write(params, url, start, stop, text)
+            return text
+
+        last = start + np.floor((stop - start) / step + JD_EPSILON) * step
+        spans = [span for span in self.spans(params, url) if self._on_grid(span[0], start, step)]
+        pieces = []
+        cursor = start
+        while cursor <= last + JD_EPSILON:
+            covering = [span for span in spans if span[0] <= cursor + JD_EPSILON and span[1] >= cursor - JD_EPSILON]
+            if covering:
+                span_start, span_stop, path = max(covering, key=lambda span: span[1])
+                end = min(last, span_start + np.floor((span_stop - span_start) / step + JD_EPSILON) * step)
+                text = self._read(path)
+                if text is not None:
+                    pieces.append(self._slice(text, cursor, end))
+                    cursor = end + step
+                    continue
+                spans.remove((span_start, span_stop, path))
+                continue
+
+            later = [span[0] for span in spans if span[0] > cursor + JD_EPSILON]
+            end = min([last] + [span_start - step for span_start in later])
+            gap_params = dict(params)
+            gap_params['START_TIME'] = _format_time(cursor)
+            gap_params['STOP_TIME'] = _format_time(end)
+            text = fetch(gap_params)
+            if text is None:
+                return None
+            self._write(params, url, cursor, end, text)
+            pieces.append(text.strip('\n'))
+            cursor = end + step
+
+        return "\n".join(piece for piece in pieces if piece)
+
+    @staticmethod
+    def _on_grid(jd, origin, step):
+        offset = (jd - origin) / step
+        return abs(offset - round(offset)) * step < JD_EPSILON
+
+    @staticmethod
+    def _slice(text, start, stop):
+        jd, records = split_records(text)
+        keep = (jd >= start - JD_EPSILON) & (jd <= stop + JD_EPSILON)
+        return "\n".join(record for record, kept in zip(records, keep) if kept)
@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+
+from sagan.blockstore import BLOCKS_FILENAME, BlockStore, open_store
+from sagan.dates import DateIndex
+from sagan.ephemstore import STORE_FILENAME, EphemerisStore, convert_dataset
+from sagan.lod import LOD_FILENAME, LodPyramid, dataset_lod
+from sagan.planetdata import dataset_files, read_positions_jd
+from sagan.pyramid import PYRAMID_FILENAME, build_pyramids, load_pyramids
+
+# Positions of one body: jd is (n,) and positions is (n, 3) in file units.
+# When the dataset is backed by a store both are views into its memory map.
+# A track over a BlockStore gets positions=None and store: its positions
+# are decoded on first read, and between(), at(), nearest() and
+# PlanetDataset.polyline() before that decode only the blocks they need.
+class BodyTrack:
+    def __init__(self, body_id, jd, positions, index=None, store=None):
+        self.body_id = body_id
+        self.jd = jd
+        self._positions = positions
+        self._store = store
+        self.index = index if index is not None else DateIndex(jd)
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = self._store.positions(self.body_id)
+        return self._positions
+
+    def __len__(self):
+        return len(self.jd)
+
+    # positions[rows] for a slice or an index array, without decoding the
+    # whole track when it is still in the store
+    def take(self, rows):
+        if self._positions is not None:
+            return self._positions[rows]
+        if isinstance(rows, slice):
+            return self._store.rows(self.body_id, rows.start, rows.stop)
+        return self._store.take(self.body_id, rows)
+
+    # Rows with start <= jd <= end as a BodyTrack; either bound may be None.
+    # Bounds accept JD numbers, datetime64 values or ISO strings. Zero-copy
+    # unless the positions come from a BlockStore.
+    def between(self, start=None, end=None):
+        rows = self.index.range(start, end)
+        return BodyTrack(self.body_id, self.jd[rows], self.take(rows), DateIndex(self.jd[rows], assume_sorted=True))
+
+    # Position at each sampled epoch; raises KeyError for epochs not in the track
+    def at(self, epochs):
+        rows = self.index.locate(epochs)
+        if np.any(rows < 0):
+            raise KeyError(f"No sample for body {self.body_id} at {np.asarray(epochs)[rows < 0]}")
+        return self.take(rows)
+
+    # Position at the sampled epoch closest to each query
+    def nearest(self, epochs):
+        return self.take(self.index.nearest(epochs))
+
+# Lazy view over a PlanetData folder.
+#
+# Bodies are discovered from the planet_<id>_positions.txt filenames and
+# loaded on first access. If the folder has an up-to-date binary store
+# (see sagan.ephemstore) tracks are memory-mapped from it; failing that, and
+# only with blocks=True, an up-to-date blocks file (see sagan.blockstore) is
+# decoded body by body, since its positions are rounded to a grid; otherwise
+# the accessed body's txt file is parsed. build_store() writes the store so
+# the next open is O(1). store_path may name either kind of file.
+class PlanetDataset:
+    def __init__(self, data_folder, store_path=None, blocks=False):
+        self.data_folder = data_folder
+        self._files = dataset_files(data_folder)
+        self.store_path = store_path or self._default_store(blocks)
+        self._tracks = {}
+        self._store = None
+        self._lod = None
+        self._pyramids = None
+        if self._store_is_fresh():
+            self._store = open_store(self.store_path)
+
+    # ephemeris.bytes, or ephemeris.blocks if allowed and only that one is up
+    # to date
+    def _default_store(self, blocks):
+        store_path = os.path.join(self.data_folder, STORE_FILENAME)
+        blocks_path = os.path.join(self.data_folder, BLOCKS_FILENAME)
+        if blocks and not self._is_fresh(store_path) and self._is_fresh(blocks_path):
+            return blocks_path
+        return store_path
+
+    def _is_fresh(self, path):
+        if not os.path.exists(path):
+            return False
+        built = os.path.getmtime(path)
+        return all(os.path.getmtime(source) <= built for source in self._files.values())
+
+    def _store_is_fresh(self):
+        return self._is_fresh(self.store_path)
+
+    @property
+    def bodies(self):
+        if self._store is not None:
+            return sorted(set(self._files) | set(self._store.bodies))
+        return list(self._files)
+
+    @property
+    def memory_mapped(self):
+        return isinstance(self._store, EphemerisStore)
+
+    def __contains__(self, body_id):
+        return str(body_id) in self.bodies
+
+    def __iter__(self):
+        return iter(self.bodies)
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def __getitem__(self, body_id):
+        body_id = str(body_id)
+        track = self._tracks.get(body_id)
+        if track is None:
+            if self._store is not None and body_id in self._store:
+                # Store writers keep the JDs sorted, so the index skips its
+                # O(n) check and opening stays O(1)
+                jd = self._store.jd(body_id)
+                index = DateIndex(jd, assume_sorted=True)
+                if isinstance(self._store, BlockStore):
+                    track = BodyTrack(body_id, jd, None, index, store=self._store)
+                else:
+                    track = BodyTrack(body_id, jd, self._store.positions(body_id), index)
+            elif body_id in self._files:
+                track = BodyTrack(body_id, *read_positions_jd(self._files[body_id]))
+            else:
+                raise KeyError(body_id)
+            self._tracks[body_id] = track
+        return track
+
+    def items(self):
+        for body_id in self.bodies:
+            yield body_id, self[body_id]
+
+    # (jd, [BodyTrack]) of bodies over start <= jd <= end, for code that
+    # stacks them; raises ValueError unless they all share their epochs
+    def shared_tracks(self, bodies, start=None, end=None):
+        tracks = [self[body_id].between(start, end) for body_id in bodies]
+        jd = np.asarray(tracks[0].jd)
+        for track in tracks[1:]:
+            if len(track.jd) != len(jd) or not np.array_equal(track.jd, jd):
+                raise ValueError(f"Body {track.body_id} is not sampled on the same epochs as {tracks[0].body_id}")
+        return jd, tracks
+
+    def build_store(self, dtype=np.float64):
+        # A blocks file stays as it is; the store goes next to it
+        if isinstance(self._store, BlockStore):
+            self.store_path = os.path.join(self.data_folder, STORE_FILENAME)
+        convert_dataset(self.data_folder, self.store_path, dtype)
+        self._tracks.clear()
+        self._store = EphemerisStore(self.store_path)
+        return self.store_path
+
+    # Level-of-detail pyramid of the tracks (see sagan.lod), loaded from
+    # lod.npz when it is up to date and built in memory otherwise. Nothing
+    # is written to the folder; python -m sagan lod saves lod.npz.
+    def lod(self, **options):
+        if self._lod is None:
+            path = os.path.join(self.data_folder, LOD_FILENAME)
+            if self._is_fresh(path) and not options:
+                self._lod = LodPyramid.load(path)
+            else:
+                self._lod = dataset_lod(self, **options)
+        return self._lod
+
+    # {body_id: TimePyramid} (see sagan.pyramid), loaded from pyramid.npz
+    # when it is up to date and built in memory otherwise, like lod();
+    # python -m sagan pyramid saves pyramid.npz
+    def pyramids(self):
+        if self._pyramids is None:
+            path = os.path.join(self.data_folder, PYRAMID_FILENAME)
+            if self._is_fresh(path):
+                self._pyramids = load_pyramids(path, self)
+            else:
+                self._pyramids = build_pyramids(self)
+        return self._pyramids
+
+    # Positions of body_id over start <= jd <= end for drawing, with at most
+    # about max_points points: the finest LOD level (see lod()) within the
+    # budget when the range has more samples, every sample otherwise
+    def polyline(self, body_id, start=None, end=None, max_points=5000):
+        track = self[body_id]
+        rows = track.index.range(start, end)
+        count = rows.stop - rows.start
+        if max_points is not None and count > max_points:
+            lod = self.lod()
+            level = lod.level_for_budget(body_id, max_points * len(track) // count)
+            if level is not None:
+                indices = lod.indices(body_id, level)
+                return track.take(indices[(indices >= rows.start) & (indices < rows.stop)])
+        return track.take(rows)
@@ -0,0 +1,172 @@
+from datetime import datetime
+
+import numpy as np
+
+J2000_JD = 2451545.0
+UNIX_EPOCH_JD = 2440587.5  # 1970-01-01T00:00
+DAYS_PER_CENTURY = 36525.0
+
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Horizons STEP_SIZE units and their length in days
+STEP_UNITS = {
+    'd': 1.0, 'day': 1.0, 'days': 1.0,
+    'h': 1.0 / 24, 'hour': 1.0 / 24, 'hours': 1.0 / 24,
+    'm': 1.0 / 1440, 'min': 1.0 / 1440, 'minute': 1.0 / 1440, 'minutes': 1.0 / 1440,
+}
+
+# Convert epochs to Julian Dates as a float64 array.
+# Accepts JD numbers, numpy datetime64 values, or ISO date strings such as
+# '2023-01-01' / '2023-01-01T12:00' (anything np.datetime64 can parse).
+def to_jd(epochs):
+    epochs = np.asarray(epochs)
+    if epochs.dtype.kind in 'iuf':
+        return epochs.astype(np.float64)
+    if epochs.dtype.kind in 'USO':
+        epochs = epochs.astype('datetime64[us]')
+    if epochs.dtype.kind != 'M':
+        raise TypeError(f"Cannot convert epochs of dtype {epochs.dtype} to Julian Dates")
+    # Whole days and the time of day separately, so nanosecond inputs keep
+    # their precision and microsecond ones their range
+    days = epochs.astype('datetime64[D]')
+    day_fraction = (epochs - days) / np.timedelta64(1, 'D')
+    return (days - np.datetime64('1970-01-01', 'D')).astype(np.float64) + day_fraction + UNIX_EPOCH_JD
+
+# Inverse of to_jd, returned with the given datetime64 unit
+def jd_to_datetime64(jd, unit='ms'):
+    # Whole days and microseconds separately: int64 nanoseconds only reach
+    # 1677-2262, while Horizons serves 9999 BC - 9999 AD
+    offset = np.asarray(jd, dtype=np.float64) - UNIX_EPOCH_JD
+    days = np.floor(offset)
+    us = np.round((offset - days) * 86400e6).astype(np.int64)
+    stamp = np.datetime64('1970-01-01', 'us') + days.astype(np.int64).astype('timedelta64[D]') + us.astype('timedelta64[us]')
+    return stamp.astype(f'datetime64[{unit}]')
+
+# 'YYYY-MM-DD HH:MM:SS', a START_TIME/STOP_TIME form Horizons accepts
+def format_query_time(jd):
+    return str(jd_to_datetime64(jd, 's')).replace('T', ' ')
+
+# Julian centuries since J2000, the time argument of the element rates
+def centuries_since_j2000(jd):
+    return (np.asarray(jd, dtype=np.float64) - J2000_JD) / DAYS_PER_CENTURY
+
+# Length in days of a Horizons STEP_SIZE such as '1 DAYS' or "'10 d'".
+# Returns None for steps given as a count of intervals or calendar units.
+def parse_step(step):
+    parts = step.strip().strip("'").split()
+    if len(parts) != 2 or parts[1].lower() not in STEP_UNITS:
+        return None
+    try:
+        return float(parts[0]) * STEP_UNITS[parts[1].lower()]
+    except ValueError:
+        return None
+
+# Inverse of parse_step, e.g. 1.0 -> '1 DAYS', 0.25 -> '6 HOURS'
+def format_step(days):
+    for unit, scale in (('DAYS', 1.0), ('HOURS', 24.0), ('MINUTES', 1440.0)):
+        count = days * scale
+        if abs(count - round(count)) < 1e-6:
+            return f"{round(count)} {unit}"
+    return f"{days * 1440:g} MINUTES"
+
+# Horizons calendar strings, e.g. 'A.D. 2023-Jan-01 00:00:00.0000 TDB'
+def format_horizons_dates(jd):
+    stamps = jd_to_datetime64(np.atleast_1d(jd), 'us').astype(str)
+    dates = []
+    for stamp in stamps:
+        day, time = stamp.split('T')
+        year, month, dom = day.split('-')
+        dates.append(f"A.D. {year}-{MONTH_NAMES[int(month) - 1]}-{dom} {time[:13]} TDB")
+    return dates
+
+# Column layout of 'A.D. 2023-Jan-01 00:00:00.0000 TDB'
+_HORIZONS_DATE_WIDTH = 34
+_MONTH_CODES = np.array([(ord(m[0]) << 16) | (ord(m[1]) << 8) | ord(m[2]) for m in MONTH_NAMES])
+_MONTH_ORDER = np.argsort(_MONTH_CODES)
+
+def _digits(chars, first, last):
+    value = np.zeros(len(chars), dtype=np.int64)
+    for column in range(first, last + 1):
+        value = value * 10 + (chars[:, column].astype(np.int64) - 48)
+    return value
+
+def _parse_horizons_date(text):
+    text = text.strip()
+    if text.startswith('A.D. '):
+        text = text[5:]
+    if text.endswith(' TDB'):
+        text = text[:-4]
+    stamp = datetime.strptime(text, '%Y-%b-%d %H:%M:%S.%f')
+    return to_jd(np.datetime64(stamp, 'us'))
+
+# Convert Horizons calendar strings to Julian Dates in one vectorized pass.
+# The fixed-width 'A.D. YYYY-Mon-DD HH:MM:SS.ffff TDB' layout is decoded
+# column by column; anything else falls back to strptime per string.
+def parse_horizons_dates(dates):
+    raw = np.char.strip(np.asarray(dates, dtype='S'))
+    if raw.size == 0:
+        return np.empty(0)
+    if raw.dtype.itemsize != _HORIZONS_DATE_WIDTH or not np.all(np.char.startswith(raw, b'A.D. ')):
+        return np.array([_parse_horizons_date(d.decode()) for d in raw.ravel()]).reshape(raw.shape)
+
+    chars = raw.ravel().view(np.uint8).reshape(-1, _HORIZONS_DATE_WIDTH)
+    codes = (chars[:, 10].astype(np.int64) << 16) | (chars[:, 11].astype(np.int64) << 8) | chars[:, 12]
+    month = _MONTH_ORDER[np.searchsorted(_MONTH_CODES[_MONTH_ORDER], codes)]
+    if not np.array_equal(_MONTH_CODES[month], codes):
+        raise ValueError("Unrecognized month name in Horizons date")
+
+    year = _digits(chars, 5, 8)
+    days = (
+        (np.datetime64('1970', 'Y') + (year - 1970).astype('timedelta64[Y]')).astype('datetime64[M]')
+        + month.astype('timedelta64[M]')
+    ).astype('datetime64[D]') + (_digits(chars, 14, 15) - 1).astype('timedelta64[D]')
+    seconds = _digits(chars, 17, 18) * 3600 + _digits(chars, 20, 21) * 60 + _digits(chars, 23, 24) + _digits(chars, 26, 29) / 1e4
+
+    jd = days.astype(np.int64) + UNIX_EPOCH_JD + seconds / 86400.0
+    return jd.reshape(raw.shape)
+
+# Sorted epoch index with O(log n) lookups.
+# Built once from a JD array (or Horizons date strings via from_horizons);
+# every query takes scalars or arrays of JD numbers, datetime64 values or
+# ISO strings and is answered with np.searchsorted.
+class DateIndex:
+    def __init__(self, jd, tolerance=1e-6, assume_sorted=False):
+        self.jd = np.asarray(jd, dtype=np.float64)
+        self.tolerance = tolerance
+        if self.jd.ndim != 1 or (not assume_sorted and np.any(self.jd[1:] < self.jd[:-1])):
+            raise ValueError("DateIndex needs a sorted 1-D array of epochs")
+
+    @classmethod
+    def from_horizons(cls, dates, tolerance=1e-6):
+        return cls(parse_horizons_dates(dates), tolerance)
+
+    def __len__(self):
+        return len(self.jd)
+
+    def datetime64(self, unit='s'):
+        return jd_to_datetime64(self.jd, unit)
+
+    # Row of each epoch that is present (within tolerance), -1 otherwise
+    def locate(self, epochs):
+        t = to_jd(epochs)
+        rows = self.nearest(t)
+        if len(self.jd) == 0:
+            return rows
+        return np.where(np.abs(self.jd[rows] - t) <= self.tolerance, rows, -1)
+
+    # Row of the closest epoch for each query
+    def nearest(self, epochs):
+        t = to_jd(epochs)
+        if len(self.jd) == 0:
+            return np.full(np.shape(t), -1)
+        if len(self.jd) == 1:
+            return np.zeros(np.shape(t), dtype=np.intp)
+        right = np.clip(np.searchsorted(self.jd, t), 1, len(self.jd) - 1)
+        left = right - 1
+        return np.where(np.abs(t - self.jd[left]) <= np.abs(self.jd[right] - t), left, right)
+
+    # Slice of the rows with start <= jd <= end; either bound may be None
+    def range(self, start=None, end=None):
+        first = 0 if start is None else int(np.searchsorted(self.jd, to_jd(start) - self.tolerance, side='left'))
+        last = len(self.jd) if end is None else int(np.searchsorted(self.jd, to_jd(end) + self.tolerance, side='right'))
+        return slice(first, max(first, last))
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from sagan.atomic import atomic_write
+from sagan.dates import DateIndex
+from sagan.planetdata import dataset_files, read_positions_jd
+
+# Columnar ephemeris file, one per dataset:
+#
+#   magic 'SAGANEPH' | uint32 version | uint32 header length | JSON header
+#   followed by 64-byte aligned column blocks.
+#
+# The JSON header lists, per body, its row count and the byte offsets of a
+# float64 JD column and an (rows, 3) position column (float64 or float32).
+# Everything is little-endian, so the file can also be read as raw bytes
+# from other tools.
+MAGIC = b'SAGANEPH'
+VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+
+STORE_FILENAME = 'ephemeris.bytes'
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+# Write {body_id: (jd, positions)} to path atomically
+def write_store(path, bodies, dtype=np.float64, attrs=None):
+    pos_dtype = np.dtype(dtype).newbyteorder('<')
+    jd_dtype = np.dtype('<f8')
+    # Readers index the JD columns without checking their order
+    for body_id, (jd, _) in bodies.items():
+        if np.any(np.diff(jd) < 0):
+            raise ValueError(f"Body {body_id}: epochs are not sorted")
+
+    # Lay out the blocks for a header size guess, then redo it if the real
+    # header turned out longer
+    header_size = 4096
+    while True:
+        offset = _aligned(PREAMBLE.size + header_size)
+        entries = []
+        for body_id, (jd, positions) in bodies.items():
+            rows = len(jd)
+            jd_offset = offset
+            pos_offset = _aligned(jd_offset + rows * jd_dtype.itemsize)
+            offset = _aligned(pos_offset + rows * 3 * pos_dtype.itemsize)
+            entries.append({'id': str(body_id), 'rows': rows, 'jd_offset': jd_offset, 'pos_offset': pos_offset})
+        header = json.dumps({
+            'jd_dtype': jd_dtype.str,
+            'pos_dtype': pos_dtype.str,
+            'bodies': entries,
+            'attrs': attrs or {},
+        }).encode()
+        if len(header) <= header_size:
+            break
+        header_size = len(header)
+
+    with atomic_write(path) as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        for entry, (jd, positions) in zip(entries, bodies.values()):
+            file.seek(entry['jd_offset'])
+            file.write(np.ascontiguousarray(jd, dtype=jd_dtype).tobytes())
+            file.seek(entry['pos_offset'])
+            file.write(np.ascontiguousarray(positions, dtype=pos_dtype).tobytes())
+        file.truncate(offset)
+
+# Read-only view over a store file. Opening only parses the header; the
+# columns are zero-copy views into one memory map, so slicing a date range
+# touches just the pages it covers.
+class EphemerisStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, header_length = PREAMBLE.unpack(file.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an ephemeris store")
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported store version {version}")
+            header = json.loads(file.read(header_length))
+
+        self.attrs = header['attrs']
+        self._jd_dtype = np.dtype(header['jd_dtype'])
+        self._pos_dtype = np.dtype(header['pos_dtype'])
+        self._entries = {entry['id']: entry for entry in header['bodies']}
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+
+    @property
+    def bodies(self):
+        return list(self._entries)
+
+    def __contains__(self, body_id):
+        return str(body_id) in self._entries
+
+    def jd(self, body_id):
+        entry = self._entries[str(body_id)]
+        start = entry['jd_offset']
+        return self._map[start:start + entry['rows'] * self._jd_dtype.itemsize].view(self._jd_dtype)
+
+    def positions(self, body_id):
+        entry = self._entries[str(body_id)]
+        start = entry['pos_offset']
+        return self._map[start:start + entry['rows'] * 3 * self._pos_dtype.itemsize].view(self._pos_dtype).reshape(-1, 3)
+
+    # (jd, positions) views for start <= jd <= end; either bound may be None.
+    # Bounds accept anything sagan.dates.to_jd does.
+    def between(self, body_id, start=None, end=None):
+        jd = self.jd(body_id)
+        rows = DateIndex(jd, assume_sorted=True).range(start, end)
+        return jd[rows], self.positions(body_id)[rows]
+
+# Convert a PlanetData folder of planet_<id>_positions.txt files to a store
+def convert_dataset(data_folder, out_path=None, dtype=np.float64):
+    out_path = out_path or os.path.join(data_folder, STORE_FILENAME)
+    bodies = {body_id: read_positions_jd(path) for body_id, path in dataset_files(data_folder).items()}
+    write_store(out_path, bodies, dtype=dtype, attrs={'source': os.path.basename(os.path.normpath(data_folder))})
+    return out_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a PlanetData folder to a binary ephemeris store")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', help=f"output file (default: <data_folder>/{STORE_FILENAME})")
+    parser.add_argument('--float32', action='store_true', help="store positions as float32")
+    args = parser.parse_args(argv)
+    out_path = convert_dataset(args.data_folder, args.output, np.float32 if args.float32 else np.float64)
+    print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
+
+if __name__ == '__main__':
+    main()
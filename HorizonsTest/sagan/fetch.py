@@ -0,0 +1,68 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sagan.horizons import HORIZONS_URL, fetch_horizons_data
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# One pooled session shared by all workers. Connection errors, read errors
+# and RETRY_STATUSES are retried with exponential backoff
+# (backoff * 2 ** (attempt - 1) seconds).
+def make_session(max_workers=8, retries=3, backoff=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _fetch_one(session, obj_id, start_date, end_date, timeout, url, overrides):
+    try:
+        return fetch_horizons_data(obj_id, start_date, end_date, session=session, timeout=timeout, url=url, **overrides)
+    except requests.RequestException as error:
+        logger.error("Error fetching data for object %s: %s", obj_id, error)
+        return None
+
+# Run many queries concurrently and yield (key, ephemeris_text) pairs in
+# completion order. jobs maps any hashable key -> (obj_id, start_date,
+# end_date); the text is None when the query could not be fetched.
+# At most max_workers requests are in flight; timeout applies per request.
+def iter_fetch_jobs(jobs, max_workers=8, timeout=60, retries=3, backoff=0.5, session=None, url=HORIZONS_URL, **overrides):
+    own_session = session is None
+    if own_session:
+        session = make_session(max_workers, retries, backoff)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(_fetch_one, session, obj_id, start_date, end_date, timeout, url, overrides): key
+                for key, (obj_id, start_date, end_date) in jobs.items()
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    finally:
+        if own_session:
+            session.close()
+
+# Fetch many objects concurrently and yield (obj_id, ephemeris_text) pairs
+# in completion order. objects maps obj_id -> (start_date, end_date), as in
+# query.py. Takes the same options as iter_fetch_jobs.
+def iter_fetch(objects, **kwargs):
+    jobs = {obj_id: (obj_id, start_date, end_date) for obj_id, (start_date, end_date) in objects.items()}
+    return iter_fetch_jobs(jobs, **kwargs)
+
+# Same as iter_fetch, collected into a dict keyed by object ID
+def fetch_many(objects, **kwargs):
+    return dict(iter_fetch(objects, **kwargs))
@@ -0,0 +1,183 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from sagan import instrument
+from sagan.dataset import PlanetDataset
+from sagan.planetdata import write_positions_txt
+from sagan.pyramid import SUN_ID
+
+# Local reference-frame changes, so one barycentric ICRF download (the
+# PlanetData default, CENTER='500@0' and REF_PLANE='F') can serve any
+# centre and plane without querying Horizons again.
+#
+#   helio = transform(positions, center=sun, target=ECLIPTIC, unity_axes=True)
+#   transform(positions, center=earth, out=positions)   # in place
+#
+# positions are (..., 3) arrays, typically (bodies, epochs, 3); a centre is
+# the (epochs, 3) track of the body to move the origin to and broadcasts
+# over the bodies. Every function takes out= like a numpy ufunc: pass the
+# input itself to work in place, or a preallocated array of the same shape.
+# Rotations run over row blocks, so in place they need CHUNK_ROWS rows of
+# scratch and never a copy of the whole array.
+
+EQUATORIAL = 'equatorial'
+ECLIPTIC = 'ecliptic'
+
+# Horizons REF_PLANE values (as passed in horizons_params) -> plane
+REF_PLANES = {"'F'": EQUATORIAL, "'FRAME'": EQUATORIAL, "'E'": ECLIPTIC, "'ECLIPTIC'": ECLIPTIC}
+
+# Plane of a Horizons REF_PLANE value, quoted or not ('F', "'ECLIPTIC'")
+def ref_plane(value):
+    key = "'" + str(value).strip().strip("'").upper() + "'"
+    if key not in REF_PLANES:
+        raise ValueError(f"Unknown REF_PLANE {value!r}, expected one of {', '.join(REF_PLANES)}")
+    return REF_PLANES[key]
+
+# Obliquity of the ecliptic at J2000 that Horizons uses between its
+# ICRF and ecliptic planes
+OBLIQUITY_ARCSEC = 84381.448
+
+# Row block of the chunked rotation
+CHUNK_ROWS = 1 << 16
+
+# Swaps Y and Z: Horizons axes <-> file/Unity axes (see sagan.planetdata)
+UNITY_AXES = np.eye(3)[[0, 2, 1]]
+
+# Rotation matrix taking positions on the source plane to the target
+# plane. With unity_axes it applies to positions in file/Unity axes.
+def plane_rotation(source=EQUATORIAL, target=ECLIPTIC, unity_axes=False):
+    for plane in (source, target):
+        if plane not in (EQUATORIAL, ECLIPTIC):
+            raise ValueError(f"Unknown plane '{plane}', expected '{EQUATORIAL}' or '{ECLIPTIC}'")
+    epsilon = np.radians(OBLIQUITY_ARCSEC / 3600.0)
+    c, s = np.cos(epsilon), np.sin(epsilon)
+    # Ecliptic -> equatorial is a rotation by +epsilon about the X axis
+    to_equatorial = np.array([[1.0, 0.0, 0.0], [0.0, c, -s], [0.0, s, c]])
+    if source == target:
+        matrix = np.eye(3)
+    elif source == ECLIPTIC:
+        matrix = to_equatorial
+    else:
+        matrix = to_equatorial.T
+    return UNITY_AXES @ matrix @ UNITY_AXES if unity_axes else matrix
+
+def _output(positions, out):
+    if out is None:
+        return np.empty(positions.shape, dtype=np.result_type(positions.dtype, np.float32))
+    if out.shape != positions.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {positions.shape}")
+    return out
+
+# positions @ matrix.T into out. When out overlaps positions each block
+# goes through a small scratch buffer first.
+def rotate(positions, matrix, out=None, chunk_rows=CHUNK_ROWS):
+    positions = np.asarray(positions)
+    out = _output(positions, out)
+    if not out.flags.c_contiguous:
+        raise ValueError("out must be C-contiguous")
+    rows = positions.reshape(-1, 3)
+    out_rows = out.reshape(-1, 3)
+    matrix_t = np.asarray(matrix, dtype=out.dtype).T
+    overlap = np.shares_memory(positions, out)
+    scratch = np.empty((min(chunk_rows, len(rows)), 3), dtype=out.dtype) if overlap else None
+
+    with instrument.span('frames.rotate') as span:
+        for start in range(0, len(rows), chunk_rows):
+            stop = min(start + chunk_rows, len(rows))
+            if overlap:
+                block = scratch[:stop - start]
+                np.matmul(rows[start:stop], matrix_t, out=block)
+                out_rows[start:stop] = block
+            else:
+                np.matmul(rows[start:stop], matrix_t, out=out_rows[start:stop])
+        span.add(bytes=out.nbytes, rows=len(rows))
+    return out
+
+# Move the origin to center (positions - center), or back with inverse
+# (positions + center), e.g. barycentric <-> heliocentric with the Sun's
+# track as center
+def recenter(positions, center, out=None, inverse=False):
+    positions = np.asarray(positions)
+    out = _output(positions, out)
+    if inverse:
+        return np.add(positions, center, out=out)
+    return np.subtract(positions, center, out=out)
+
+# Recentre on center (if given), then rotate from the source plane to the
+# target plane; both steps write into out
+def transform(positions, center=None, source=EQUATORIAL, target=EQUATORIAL, unity_axes=False, out=None):
+    positions = np.asarray(positions)
+    if center is not None:
+        positions = recenter(positions, center, out)
+        out = positions
+    if source != target:
+        return rotate(positions, plane_rotation(source, target, unity_axes), out)
+    if out is None:
+        return positions.copy()
+    if out is not positions:
+        out[...] = positions
+    return out
+
+# Tracks of a PlanetData folder (barycentric, file units and axes, on the
+# source plane: equatorial unless it was fetched with another REF_PLANE,
+# see ref_plane()) in another frame: centred on the body center (None
+# keeps the barycentre) and on plane. All bodies, the centre included, must
+# share their epochs in start..end. Returns the body ids, the epochs and a
+# (bodies, epochs, 3) array, written into out if given.
+def dataset_frame(dataset, bodies=None, center=SUN_ID, plane=EQUATORIAL, start=None, end=None, out=None,
+                  source=EQUATORIAL):
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    jd, tracks = dataset.shared_tracks(bodies + ([str(center)] if center is not None else []), start, end)
+    center_track = tracks.pop() if center is not None else None
+
+    shape = (len(bodies), len(jd), 3)
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+    for i, track in enumerate(tracks):
+        out[i] = track.positions
+    center_positions = None if center_track is None else center_track.positions
+    transform(out, center_positions, source, plane, unity_axes=True, out=out)
+    return bodies, jd, out
+
+# Write a PlanetData folder in another frame, in the same format
+def write_dataset_frame(data_folder, out_folder, center=SUN_ID, plane=EQUATORIAL, bodies=None, start=None,
+                        end=None, source=EQUATORIAL):
+    if os.path.abspath(data_folder) == os.path.abspath(out_folder):
+        raise ValueError("Write the transformed dataset to a different folder")
+    bodies, jd, positions = dataset_frame(PlanetDataset(data_folder), bodies, center, plane, start, end,
+                                          source=source)
+    os.makedirs(out_folder, exist_ok=True)
+    for body_id, body_positions in zip(bodies, positions):
+        write_positions_txt(os.path.join(out_folder, f'planet_{body_id}_positions.txt'), jd, body_positions)
+    return bodies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a PlanetData folder recentred and/or on another plane")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', required=True, help="folder for the transformed planet_<id>_positions.txt")
+    parser.add_argument('--center', default=SUN_ID, help="body to centre on, or 'bary' to keep the barycentre")
+    parser.add_argument('--plane', choices=(EQUATORIAL, ECLIPTIC), default=EQUATORIAL)
+    parser.add_argument('--ref-plane', default='F', help="Horizons REF_PLANE the folder was fetched with (F or E)")
+    parser.add_argument('--bodies', nargs='+')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    args = parser.parse_args(argv)
+    instrument.configure_from_env()
+
+    started = time.perf_counter()
+    center = None if args.center == 'bary' else args.center
+    try:
+        source = ref_plane(args.ref_plane)
+    except ValueError as error:
+        parser.error(str(error))
+    bodies = write_dataset_frame(args.data_folder, args.output, center, args.plane, args.bodies, args.start,
+                                 args.end, source)
+    print(f"Wrote {len(bodies)} bodies to {args.output} in {time.perf_counter() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import logging
+
+from sagan import instrument
+from sagan.parse import parse_vector_stream
+
+logger = logging.getLogger(__name__)
+
+HORIZONS_URL = 'https://ssd.jpl.nasa.gov/horizons_batch.cgi'
+
+START_MARKER = "$$SOE"
+END_MARKER = "$$EOE"
+
+# Same request HorizonCall.cs sends to build the PlanetData sets:
+# barycentric, ICRF, one vector table row per day
+DEFAULT_PARAMS = {
+    'batch': '1',
+    'MAKE_EPHEM': 'YES',
+    'EPHEM_TYPE': "'VECTORS'",
+    'CENTER': "'500@0'",
+    'STEP_SIZE': "'1 DAYS'",
+    'VEC_TABLE': "'3'",
+    'REF_SYSTEM': "'ICRF'",
+    'REF_PLANE': "'F'",
+    'VEC_CORR': "'NONE'",
+    'CAL_TYPE': "'M'",
+    'OUT_UNITS': "'KM-S'",
+    'VEC_LABELS': "'YES'",
+    'VEC_DELTA_T': "'NO'",
+    'CSV_FORMAT': "'NO'",  # Request data in plain text format
+    'OBJ_DATA': "'YES'"
+}
+
+# Query parameters for one object; overrides replace or extend DEFAULT_PARAMS
+# and are passed through as-is, e.g. CENTER="'coord@10'"
+def horizons_params(obj_id, start_date, end_date, **overrides):
+    params = dict(DEFAULT_PARAMS)
+    params['COMMAND'] = f"'{obj_id}'"
+    params['START_TIME'] = f"'{start_date}'"
+    params['STOP_TIME'] = f"'{end_date}'"
+    params.update(overrides)
+    return params
+
+# Extract the ephemeris data between the $$SOE/$$EOE markers
+def extract_ephemeris(text):
+    start_index = text.find(START_MARKER)
+    end_index = text.find(END_MARKER)
+
+    if start_index != -1 and end_index != -1:
+        return text[start_index + len(START_MARKER):end_index].strip()
+    logger.warning("Markers not found in the response.")
+    return None
+
+# requests is only imported once something is fetched without a session
+def _http(session):
+    if session is not None:
+        return session
+    import requests
+    return requests
+
+# Send one query and return the ephemeris text, or None on an error response
+def request_ephemeris(params, session=None, timeout=None, url=HORIZONS_URL):
+    obj_id = params.get('COMMAND', '').strip("'")
+    with instrument.span('horizons.request', 'fetch', body=obj_id) as span:
+        response = _http(session).get(url, params=params, timeout=timeout)
+        span.add(bytes=len(response.content))
+    if response.status_code == 200:
+        return extract_ephemeris(response.text)
+    logger.error("Error fetching data for object %s: %s - %s", obj_id, response.status_code, response.reason)
+    return None
+
+# Function to fetch ephemeris data from Horizons.
+# Pass a requests.Session to reuse its connection pool across calls, and a
+# sagan.cache.ResponseCache to answer repeated or overlapping queries locally.
+def fetch_horizons_data(obj_id, start_date, end_date, session=None, timeout=None, url=HORIZONS_URL, cache=None, **overrides):
+    params = horizons_params(obj_id, start_date, end_date, **overrides)
+    if cache is None:
+        return request_ephemeris(params, session, timeout, url)
+    return cache.get_or_fetch(params, lambda query: request_ephemeris(query, session, timeout, url), url)
+
+# Fetch and parse a vector table while it downloads, without holding the
+# response text. Returns a sagan.parse.VectorTable, or None on an error.
+def stream_horizons_vectors(obj_id, start_date, end_date, session=None, timeout=None, url=HORIZONS_URL, chunk_size=1 << 16, **overrides):
+    params = horizons_params(obj_id, start_date, end_date, **overrides)
+    # Parsing runs inside the download, so its span nests in this one
+    with instrument.span('horizons.stream', 'fetch', body=str(obj_id)), \
+            _http(session).get(url, params=params, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            logger.error("Error fetching data for object %s: %s - %s", obj_id, response.status_code, response.reason)
+            return None
+        return parse_vector_stream(response.iter_content(chunk_size))
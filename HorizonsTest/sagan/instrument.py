@@ -0,0 +1,232 @@
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+from sagan.atomic import atomic_write
+
+# Stage-level instrumentation for the fetch -> parse -> compute -> render
+# pipeline.
+#
+#   from sagan import instrument
+#   instrument.enable(memory=True)
+#   with instrument.span('render', category='render') as span:
+#       ...
+#       span.add(rows=len(points))
+#   instrument.write_trace('trace.json')   # open in chrome://tracing or Perfetto
+#
+# Every span records its wall time and, when given, bytes transferred and
+# rows parsed; with memory=True also the tracemalloc peak above the memory
+# in use when the span started. Until enable() is called span() hands out
+# a shared no-op span, so instrumented code costs one function call.
+#
+# Scripts call configure_from_env() once: SAGAN_LOG sets the logging level
+# (default WARNING, so debug output stays quiet), SAGAN_TRACE=path records
+# spans and writes them to path at exit (SAGAN_TRACE_FORMAT=json for the
+# plain span list instead of a Chrome trace, SAGAN_TRACE_MEMORY=1 for
+# tracemalloc peaks).
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    __slots__ = ('name', 'category', 'args', 'thread', 'start', 'duration', 'bytes', 'rows', 'peak_bytes',
+                 '_base', '_peak')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.thread = threading.get_ident()
+        self.start = 0.0
+        self.duration = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.peak_bytes = None
+        self._base = self._peak = 0
+
+    # Count bytes transferred and rows parsed inside the span
+    def add(self, bytes=0, rows=0):
+        self.bytes += bytes
+        self.rows += rows
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'category': self.category,
+            'thread': self.thread,
+            'start': self.start,
+            'duration': self.duration,
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'peak_bytes': self.peak_bytes,
+            'args': self.args,
+        }
+
+class _NullSpan:
+    def add(self, bytes=0, rows=0):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+# Collects finished spans from every thread.
+#
+# tracemalloc has a single process-wide peak, so nested spans share it:
+# a span resets the peak when it starts and hands the peak it saw so far
+# to its parent first, and a finished span hands its own peak up. Spans
+# running at the same time on other threads (fetch workers) still reset
+# each other's peak, so their peak_bytes is a lower bound.
+class Recorder:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def span(self, name, category='compute', **args):
+        span = Span(name, category, args)
+        stack = self._stack()
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            span._base = span._peak = current
+        stack.append(span)
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - span.start
+            span.start -= self.origin
+            stack.pop()
+            if memory:
+                peak = max(tracemalloc.get_traced_memory()[1], span._peak)
+                span.peak_bytes = peak - span._base
+                if stack:
+                    stack[-1]._peak = max(stack[-1]._peak, peak)
+            with self._lock:
+                self.spans.append(span)
+            logger.debug("%s %s: %.3f ms, %d bytes, %d rows", span.category, span.name, span.duration * 1e3,
+                         span.bytes, span.rows)
+
+    # Totals per span name: count, seconds, bytes, rows and largest peak
+    def summary(self):
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span.name, {'category': span.category, 'count': 0, 'seconds': 0.0,
+                                                  'bytes': 0, 'rows': 0, 'peak_bytes': None})
+            total['count'] += 1
+            total['seconds'] += span.duration
+            total['bytes'] += span.bytes
+            total['rows'] += span.rows
+            if span.peak_bytes is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, span.peak_bytes)
+        return totals
+
+    def to_json(self):
+        return {
+            'spans': [span.as_dict() for span in sorted(self.spans, key=lambda span: span.start)],
+            'summary': self.summary(),
+        }
+
+    # Trace Event Format: one complete ('X') event per span, times in us
+    def to_chrome_trace(self):
+        events = []
+        for span in self.spans:
+            args = dict(span.args, bytes=span.bytes, rows=span.rows)
+            if span.peak_bytes is not None:
+                args['peak_bytes'] = span.peak_bytes
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': span.start * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': os.getpid(),
+                'tid': span.thread,
+                'args': args,
+            })
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    # Write the spans to path, as a Chrome trace or (format='json') the
+    # span list with its summary
+    def write(self, path, format='chrome'):
+        data = self.to_json() if format == 'json' else self.to_chrome_trace()
+        with atomic_write(path, 'w') as file:
+            json.dump(data, file, indent=1, default=str)
+
+_recorder = None
+_started_tracemalloc = False
+
+# Start recording spans; memory=True also traces allocations for peaks
+# (tracemalloc slows allocation-heavy code down noticeably)
+def enable(memory=False):
+    global _recorder, _started_tracemalloc
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _recorder = Recorder(memory)
+    return _recorder
+
+# Stop recording and return the recorder with what it collected
+def disable():
+    global _recorder, _started_tracemalloc
+    recorder, _recorder = _recorder, None
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    return recorder
+
+def recorder():
+    return _recorder
+
+def span(name, category='compute', **args):
+    if _recorder is None:
+        return contextlib.nullcontext(NULL_SPAN)
+    return _recorder.span(name, category, **args)
+
+# Decorator form of span(); rows, if given, maps the result to the number
+# of rows it holds
+def traced(name=None, category='compute', rows=None):
+    def decorate(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _recorder.span(span_name, category) as current:
+                result = function(*args, **kwargs)
+                if rows is not None and result is not None:
+                    current.add(rows=rows(result))
+                return result
+        return wrapper
+    return decorate
+
+def write_trace(path, format='chrome'):
+    if _recorder is not None:
+        _recorder.write(path, format)
+
+def configure_from_env(default_level='WARNING'):
+    level = os.environ.get('SAGAN_LOG', default_level).upper()
+    logging.basicConfig(level=getattr(logging, level, logging.WARNING), format='%(levelname)s %(name)s: %(message)s')
+
+    path = os.environ.get('SAGAN_TRACE')
+    if path:
+        recorder = enable(memory=os.environ.get('SAGAN_TRACE_MEMORY') == '1')
+        atexit.register(recorder.write, path, os.environ.get('SAGAN_TRACE_FORMAT', 'chrome'))
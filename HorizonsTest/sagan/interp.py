@@ -0,0 +1,119 @@
+import numpy as np
+
+from sagan.dates import to_jd
+
+SECONDS_PER_DAY = 86400.0
+
+# Cubic Hermite interpolation over sampled ephemerides.
+#
+# jd is the (n,) sample grid shared by every body; positions is (n, 3) for
+# one body or (B, n, 3) for several. velocities use the same layout in
+# position units per second (Horizons KM-S output); without them the
+# tangents are estimated with second-order finite differences, which is
+# what the planet_<id>_positions.txt files need.
+# On a uniform grid (Horizons STEP_SIZE) the segment of each query is found
+# arithmetically; otherwise with searchsorted.
+class HermiteEphemeris:
+    def __init__(self, jd, positions, velocities=None, velocity_scale=SECONDS_PER_DAY):
+        self.jd = np.asarray(jd, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64)
+        self.single = positions.ndim == 2
+        self.positions = positions[None] if self.single else positions
+        if len(self.jd) < 2 or self.positions.shape[1] != len(self.jd):
+            raise ValueError("Need at least two samples and one position row per epoch")
+
+        if velocities is None:
+            # Tangents in position units per day
+            self.tangents = np.gradient(self.positions, self.jd, axis=1, edge_order=2)
+        else:
+            velocities = np.asarray(velocities, dtype=np.float64)
+            self.tangents = (velocities[None] if self.single else velocities) * velocity_scale
+
+        steps = np.diff(self.jd)
+        self.step = steps[0]
+        self.uniform = np.allclose(steps, self.step, rtol=0, atol=1e-9)
+
+    @classmethod
+    def from_vector_table(cls, table):
+        return cls(table.jd, table.pos, table.vel)
+
+    @classmethod
+    def from_track(cls, track):
+        return cls(track.jd, track.positions)
+
+    @property
+    def n_bodies(self):
+        return self.positions.shape[0]
+
+    def _segments(self, t):
+        if np.any(t < self.jd[0] - 1e-9) or np.any(t > self.jd[-1] + 1e-9):
+            raise ValueError(f"Epochs outside the sampled range {self.jd[0]} - {self.jd[-1]}")
+        if self.uniform:
+            i = ((t - self.jd[0]) / self.step).astype(np.intp)
+        else:
+            i = np.searchsorted(self.jd, t, side='right') - 1
+        i = np.clip(i, 0, len(self.jd) - 2)
+        h = self.jd[i + 1] - self.jd[i]
+        s = (t - self.jd[i]) / h
+        return i, s, h
+
+    # Interpolated positions at epochs t (JD numbers, datetime64 or ISO).
+    # With body=None every body is evaluated at every epoch, giving
+    # (len(t), 3) for a single body or (B, len(t), 3). With body given as an
+    # index array broadcastable to t, each (body, t) pair is evaluated once,
+    # giving t.shape + (3,).
+    def __call__(self, t, body=None):
+        t = np.asarray(to_jd(t), dtype=np.float64)
+        i, s, h = self._segments(t)
+
+        s2 = s * s
+        s3 = s2 * s
+        h00 = (2 * s3 - 3 * s2 + 1)[..., None]
+        h10 = ((s3 - 2 * s2 + s) * h)[..., None]
+        h01 = (-2 * s3 + 3 * s2)[..., None]
+        h11 = ((s3 - s2) * h)[..., None]
+
+        if body is None:
+            p, m = self.positions, self.tangents
+            result = h00 * p[:, i] + h10 * m[:, i] + h01 * p[:, i + 1] + h11 * m[:, i + 1]
+            return result[0] if self.single else result
+
+        body, i = np.broadcast_arrays(np.asarray(body, dtype=np.intp), i)
+        p, m = self.positions, self.tangents
+        return h00 * p[body, i] + h10 * m[body, i] + h01 * p[body, i + 1] + h11 * m[body, i + 1]
+
+    # Time derivative of the interpolant (position units per day), with
+    # the same t and body arguments and result shapes as __call__
+    def velocity(self, t, body=None):
+        t = np.asarray(to_jd(t), dtype=np.float64)
+        i, s, h = self._segments(t)
+
+        s2 = s * s
+        d00 = ((6 * s2 - 6 * s) / h)[..., None]
+        d10 = (3 * s2 - 4 * s + 1)[..., None]
+        d01 = ((-6 * s2 + 6 * s) / h)[..., None]
+        d11 = (3 * s2 - 2 * s)[..., None]
+
+        if body is None:
+            p, m = self.positions, self.tangents
+            result = d00 * p[:, i] + d10 * m[:, i] + d01 * p[:, i + 1] + d11 * m[:, i + 1]
+            return result[0] if self.single else result
+
+        body, i = np.broadcast_arrays(np.asarray(body, dtype=np.intp), i)
+        p, m = self.positions, self.tangents
+        return d00 * p[body, i] + d10 * m[body, i] + d01 * p[body, i + 1] + d11 * m[body, i + 1]
+
+# Largest interpolation error when only every stride-th sample is kept,
+# measured against the dropped samples. Use it to pick a coarser STEP_SIZE.
+def decimation_error(jd, positions, velocities=None, stride=10):
+    jd = np.asarray(jd, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    keep = np.arange(0, len(jd), stride)
+    coarse = HermiteEphemeris(
+        jd[keep],
+        positions[..., keep, :],
+        None if velocities is None else np.asarray(velocities)[..., keep, :],
+    )
+    inside = jd <= jd[keep[-1]]
+    error = np.linalg.norm(coarse(jd[inside]) - positions[..., inside, :], axis=-1)
+    return error.max()
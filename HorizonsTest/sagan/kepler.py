@@ -0,0 +1,54 @@
+import warnings
+
+import numpy as np
+
+TWO_PI = 2 * np.pi
+
+def kepler_equation(E, M, e):
+    return E - e * np.sin(E) - M
+
+# Scalar Newton solver, kept as the reference for solve_kepler_batch
+def solve_kepler(M, e, tol=1e-6):
+    E = M  # Initial guess: mean anomaly
+    while True:
+        delta = kepler_equation(E, M, e) / (1 - e * np.cos(E))
+        E -= delta
+        if np.abs(delta) < tol:
+            break
+    return E
+
+# Solve Kepler's equation for arrays of mean anomaly and eccentricity.
+# M and e may have any shapes that broadcast together. Every element is
+# iterated in the same Newton pass and dropped from the working set once its
+# step falls below tol, so the result matches solve_kepler to within tol.
+# Elements still moving after max_iter steps are returned as they are, with
+# a RuntimeWarning giving their count.
+def solve_kepler_batch(M, e, tol=1e-6, max_iter=50):
+    M, e = np.broadcast_arrays(np.asarray(M, dtype=np.float64), np.asarray(e, dtype=np.float64))
+    shape = M.shape
+    M = M.ravel()
+    e = e.ravel()
+
+    # Work in [-pi, pi) and add the whole turns back at the end, so the root
+    # is the same branch solve_kepler converges to
+    turns = np.floor((M + np.pi) / TWO_PI)
+    M_red = M - turns * TWO_PI
+
+    # Starting guess: M + e sin(M) is good for low eccentricity; Danby's
+    # M + 0.85 e sign(sin M) keeps Newton stable close to e = 1
+    E = np.where(e < 0.8, M_red + e * np.sin(M_red), M_red + 0.85 * e * np.sign(np.sin(M_red)))
+
+    active = np.arange(E.size)
+    for _ in range(max_iter):
+        E_a = E[active]
+        e_a = e[active]
+        delta = (E_a - e_a * np.sin(E_a) - M_red[active]) / (1 - e_a * np.cos(E_a))
+        E[active] = E_a - delta
+        active = active[np.abs(delta) >= tol]
+        if active.size == 0:
+            break
+    if active.size:
+        warnings.warn(f"solve_kepler_batch: {active.size} of {E.size} elements did not converge to {tol} "
+                      f"in {max_iter} iterations", RuntimeWarning, stacklevel=2)
+
+    return (E + turns * TWO_PI).reshape(shape)[()]
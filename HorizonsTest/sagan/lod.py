@@ -0,0 +1,194 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from sagan.atomic import atomic_write
+from sagan.planetdata import SCALE_SPACE
+
+LOD_FILENAME = 'lod.npz'
+
+# Distance from each point p to the segment a-b (all (n, 3))
+def _segment_distance(p, a, b):
+    ab = b - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', p - a, ab) / np.where(length2 > 0, length2, 1.0)
+    closest = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+    return np.linalg.norm(p - closest, axis=1)
+
+# Ramer-Douglas-Peucker simplification of one or more polylines at once.
+#
+# points is (n, 3); offsets, if given, splits it into tracks the same way
+# as sagan.sampling (track i is points[offsets[i]:offsets[i + 1]]). Returns
+# the sorted indices of the points to keep: every dropped point is within
+# tolerance of the kept polyline, and the ends of every track are kept.
+# Instead of recursing per segment, each pass handles every open segment
+# of every track together, so the Python loop runs once per level of the
+# recursion (about 50 for a 60k-sample track) rather than once per segment.
+def simplify(points, tolerance, offsets=None):
+    points = np.asarray(points, dtype=np.float64)
+    offsets = np.array([0, len(points)]) if offsets is None else np.asarray(offsets, dtype=np.intp)
+    keep = np.zeros(len(points), dtype=bool)
+    lengths = np.diff(offsets)
+    keep[offsets[:-1][lengths > 0]] = True
+    keep[offsets[1:][lengths > 0] - 1] = True
+
+    starts = offsets[:-1][lengths > 2]
+    ends = offsets[1:][lengths > 2] - 1
+    while len(starts):
+        # Every interior point of every open segment, with its segment number
+        interior = ends - starts - 1
+        first = np.cumsum(interior) - interior
+        segment = np.repeat(np.arange(len(starts)), interior)
+        rows = starts[segment] + 1 + np.arange(len(segment)) - first[segment]
+        distance = _segment_distance(points[rows], points[starts[segment]], points[ends[segment]])
+
+        # Split the segments whose farthest point is out of tolerance there
+        farthest = np.maximum.reduceat(distance, first)
+        split = farthest > tolerance
+        hit = np.flatnonzero(split[segment] & (distance == farthest[segment]))
+        hit_segment, first_hit = np.unique(segment[hit], return_index=True)
+        middle = rows[hit[first_hit]]
+        keep[middle] = True
+
+        starts = np.concatenate([starts[hit_segment], middle])
+        ends = np.concatenate([middle, ends[hit_segment]])
+        still_open = ends - starts > 1
+        starts, ends = starts[still_open], ends[still_open]
+    return np.flatnonzero(keep)
+
+# Multi-level simplification of the tracks of a dataset.
+#
+# Level k keeps the points RDP needs for a tolerance of
+# base_tolerance_km * 2**k, computed from level k - 1 rather than the full
+# track, so each coarser level only revisits the points the last one kept.
+# error_km[k] bounds the distance from any original sample to the level-k
+# polyline (the tolerances of levels 0..k added up, under twice the level's
+# own). Levels hold indices into each body's full track, so positions are
+# gathered from the dataset (usually a memory map) rather than stored twice.
+class LodPyramid:
+    def __init__(self, bodies, tolerance_km, error_km, level_offsets, indices):
+        self.bodies = [str(body_id) for body_id in bodies]
+        self.tolerance_km = np.asarray(tolerance_km, dtype=np.float64)
+        self.error_km = np.asarray(error_km, dtype=np.float64)
+        self.level_offsets = np.asarray(level_offsets, dtype=np.intp)
+        self.levels = indices
+        self._body_index = {body_id: i for i, body_id in enumerate(self.bodies)}
+
+    @property
+    def n_levels(self):
+        return len(self.tolerance_km)
+
+    def __contains__(self, body_id):
+        return str(body_id) in self._body_index
+
+    def _rows(self, body_id, level):
+        i = self._body_index[str(body_id)]
+        return slice(self.level_offsets[level, i], self.level_offsets[level, i + 1])
+
+    # Indices into body_id's track of its polyline at a level
+    def indices(self, body_id, level):
+        return self.levels[level][self._rows(body_id, level)]
+
+    def counts(self, level):
+        return np.diff(self.level_offsets[level])
+
+    # Coarsest level whose error bound is within max_error_km, or None when
+    # even level 0 is too coarse and the full track is needed. For a screen
+    # budget pass the kilometers covered by one pixel.
+    def level_for_error(self, max_error_km):
+        levels = np.flatnonzero(self.error_km <= max_error_km)
+        return int(levels[-1]) if len(levels) else None
+
+    # Finest level at which body_id has at most max_points points, or None
+    # when even the coarsest level has more
+    def level_for_budget(self, body_id, max_points):
+        i = self._body_index[str(body_id)]
+        counts = np.diff(self.level_offsets[:, i:i + 2], axis=1)[:, 0]
+        levels = np.flatnonzero(counts <= max_points)
+        return int(levels[0]) if len(levels) else None
+
+    def save(self, path):
+        arrays = {
+            'bodies': np.array(self.bodies),
+            'tolerance_km': self.tolerance_km,
+            'error_km': self.error_km,
+            'level_offsets': self.level_offsets,
+        }
+        for level in range(self.n_levels):
+            arrays[f'indices_{level}'] = self.levels[level]
+        with atomic_write(path) as file:
+            np.savez_compressed(file, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            levels = len(data['tolerance_km'])
+            return cls(
+                data['bodies'],
+                data['tolerance_km'],
+                data['error_km'],
+                data['level_offsets'],
+                [data[f'indices_{level}'] for level in range(levels)],
+            )
+
+# Build a LodPyramid from {body_id: (n, 3) positions in file units}. Levels
+# are added until every body is down to min_points or max_levels is reached.
+def build_lod(tracks, base_tolerance_km=1000.0, min_points=16, max_levels=24, scale=SCALE_SPACE):
+    bodies = list(tracks)
+    points = np.concatenate([np.asarray(tracks[body_id], dtype=np.float64) for body_id in bodies])
+    offsets = np.zeros(len(bodies) + 1, dtype=np.intp)
+    np.cumsum([len(tracks[body_id]) for body_id in bodies], out=offsets[1:])
+
+    # Rows of the current level, as indices into points
+    current = np.arange(len(points))
+    tolerances, errors, level_offsets, indices = [], [], [], []
+    for level in range(max_levels):
+        tolerance_km = base_tolerance_km * 2.0**level
+        current_offsets = np.searchsorted(current, offsets)
+        current = current[simplify(points[current], tolerance_km / scale, current_offsets)]
+        current_offsets = np.searchsorted(current, offsets)
+
+        tolerances.append(tolerance_km)
+        errors.append(tolerance_km + (errors[-1] if errors else 0.0))
+        level_offsets.append(current_offsets)
+        body = np.repeat(np.arange(len(bodies)), np.diff(current_offsets))
+        indices.append((current - offsets[body]).astype(np.int32))
+        if np.all(np.diff(current_offsets) <= min_points):
+            break
+    return LodPyramid(bodies, tolerances, errors, level_offsets, indices)
+
+# Pyramid of every body of a PlanetDataset, in memory
+def dataset_lod(dataset, **options):
+    return build_lod({body_id: track.positions for body_id, track in dataset.items()}, **options)
+
+# Build the pyramid of a PlanetData folder and save it, by default there as
+# lod.npz (sagan.dataset.PlanetDataset.lod() picks it up). Only the lod
+# command calls this: the data folder may be a Unity Resources folder, so
+# reading it never writes into it.
+def build_dataset_lod(dataset, out_path=None, **options):
+    out_path = out_path or os.path.join(dataset.data_folder, LOD_FILENAME)
+    pyramid = dataset_lod(dataset, **options)
+    pyramid.save(out_path)
+    return pyramid
+
+def main(argv=None):
+    # Imported here: sagan.dataset imports this module
+    from sagan.dataset import PlanetDataset
+
+    parser = argparse.ArgumentParser(description="Build and save the LOD pyramid of a PlanetData folder")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', help=f"output file (default: <data_folder>/{LOD_FILENAME})")
+    parser.add_argument('--tolerance-km', type=float, default=1000.0, help="tolerance of the finest level")
+    parser.add_argument('--min-points', type=int, default=16, help="stop once every body is down to this")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    dataset = PlanetDataset(args.data_folder)
+    out_path = args.output or os.path.join(args.data_folder, LOD_FILENAME)
+    pyramid = build_dataset_lod(dataset, out_path, base_tolerance_km=args.tolerance_km, min_points=args.min_points)
+    print(f"Wrote {out_path} ({pyramid.n_levels} levels) in {time.perf_counter() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from sagan import instrument
+from sagan.atomic import atomic_write
+from sagan.dataset import PlanetDataset
+from sagan.dates import J2000_JD, centuries_since_j2000
+from sagan.interp import SECONDS_PER_DAY, HermiteEphemeris
+from sagan.planetdata import file_units_to_horizons
+
+# Observer-relative positions for many observer sites at once, computed
+# from barycentric body positions instead of one Horizons query per
+# (body, site) with CENTER='coord@399' and SITE_COORD.
+#
+#   sites = make_sites([0.0, -70.73], [51.48, -29.26], [0.05, 2.4], names=['greenwich', 'lasilla'])
+#   bodies, jd, vectors, ranges = observe_dataset(dataset, sites, start='2024-01-01', end='2024-02-01')
+#
+# Everything is in km on Horizons' ICRF axes (not the swapped file/Unity
+# axes); vectors is (sites, bodies, epochs, 3) and ranges (sites, bodies,
+# epochs). Earth sites are geodetic (WGS84) and turned into ICRF offsets
+# from the geocentre with the Earth rotation angle, the IAU 2006 GMST
+# polynomial and IAU 1976 precession; nutation (< 20") and polar motion are
+# left out, which moves a site by well under a kilometre. Observers
+# elsewhere are given directly as offsets from any body of the dataset
+# (zeros for its centre, like SITE_COORD='0,0,0').
+# Light-time correction moves each body back along its Hermite
+# interpolant to the epoch its light left it, solved once per body and
+# epoch from the observer body's centre and then corrected per site to
+# first order with the interpolant's velocity. The work is split into
+# epoch chunks so memory stays within memory_bytes whatever the number of
+# sites.
+
+SPEED_OF_LIGHT_KM_S = 299792.458
+
+# WGS84 ellipsoid
+EARTH_RADIUS_KM = 6378.137
+EARTH_FLATTENING = 1 / 298.257223563
+
+EARTH_ID = '399'
+
+# UT1 lags the TDB dates of the files by TT - UT1 (about 69 s in the
+# 2020s, 24 s in 1900, growing unpredictably); it only shifts the Earth's
+# rotation, by 1 km at the equator per 2 s of error
+DELTA_T_SECONDS = 69.2
+
+# Fixed-point iterations of the light-time equation; each gains a factor
+# v/c (~1e-4) in accuracy
+LIGHT_TIME_ITERATIONS = 3
+
+SITE_DTYPE = np.dtype([('name', 'U32'), ('lon', 'f8'), ('lat', 'f8'), ('height', 'f8')])
+
+# Sites from east longitudes and geodetic latitudes [deg] and heights
+# above the ellipsoid [km]
+def make_sites(lon, lat, height=0.0, names=None):
+    lon, lat, height = np.broadcast_arrays(np.atleast_1d(lon), np.atleast_1d(lat), np.atleast_1d(height))
+    sites = np.empty(lon.shape, dtype=SITE_DTYPE)
+    sites['lon'], sites['lat'], sites['height'] = lon, lat, height
+    sites['name'] = names if names is not None else [f'site{i}' for i in range(len(sites))]
+    return sites
+
+# Sites from a CSV file with name, lon, lat, height columns (a header row
+# is skipped)
+def read_sites(file_path):
+    with open(file_path, newline='') as file:
+        rows = [row for row in csv.reader(file) if row and not row[0].startswith('#')]
+    if rows and rows[0][0].strip().lower() == 'name':
+        rows = rows[1:]
+    return make_sites([float(row[1]) for row in rows], [float(row[2]) for row in rows],
+                      [float(row[3]) if len(row) > 3 else 0.0 for row in rows], [row[0].strip() for row in rows])
+
+# Body-fixed (S, 3) positions [km] of geodetic sites
+def geodetic_to_body_fixed(sites, radius=EARTH_RADIUS_KM, flattening=EARTH_FLATTENING):
+    lon, lat = np.radians(sites['lon']), np.radians(sites['lat'])
+    e2 = flattening * (2 - flattening)
+    sin_lat = np.sin(lat)
+    # Prime vertical radius of curvature
+    n = radius / np.sqrt(1 - e2 * sin_lat ** 2)
+    xy = (n + sites['height']) * np.cos(lat)
+    return np.stack([xy * np.cos(lon), xy * np.sin(lon), (n * (1 - e2) + sites['height']) * sin_lat], axis=-1)
+
+def earth_rotation_angle(jd_ut1):
+    days = np.asarray(jd_ut1, dtype=np.float64) - J2000_JD
+    turns = 0.7790572732640 + 0.00273781191135448 * days + np.mod(days, 1.0)
+    return 2 * np.pi * np.mod(turns, 1.0)
+
+# Greenwich mean sidereal time [rad]: the Earth rotation angle plus the
+# accumulated precession in right ascension (IAU 2006)
+def greenwich_mean_sidereal_time(jd_tdb, delta_t=DELTA_T_SECONDS):
+    jd_tdb = np.asarray(jd_tdb, dtype=np.float64)
+    t = centuries_since_j2000(jd_tdb)
+    arcsec = 0.014506 + t * (4612.156534 + t * (1.3915817 + t * (-0.00000044 + t * (-0.000029956))))
+    return earth_rotation_angle(jd_tdb - delta_t / SECONDS_PER_DAY) + np.radians(arcsec / 3600.0)
+
+# (n, 3, 3) IAU 1976 precession matrices from the mean equator and
+# equinox of each date to J2000 (ICRF to within 0.02")
+def precession_to_j2000(jd_tdb):
+    t = centuries_since_j2000(jd_tdb)
+    zeta = np.radians((2306.2181 + (0.30188 + 0.017998 * t) * t) * t / 3600.0)
+    z = np.radians((2306.2181 + (1.09468 + 0.018203 * t) * t) * t / 3600.0)
+    theta = np.radians((2004.3109 - (0.42665 + 0.041833 * t) * t) * t / 3600.0)
+    # J2000 -> date is R3(-z) R2(theta) R3(-zeta); this is its transpose
+    cz, sz, ct, st, cx, sx = np.cos(z), np.sin(z), np.cos(theta), np.sin(theta), np.cos(zeta), np.sin(zeta)
+    matrix = np.empty(np.shape(t) + (3, 3))
+    matrix[..., 0, 0] = cx * ct * cz - sx * sz
+    matrix[..., 1, 0] = -sx * ct * cz - cx * sz
+    matrix[..., 2, 0] = -st * cz
+    matrix[..., 0, 1] = cx * ct * sz + sx * cz
+    matrix[..., 1, 1] = -sx * ct * sz + cx * cz
+    matrix[..., 2, 1] = -st * sz
+    matrix[..., 0, 2] = cx * st
+    matrix[..., 1, 2] = -sx * st
+    matrix[..., 2, 2] = ct
+    return matrix
+
+# ICRF offsets [km] of Earth sites from the geocentre, (S, n, 3)
+def earth_site_offsets(sites, jd_tdb, delta_t=DELTA_T_SECONDS):
+    jd_tdb = np.atleast_1d(np.asarray(jd_tdb, dtype=np.float64))
+    fixed = geodetic_to_body_fixed(sites)
+    angle = greenwich_mean_sidereal_time(jd_tdb, delta_t)
+    c, s = np.cos(angle), np.sin(angle)
+    # Rotate by the sidereal angle about the pole, into the mean equator of date
+    of_date = np.stack([c * fixed[:, 0, None] - s * fixed[:, 1, None],
+                        s * fixed[:, 0, None] + c * fixed[:, 1, None],
+                        np.broadcast_to(fixed[:, 2, None], (len(fixed), len(jd_tdb)))], axis=-1)
+    return np.einsum('nij,snj->sni', precession_to_j2000(jd_tdb), of_date)
+
+# Observer-relative vectors and ranges for one chunk of epochs.
+#
+# jd is (n,), body_positions (B, n, 3) and center (n, 3), all barycentric
+# in km; center is the body the sites are on and offsets their (S, n, 3)
+# or (S, 1, 3) positions relative to it. With ephemeris (a
+# HermiteEphemeris over the same B bodies, in km) the bodies are taken at
+# the epoch their light left them. Returns (S, B, n, 3) vectors and
+# (S, B, n) ranges.
+def observer_vectors(jd, body_positions, center, offsets, ephemeris=None):
+    center = np.asarray(center, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.float64)[:, None]
+    from_center = np.asarray(body_positions, dtype=np.float64) - center
+    if ephemeris is not None:
+        # Light time from the centre, shared by every site
+        body = np.arange(len(from_center))[:, None]
+        for _ in range(LIGHT_TIME_ITERATIONS):
+            distance = np.linalg.norm(from_center, axis=-1)
+            emitted = np.maximum(jd - distance / SPEED_OF_LIGHT_KM_S / SECONDS_PER_DAY, ephemeris.jd[0])
+            from_center = ephemeris(emitted, body) - center
+        velocity = ephemeris.velocity(emitted, body) / SECONDS_PER_DAY
+
+    vectors = from_center[None] - offsets
+    ranges = np.linalg.norm(vectors, axis=-1)
+    if ephemeris is not None:
+        # A site's light leaves the body earlier or later by its extra
+        # distance / c; move the body along its velocity by that much
+        # (second-order error: a 30 km/s body over 0.02 s)
+        delay = (ranges - np.linalg.norm(from_center, axis=-1)) / SPEED_OF_LIGHT_KM_S
+        vectors -= velocity * delay[..., None]
+        ranges = np.linalg.norm(vectors, axis=-1)
+    return vectors, ranges
+
+# Epochs per chunk so that the (S, B, n, 3) vectors of a chunk, and the
+# temporaries beside them, stay within memory_bytes
+def _chunk_epochs(sites, bodies, memory_bytes):
+    return max(1, memory_bytes // (sites * bodies * 3 * 8 * 4))
+
+# observer_vectors() over all epochs in chunks: yields (rows, vectors,
+# ranges) with rows the slice of epochs each chunk covers. center is the
+# (n, 3) track of the body the sites are on; offsets the sites' (S, 3)
+# fixed offsets from it or a function (jd chunk) -> (S, n_chunk, 3).
+def iter_observations(jd, body_positions, center, offsets, ephemeris=None, memory_bytes=64 * 2**20):
+    jd = np.asarray(jd, dtype=np.float64)
+    n_sites = len(offsets(jd[:1])) if callable(offsets) else len(offsets)
+    chunk = _chunk_epochs(n_sites, len(body_positions), memory_bytes)
+    for start in range(0, len(jd), chunk):
+        rows = slice(start, min(start + chunk, len(jd)))
+        site_offsets = offsets(jd[rows]) if callable(offsets) else np.asarray(offsets, dtype=np.float64)[:, None]
+        with instrument.span('observer.chunk', sites=n_sites, epochs=rows.stop - rows.start) as span:
+            vectors, ranges = observer_vectors(jd[rows], body_positions[:, rows], center[rows], site_offsets,
+                                               ephemeris)
+            span.add(rows=ranges.size)
+        yield rows, vectors, ranges
+
+# Observer-relative vectors and ranges of bodies of a dataset from sites,
+# over start..end. sites are geodetic Earth sites (see make_sites), or,
+# with offsets_km, (S, 3) fixed ICRF offsets from observer_body. With
+# vectors=False only the ranges are kept, which is 4x less memory.
+# Returns the body ids, the epochs, vectors (or None) and ranges.
+def observe_dataset(dataset, sites=None, bodies=None, start=None, end=None, observer_body=EARTH_ID,
+                    offsets_km=None, light_time=True, vectors=True, delta_t=DELTA_T_SECONDS,
+                    memory_bytes=64 * 2**20):
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    jd, tracks = dataset.shared_tracks(bodies + [str(observer_body)], start, end)
+    observer_track = tracks.pop()
+
+    if offsets_km is not None:
+        offsets = np.asarray(offsets_km, dtype=np.float64).reshape(-1, 3)
+    elif str(observer_body) == EARTH_ID:
+        offsets = lambda chunk: earth_site_offsets(sites, chunk, delta_t)
+    else:
+        raise ValueError("Geodetic sites need the Earth as observer_body; give offsets_km for other bodies")
+
+    positions = np.stack([file_units_to_horizons(track.positions) for track in tracks])
+    center = file_units_to_horizons(observer_track.positions)
+    ephemeris = None
+    if light_time:
+        # Light from the outer planets takes hours, so the interpolant
+        # reaches two samples before (and after) the range
+        track = dataset[bodies[0]]
+        rows = track.index.range(start, end)
+        first, last = max(rows.start - 2, 0), min(rows.stop + 2, len(track))
+        padded_jd, padded = dataset.shared_tracks(bodies, track.jd[first], track.jd[last - 1])
+        ephemeris = HermiteEphemeris(padded_jd, np.stack([file_units_to_horizons(track.positions)
+                                                          for track in padded]))
+    n_sites = len(offsets) if offsets_km is not None else len(sites)
+
+    all_ranges = np.empty((n_sites, len(bodies), len(jd)))
+    all_vectors = np.empty((n_sites, len(bodies), len(jd), 3)) if vectors else None
+    with instrument.span('observer.observe', sites=n_sites, bodies=len(bodies), epochs=len(jd)):
+        for rows, chunk_vectors, chunk_ranges in iter_observations(jd, positions, center, offsets, ephemeris,
+                                                                   memory_bytes):
+            all_ranges[:, :, rows] = chunk_ranges
+            if vectors:
+                all_vectors[:, :, rows] = chunk_vectors
+    return bodies, jd, all_vectors, all_ranges
+
+def _save(path, arrays):
+    with atomic_write(path) as file:
+        np.savez(file, **arrays)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ranges (and vectors) of PlanetData bodies from many Earth sites")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', required=True, help="npz file for jd, bodies, sites, ranges [, vectors]")
+    parser.add_argument('--sites', help="CSV file of name, lon, lat, height [km] rows")
+    parser.add_argument('--site', action='append', nargs=4, metavar=('NAME', 'LON', 'LAT', 'HEIGHT'),
+                        help="one site; may be repeated")
+    parser.add_argument('--bodies', nargs='+')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--geometric', action='store_true', help="skip the light-time correction")
+    parser.add_argument('--vectors', action='store_true', help="also save the (sites, bodies, epochs, 3) vectors")
+    args = parser.parse_args(argv)
+    instrument.configure_from_env()
+
+    sites = read_sites(args.sites) if args.sites else np.empty(0, dtype=SITE_DTYPE)
+    if args.site:
+        extra = make_sites([float(site[1]) for site in args.site], [float(site[2]) for site in args.site],
+                           [float(site[3]) for site in args.site], [site[0] for site in args.site])
+        sites = np.concatenate([sites, extra])
+    if not len(sites):
+        parser.error("give --sites or at least one --site")
+
+    started = time.perf_counter()
+    bodies, jd, vectors, ranges = observe_dataset(PlanetDataset(args.data_folder), sites, args.bodies, args.start,
+                                                  args.end, light_time=not args.geometric, vectors=args.vectors)
+    arrays = {'jd': jd, 'bodies': np.array(bodies), 'sites': sites, 'ranges_km': ranges}
+    if vectors is not None:
+        arrays['vectors_km'] = vectors
+    _save(args.output, arrays)
+    print(f"{len(sites)} sites x {len(bodies)} bodies x {len(jd)} epochs in {time.perf_counter() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import numpy as np
+from sagan import instrument
+from sagan.dates import DAYS_PER_CENTURY, to_jd, centuries_since_j2000
+from sagan.kepler import solve_kepler_batch
+
+AU_KM = 149597870.7
+GAUSS_K = 0.01720209895  # Gaussian gravitational constant [rad/day]
+
+# Keplerian elements as used by the JPL approximate-positions table:
+# a [au], e, I [deg], L mean longitude [deg], long_peri [deg], long_node [deg]
+ELEMENT_DTYPE = np.dtype([
+    ('a', 'f8'),
+    ('e', 'f8'),
+    ('I', 'f8'),
+    ('L', 'f8'),
+    ('long_peri', 'f8'),
+    ('long_node', 'f8'),
+])
+
+PLANET_NAMES = ('Mercury', 'Venus', 'Earth', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune')
+
+# Elements at J2000, valid 1800 AD - 2050 AD (Earth is the EM Barycenter)
+PLANET_ELEMENTS = np.array([
+    (0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+    (0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+    (1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+    (1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+    (5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+    (9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+    (19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+    (30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+], dtype=ELEMENT_DTYPE)
+
+# Element rates per Julian century for PLANET_ELEMENTS, same field order
+PLANET_RATES = np.array([
+    (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081),
+    (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418),
+    (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0),
+    (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343),
+    (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106),
+    (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794),
+    (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589),
+    (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664),
+], dtype=ELEMENT_DTYPE)
+
+# Split a structured ELEMENT_DTYPE array, or a plain (N, 6) float array in the
+# same column order, into six (N,) float64 columns
+def element_columns(elements):
+    elements = np.asarray(elements)
+    if elements.dtype.names is not None:
+        return tuple(np.asarray(elements[name], dtype=np.float64).reshape(-1) for name in ELEMENT_DTYPE.names)
+    elements = np.asarray(elements, dtype=np.float64).reshape(-1, 6)
+    return tuple(elements[:, i] for i in range(6))
+
+# Rotation from the orbital plane (x towards perihelion) to the ecliptic,
+# built for all bodies at once as an (N, 3, 3) array.
+# The argument of perihelion is long_peri - long_node.
+def rotation_matrices(I, long_peri, long_node):
+    I = np.radians(I)
+    node = np.radians(long_node)
+    peri = np.radians(long_peri) - node
+
+    cos_I, sin_I = np.cos(I), np.sin(I)
+    cos_node, sin_node = np.cos(node), np.sin(node)
+    cos_peri, sin_peri = np.cos(peri), np.sin(peri)
+
+    R = np.empty(np.shape(I) + (3, 3))
+    R[..., 0, 0] = cos_node * cos_peri - sin_node * sin_peri * cos_I
+    R[..., 0, 1] = -cos_node * sin_peri - sin_node * cos_peri * cos_I
+    R[..., 0, 2] = sin_node * sin_I
+    R[..., 1, 0] = sin_node * cos_peri + cos_node * sin_peri * cos_I
+    R[..., 1, 1] = -sin_node * sin_peri + cos_node * cos_peri * cos_I
+    R[..., 1, 2] = -cos_node * sin_I
+    R[..., 2, 0] = sin_peri * sin_I
+    R[..., 2, 1] = cos_peri * sin_I
+    R[..., 2, 2] = cos_I
+    return R
+
+# Position in the orbital plane for eccentric anomalies E, shape E.shape + (2,)
+def orbital_plane(a, e, E):
+    xy = np.empty(np.shape(E) + (2,))
+    xy[..., 0] = a * (np.cos(E) - e)
+    xy[..., 1] = a * np.sqrt(1 - e**2) * np.sin(E)
+    return xy
+
+# Orbit tracks for N bodies in one broadcasted pass.
+# Returns an (N, num_points, 3) array of ecliptic positions in au, sampled
+# uniformly in mean anomaly like the original orbit.py. Bodies are processed in
+# chunks of chunk_size so temporaries stay bounded for large element sets.
+@instrument.traced('orbits.orbit_positions', rows=len)
+def orbit_positions(elements, num_points=500, chunk_size=4096):
+    a, e, I, L, long_peri, long_node = element_columns(elements)
+    M = np.linspace(0, 2 * np.pi, num_points)
+    R = rotation_matrices(I, long_peri, long_node)
+
+    positions = np.empty((a.size, num_points, 3))
+    for start in range(0, a.size, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        a_c = a[chunk, None]
+        e_c = e[chunk, None]
+        E = solve_kepler_batch(M[None, :], e_c)
+        xy = orbital_plane(a_c, e_c, E)
+        # (n, P, 2) @ (n, 2, 3) -> (n, P, 3)
+        np.matmul(xy, R[chunk, :, :2].transpose(0, 2, 1), out=positions[chunk])
+    return positions
+
+# Two-body mean motion for semi-major axis a [au], in degrees per century
+def mean_motion(a):
+    return np.degrees(GAUSS_K) * DAYS_PER_CENTURY / np.asarray(a, dtype=np.float64) ** 1.5
+
+# Positions of N bodies at arbitrary epochs.
+# elements are the osculating elements at J2000 (structured or (N, 6));
+# rates, if given, are their linear rates per Julian century in the same
+# layout. Without rates only L advances, at the two-body mean motion.
+# epochs may be JD numbers, datetime64 values or ISO date strings.
+# Returns an (N, len(epochs), 3) array of heliocentric ecliptic positions
+# in au; multiply by AU_KM for kilometers.
+@instrument.traced('orbits.propagate', rows=len)
+def propagate(elements, epochs, rates=None, chunk_size=1024):
+    columns = element_columns(elements)
+    T = np.atleast_1d(centuries_since_j2000(to_jd(epochs)))
+    if rates is not None:
+        rate_columns = element_columns(rates)
+    else:
+        rate_columns = None
+
+    n_bodies = columns[0].size
+    positions = np.empty((n_bodies, T.size, 3))
+    for start in range(0, n_bodies, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        if rate_columns is None:
+            a, e, I, L, long_peri, long_node = (c[chunk, None] for c in columns)
+            L = L + mean_motion(a) * T
+        else:
+            a, e, I, L, long_peri, long_node = (c[chunk, None] + r[chunk, None] * T for c, r in zip(columns, rate_columns))
+
+        # Mean anomaly from the mean longitude, reduced to [-180, 180)
+        M = np.radians((L - long_peri + 180.0) % 360.0 - 180.0)
+        E = solve_kepler_batch(M, e)
+        xy = orbital_plane(a, e, E)
+        R = rotation_matrices(I, long_peri, long_node)
+        positions[chunk] = np.einsum('...ij,...j->...i', R[..., :2], xy)
+    return positions
@@ -0,0 +1,139 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from sagan import instrument
+
+START_MARKER = b"$$SOE"
+END_MARKER = b"$$EOE"
+
+# One VEC_TABLE 2/3 record: the epoch line, then the X/Y/Z and VX/VY/VZ rows.
+# The trailing newline is required so a record cut at a chunk boundary is
+# never taken with a truncated last value.
+RECORD = re.compile(
+    rb'(\d+\.\d+)[ \t]*=[^\n]*\n'
+    rb'\s*X\s*=\s*(\S+)\s*Y\s*=\s*(\S+)\s*Z\s*=\s*(\S+)[ \t]*\r?\n'
+    rb'\s*VX\s*=\s*(\S+)\s*VY\s*=\s*(\S+)\s*VZ\s*=\s*(\S+)[ \t]*\r?\n'
+)
+
+# Unparsed bytes allowed to pile up without finding a record
+MAX_PENDING_BYTES = 1 << 20
+
+# jd: (n,) TDB Julian Dates, pos: (n, 3) [km], vel: (n, 3) [km/s]
+VectorTable = namedtuple('VectorTable', ['jd', 'pos', 'vel'])
+
+# float64 row buffer that doubles its capacity as rows are appended
+class GrowableRows:
+    def __init__(self, columns, capacity=1024):
+        self._data = np.empty((max(capacity, 1), columns))
+        self.size = 0
+
+    def extend(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data)), self._data.shape[1]))
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:needed] = rows
+        self.size = needed
+
+    @property
+    def rows(self):
+        return self._data[:self.size]
+
+# Calendar dates after the epochs' JDs ("A.D. 2000-Jan-01 00:00:00.0000 TDB")
+# and the LT/RG/RR rows of VEC_TABLE 3, removed before the numbers are read
+AD_DATE = re.compile(rb'A\.D\.[^\n]*')
+BC_DATE = re.compile(rb'B\.C\.[^\n]*')
+LIGHT_TIME_ROW = re.compile(rb'LT=[^\n]*')
+
+# Row labels and separators left around the numbers
+LABEL_BYTES = b"XYZV=\r"
+
+# Fast path for well-formed tables, without touching single lines: drop the
+# dates and LT rows and delete the label characters over the whole buffer,
+# then let numpy read every number in one call as rows of JD, X, Y, Z, VX,
+# VY, VZ. Returns None unless exactly seven numbers per epoch come out, so
+# the caller can fall back to the RECORD regex.
+def _split_records(buffer):
+    buffer, n = AD_DATE.subn(b" ", buffer)
+    if b"B.C." in buffer:
+        buffer, bc = BC_DATE.subn(b" ", buffer)
+        n += bc
+    if n == 0:
+        return None
+    if b"LT=" in buffer:
+        buffer = LIGHT_TIME_ROW.sub(b" ", buffer)
+    values = np.fromstring(buffer.translate(None, LABEL_BYTES), sep=" ")
+    if values.size != 7 * n:
+        return None
+    return values.reshape(n, 7)
+
+def _parse_records(buffer, rows):
+    data = _split_records(buffer)
+    if data is not None:
+        rows.extend(data)
+        return len(data)
+    matches = RECORD.findall(buffer)
+    if matches:
+        rows.extend(np.array(matches, dtype='S32').astype(np.float64))
+    return len(matches)
+
+# Parse a Horizons vector table from an iterable of byte (or str) chunks,
+# e.g. response.iter_content(). Only the unparsed tail of the stream is kept
+# in memory; values go straight into a growable float64 buffer sized by
+# expected_rows. Everything before $$SOE and after $$EOE is skipped.
+def parse_vector_stream(chunks, expected_rows=1024):
+    with instrument.span('parse.vector_stream', 'parse') as span:
+        table = _parse_stream(chunks, expected_rows, span)
+        span.add(rows=len(table.jd))
+    return table
+
+def _parse_stream(chunks, expected_rows, span):
+    rows = GrowableRows(7, expected_rows)
+    pending = b""
+    in_table = False
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        span.add(bytes=len(chunk))
+        pending += chunk
+
+        if not in_table:
+            index = pending.find(START_MARKER)
+            if index == -1:
+                pending = pending[-(len(START_MARKER) - 1):]
+                continue
+            pending = pending[index + len(START_MARKER):]
+            in_table = True
+
+        end = pending.find(END_MARKER)
+        if end != -1:
+            _parse_records(pending[:end] + b"\n", rows)
+            pending = b""
+            break
+
+        # Parse up to the end of the last complete VZ row and keep the
+        # remainder for the next chunk
+        last_vz = pending.rfind(b"VZ")
+        cut = pending.find(b"\n", last_vz) + 1
+        if last_vz != -1 and cut > 0 and _parse_records(pending[:cut], rows):
+            pending = pending[cut:]
+        elif last_vz == -1 and len(pending) > MAX_PENDING_BYTES:
+            raise ValueError("No vector table records found; expected VEC_TABLE 2 or 3 output")
+
+    data = rows.rows
+    return VectorTable(data[:, 0].copy(), data[:, 1:4].copy(), data[:, 4:7].copy())
+
+# Bytes of text handed to the stream parser at a time by parse_vector_text
+TEXT_CHUNK = 1 << 20
+
+# Parse the text between the markers, as returned by fetch_horizons_data.
+# It goes through the stream parser in TEXT_CHUNK slices, so only one slice
+# at a time is copied while the labels are stripped.
+def parse_vector_text(text):
+    data = memoryview(text.encode() if isinstance(text, str) else text)
+    chunks = (data[start:start + TEXT_CHUNK] for start in range(0, len(data), TEXT_CHUNK))
+    return parse_vector_stream([START_MARKER, b"\n", *chunks, b"\n", END_MARKER])
@@ -0,0 +1,103 @@
+import os
+import re
+
+import numpy as np
+
+from sagan import instrument
+from sagan.dates import format_horizons_dates, parse_horizons_dates
+
+# HorizonCall.cs divides kilometers by scaleSpace and swaps Y and Z so that
+# Horizons' Z axis points "up" in Unity
+SCALE_SPACE = 10000.0
+
+# planet_<id>_positions.txt, as written by HorizonCall.cs
+POSITIONS_FILE = re.compile(r'^planet_(.+)_positions\.txt$')
+
+# Map body ID -> path for every positions file in a PlanetData folder
+def dataset_files(data_folder):
+    files = {}
+    for filename in sorted(os.listdir(data_folder)):
+        match = POSITIONS_FILE.match(filename)
+        if match:
+            files[match.group(1)] = os.path.join(data_folder, filename)
+    return files
+
+# Read a planet_<id>_positions.txt file in one pass.
+# Returns (dates, positions) with dates as a bytes array of the Horizons
+# date strings and positions as an (n, 3) float64 array in file units.
+def read_positions_txt(file_path):
+    with open(file_path, 'rb') as file:
+        raw = file.read().replace(b'\r', b'')
+    if raw.startswith(b'Date'):
+        raw = raw[raw.find(b'\n') + 1:]
+
+    raw = raw.strip(b'\n')
+    if b'\n\n' in raw:
+        raw = b'\n'.join(line for line in raw.split(b'\n') if line.strip())
+    if not raw:
+        return np.empty(0, dtype='S34'), np.empty((0, 3))
+
+    fields = raw.replace(b'\n', b',').split(b',')
+    if len(fields) % 4:
+        raise ValueError(f"{file_path}: expected 'Date, X, Y, Z' rows")
+    dates = np.array(fields[0::4], dtype='S')
+    positions = np.array(fields, dtype='S').reshape(-1, 4)[:, 1:].astype(np.float64)
+    return np.char.strip(dates), positions
+
+# (dates, positions) like planetinfo.py's original line-by-line reader:
+# dates as a list of str, positions as an (n, 3) float64 array
+def load_planet_data(file_path):
+    dates, positions = read_positions_txt(file_path)
+    return [date.decode() for date in dates], positions
+
+# Same as read_positions_txt, with the dates converted to Julian Dates
+def read_positions_jd(file_path):
+    with instrument.span('planetdata.read_positions_jd', 'load', file=os.path.basename(file_path)) as span:
+        dates, positions = read_positions_txt(file_path)
+        span.add(bytes=os.path.getsize(file_path), rows=len(positions))
+        return parse_horizons_dates(dates), positions
+
+# Horizons (x, y, z) [km] -> file/Unity units (x, z, y) / SCALE_SPACE
+def horizons_to_file_units(positions_km, scale=SCALE_SPACE):
+    positions_km = np.asarray(positions_km, dtype=np.float64)
+    return positions_km[..., [0, 2, 1]] / scale
+
+# Inverse of horizons_to_file_units
+def file_units_to_horizons(positions, scale=SCALE_SPACE):
+    positions = np.asarray(positions, dtype=np.float64)
+    return positions[..., [0, 2, 1]] * scale
+
+HEADER = "Date, X, Y, Z\n"
+
+# Rows in the planet_<id>_positions.txt layout. Values get 7 significant
+# digits, like Unity's float.ToString().
+def format_positions_rows(jd, positions):
+    dates = format_horizons_dates(jd)
+    values = np.char.mod('%.7g', np.asarray(positions, dtype=np.float32).astype(np.float64)).tolist()
+    return "".join(f"{date}, {x}, {y}, {z}\n" for date, (x, y, z) in zip(dates, values))
+
+def write_positions_txt(file_path, jd, positions):
+    with open(file_path, 'w', newline='\n') as file:
+        file.write(HEADER)
+        file.write(format_positions_rows(jd, positions))
+
+# Last count rows of a positions file, read from its end without scanning
+# the rest. Returns (jd, positions) like read_positions_jd.
+def read_last_rows(file_path, count=2, block_size=4096):
+    with open(file_path, 'rb') as file:
+        size = file.seek(0, os.SEEK_END)
+        read = min(size, block_size)
+        while True:
+            file.seek(size - read)
+            tail = file.read(read)
+            lines = [line for line in tail.replace(b'\r', b'').split(b'\n') if line.strip()]
+            if read == size or len(lines) > count:
+                break
+            read = min(size, read * 2)
+    lines = [line for line in lines[-count:] if not line.startswith(b'Date')]
+    if not lines:
+        return np.empty(0), np.empty((0, 3))
+    fields = [field.strip() for line in lines for field in line.split(b',')]
+    dates = np.array(fields[0::4], dtype='S')
+    positions = np.array(fields, dtype='S').reshape(-1, 4)[:, 1:].astype(np.float64)
+    return parse_horizons_dates(dates), positions
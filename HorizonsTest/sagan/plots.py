@@ -0,0 +1,202 @@
+import argparse
+import logging
+
+import numpy as np
+
+from sagan import instrument
+from sagan.cache import ResponseCache
+from sagan.dataset import PlanetDataset
+from sagan.orbits import PLANET_ELEMENTS, PLANET_NAMES
+from sagan.parse import parse_vector_text
+from sagan.planetdata import SCALE_SPACE
+from sagan.render import body_colors, legend_handles, track_collection, use_agg
+from sagan.sampling import adaptive_orbit_positions, pixel_tolerance
+
+# Figures drawn by the HorizonsTest scripts. matplotlib (and requests, for
+# plot_vectors) is imported only when a figure is made, so importing this
+# module, or sagan, does not pay for it. Every function either shows its
+# figure or, given output, writes it to that file without a display; see
+# sagan.render for animation frames.
+
+logger = logging.getLogger(__name__)
+
+# Labels query.py gives its bodies
+BODY_NAMES = {'10': 'Sol', '199': 'Mercurio', '299': 'Venus', '399': 'Terra', '499': 'Marte'}
+
+# pyplot, on the Agg backend when the figure only goes to a file
+def _pyplot(output=None):
+    if output:
+        return use_agg()
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D  # registers the '3d' projection on older matplotlib
+    return plt
+
+def _axes3d(output=None):
+    fig = _pyplot(output).figure()
+    return fig, fig.add_subplot(111, projection='3d')
+
+# Fetch vector tables for objects {obj_id: (start_date, end_date)} and
+# scatter their positions (km / scale) in 3D, as query.py does. overrides
+# are Horizons parameters, e.g. CENTER="'coord@10'"; cache is a
+# sagan.cache.ResponseCache. Returns the figure.
+def plot_vectors(objects, scale=SCALE_SPACE, names=BODY_NAMES, cache=None, show=True, output=None, **overrides):
+    from sagan.fetch import fetch_many
+
+    with instrument.span('plots.fetch', 'fetch', bodies=len(objects)) as span:
+        results = fetch_many(objects, cache=cache, **overrides)
+        span.add(bytes=sum(len(text) for text in results.values() if text))
+
+    tables = {}
+    for obj_id in objects:
+        if results[obj_id]:
+            positions = parse_vector_text(results[obj_id]).pos / scale
+            logger.debug("%s: %d positions", obj_id, len(positions))
+            if len(positions):
+                tables[obj_id] = positions
+
+    # Every body in one scatter, coloured per body
+    fig, ax = _axes3d(output)
+    max_range = 0.0
+    if tables:
+        colors = body_colors(len(tables))
+        points = np.concatenate(list(tables.values()))
+        point_colors = np.repeat(colors, [len(positions) for positions in tables.values()])
+        with instrument.span('plots.scatter', 'render', bodies=len(tables)) as span:
+            ax.scatter(points[:, 0], points[:, 1], points[:, 2], marker='o', c=point_colors)
+            ax.legend(handles=legend_handles([names.get(obj_id, obj_id) for obj_id in tables], colors, marker='o'))
+            span.add(rows=len(points))
+        max_range = float(np.abs(points).max())
+
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_zlabel('Z')
+    # Same scale on every axis
+    if max_range > 0:
+        ax.set_xlim([-max_range, max_range])
+        ax.set_ylim([-max_range, max_range])
+        ax.set_zlim([-max_range, max_range])
+    return _finish(fig, show, output)
+
+# Closed orbits from Keplerian elements, with only as many points as the
+# figure needs: the widest orbit spans about pixels pixels and is drawn
+# within max_error_px of the true ellipse. Draws 3D axes when three_d.
+def plot_element_orbits(elements=None, names=None, three_d=False, pixels=1000, max_error_px=0.05, show=True,
+                        output=None):
+    if elements is None:
+        elements, names = PLANET_ELEMENTS, names or PLANET_NAMES
+    names = names or [str(i) for i in range(len(elements))]
+    extent = 2 * np.max(elements['a'] * (1 + elements['e']))
+    positions, offsets = adaptive_orbit_positions(elements, pixel_tolerance(extent, pixels, max_error_px))
+    orbits = {name: positions[offsets[i]:offsets[i + 1]].T for i, name in enumerate(names)}
+
+    plt = _pyplot(output)
+    with instrument.span('plots.orbits', 'render', bodies=len(orbits)) as span:
+        if three_d:
+            fig = plt.figure(figsize=(12, 12))
+            ax = fig.add_subplot(111, projection='3d')
+            ax.add_collection3d(track_collection([orbit.T for orbit in orbits.values()]))
+            ax.auto_scale_xyz(positions[:, 0], positions[:, 1], positions[:, 2])
+            ax.scatter(0, 0, 0, color='orange')
+            ax.set_xlabel('X [au]')
+            ax.set_ylabel('Y [au]')
+            ax.set_zlabel('Z [au]')
+        else:
+            fig = plt.figure(figsize=(10, 10))
+            ax = fig.add_subplot(111)
+            ax.add_collection(track_collection([orbit[:2].T for orbit in orbits.values()]))
+            ax.scatter(0, 0, color='orange')
+            ax.set_xlabel('x [au]')
+            ax.set_ylabel('y [au]')
+            ax.grid(True)
+            ax.axis('equal')
+        ax.set_title('Orbits of Planets in the Solar System')
+        sun = legend_handles(['Sun'], ['orange'], marker='o')
+        ax.legend(handles=legend_handles(list(orbits)) + sun)
+        span.add(rows=len(positions))
+    return _finish(fig, show, output)
+
+# Tracks of a PlanetData folder in 3D, as planetinfo.py draws them.
+# Bodies are loaded only when accessed and only start..end is drawn;
+# max_points caps the points drawn per body using the dataset's LOD pyramid.
+def plot_dataset(data_folder, bodies=None, start=None, end=None, max_points=5000, show=True, output=None):
+    fig, ax = _axes3d(output)
+    dataset = PlanetDataset(data_folder)
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    polylines = [dataset.polyline(body_id, start, end, max_points) for body_id in bodies]
+    # A folder without planet_<id>_positions.txt files gives empty axes,
+    # as planetinfo.py always did
+    if polylines:
+        with instrument.span('plots.tracks', 'render', bodies=len(bodies)) as span:
+            ax.add_collection3d(track_collection(polylines))
+            points = np.concatenate(polylines)
+            ax.auto_scale_xyz(points[:, 0], points[:, 1], points[:, 2])
+            ax.legend(handles=legend_handles(bodies))
+            span.add(rows=len(points))
+
+    ax.set_xlabel("X (km)")
+    ax.set_ylabel("Y (km)")
+    ax.set_zlabel("Z (km)")
+    ax.set_title("Planetary Orbits in Kilometers")
+    return _finish(fig, show, output)
+
+def _finish(fig, show, output=None):
+    if output:
+        with instrument.span('plots.save', 'render'):
+            fig.savefig(output)
+    elif show:
+        with instrument.span('plots.show', 'render'):
+            _pyplot().show()
+    return fig
+
+# 'KEY=VALUE' command line options -> Horizons parameter overrides
+def _overrides(pairs):
+    overrides = {}
+    for pair in pairs or ():
+        key, _, value = pair.partition('=')
+        overrides[key.strip().upper()] = value if value.startswith("'") else f"'{value}'"
+    return overrides
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot Horizons vectors, element orbits or a PlanetData folder")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help="fetch vector tables and scatter them, like query.py")
+    query.add_argument('body_ids', nargs='+')
+    query.add_argument('--start', default='2023-01-01')
+    query.add_argument('--end', default='2024-01-01')
+    query.add_argument('--scale', type=float, default=SCALE_SPACE, help="divide kilometers by this")
+    query.add_argument('--param', action='append', metavar='KEY=VALUE', help="extra Horizons parameter")
+    query.add_argument('--no-cache', action='store_true')
+
+    orbits = commands.add_parser('orbits', help="planet orbits from Keplerian elements")
+    orbits.add_argument('names', nargs='*', help="planets to draw (default: all eight)")
+    orbits.add_argument('--3d', dest='three_d', action='store_true')
+
+    dataset = commands.add_parser('dataset', help="tracks of a PlanetData folder, like planetinfo.py")
+    dataset.add_argument('data_folder')
+    dataset.add_argument('--bodies', nargs='+')
+    dataset.add_argument('--start')
+    dataset.add_argument('--end')
+    dataset.add_argument('--max-points', type=int, default=5000)
+
+    for command in (query, orbits, dataset):
+        command.add_argument('-o', '--output', help="write the figure to this file instead of showing it")
+    args = parser.parse_args(argv)
+    instrument.configure_from_env()
+
+    if args.command == 'query':
+        objects = {body_id: (args.start, args.end) for body_id in args.body_ids}
+        plot_vectors(objects, args.scale, cache=None if args.no_cache else ResponseCache(), output=args.output,
+                     **_overrides(args.param))
+    elif args.command == 'orbits':
+        names = args.names or list(PLANET_NAMES)
+        unknown = set(names) - set(PLANET_NAMES)
+        if unknown:
+            parser.error(f"unknown planets: {', '.join(sorted(unknown))}")
+        elements = PLANET_ELEMENTS[[PLANET_NAMES.index(name) for name in names]]
+        plot_element_orbits(elements, names, args.three_d, output=args.output)
+    else:
+        plot_dataset(args.data_folder, args.bodies, args.start, args.end, args.max_points, output=args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import logging
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from sagan.atomic import atomic_write
+from sagan.dates import to_jd
+from sagan.interp import HermiteEphemeris
+from sagan.planetdata import SCALE_SPACE
+
+logger = logging.getLogger(__name__)
+
+PYRAMID_FILENAME = 'pyramid.npz'
+
+# Horizons ID of the Sun, used for heliocentric distances
+SUN_ID = '10'
+
+# One level of a TimePyramid. Row i summarizes count[i] consecutive
+# samples starting at jd[i]: the position at jd[i] and the min/max/mean
+# distance from the Sun (km) over the block.
+Level = namedtuple('Level', ['jd', 'positions', 'count', 'min', 'max', 'mean'])
+
+# Temporal multi-resolution view of one body's track.
+#
+# Level 0 is the track itself; each next level merges factor rows of the
+# previous one (daily -> 8-day -> 64-day -> ...) until a level has at most
+# factor rows. stats() answers min/max/mean over any date range by walking
+# up the levels like a segment tree, reading at most 2 * (factor - 1) rows
+# per level instead of every sample; samples() returns the coarsest level
+# that is still as fine as the requested step.
+class TimePyramid:
+    def __init__(self, levels, factor=8):
+        self.levels = levels
+        self.factor = factor
+
+    @classmethod
+    def build(cls, jd, positions, distance, factor=8):
+        jd = np.asarray(jd, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float32)
+        distance = np.asarray(distance, dtype=np.float64)
+        levels = [Level(jd, positions, np.ones(len(jd), dtype=np.int64), distance, distance, distance)]
+        while len(levels[-1].jd) > factor:
+            below = levels[-1]
+            starts = np.arange(0, len(below.jd), factor)
+            count = np.add.reduceat(below.count, starts)
+            total = np.add.reduceat(below.mean * below.count, starts)
+            levels.append(Level(
+                below.jd[starts],
+                below.positions[starts],
+                count,
+                np.minimum.reduceat(below.min, starts),
+                np.maximum.reduceat(below.max, starts),
+                total / count,
+            ))
+        return cls(levels, factor)
+
+    @property
+    def step(self):
+        return self.levels[0].jd[1] - self.levels[0].jd[0] if len(self.levels[0].jd) > 1 else 0.0
+
+    def _rows(self, start, end):
+        jd = self.levels[0].jd
+        first = 0 if start is None else int(np.searchsorted(jd, to_jd(start) - 1e-6, side='left'))
+        last = len(jd) if end is None else int(np.searchsorted(jd, to_jd(end) + 1e-6, side='right'))
+        return first, max(first, last)
+
+    # (min, max, mean) distance from the Sun in km over start <= jd <= end;
+    # either bound may be None. NaNs when the range has no samples.
+    def stats(self, start=None, end=None):
+        lo, hi = self._rows(start, end)
+        low, high, total, count = np.inf, -np.inf, 0.0, 0
+        for k, level in enumerate(self.levels):
+            if lo >= hi:
+                break
+            # Rows of this level not covered by whole blocks of the next one
+            if k == len(self.levels) - 1:
+                head = tail = hi
+            else:
+                head = min(hi, -(-lo // self.factor) * self.factor)
+                tail = max(head, hi // self.factor * self.factor)
+            for rows in (slice(lo, head), slice(tail, hi)):
+                if rows.start < rows.stop:
+                    low = min(low, level.min[rows].min())
+                    high = max(high, level.max[rows].max())
+                    total += np.dot(level.mean[rows], level.count[rows])
+                    count += level.count[rows].sum()
+            lo, hi = head // self.factor, tail // self.factor
+        if count == 0:
+            return np.nan, np.nan, np.nan
+        return low, high, total / count
+
+    # Coarsest level whose sample spacing is at most step_days
+    def level_for(self, step_days):
+        spacing = self.step * self.factor ** np.arange(len(self.levels))
+        return int(np.flatnonzero(spacing <= step_days + 1e-9)[-1]) if step_days >= self.step else 0
+
+    # (jd, positions) over start <= jd <= end with samples at most
+    # step_days apart (every sample when step_days is None)
+    def samples(self, start=None, end=None, step_days=None):
+        level = self.levels[0 if step_days is None else self.level_for(step_days)]
+        first = 0 if start is None else int(np.searchsorted(level.jd, to_jd(start) - 1e-6, side='left'))
+        last = len(level.jd) if end is None else int(np.searchsorted(level.jd, to_jd(end) + 1e-6, side='right'))
+        return level.jd[first:last], level.positions[first:last]
+
+# Distance from the Sun in km for positions in file units. Without a Sun
+# track (or for the Sun itself) the distance is from the barycenter.
+def sun_distance(positions, sun_positions=None, scale=SCALE_SPACE):
+    positions = np.asarray(positions, dtype=np.float64)
+    if sun_positions is not None:
+        positions = positions - np.asarray(sun_positions, dtype=np.float64)
+    return np.linalg.norm(positions, axis=1) * scale
+
+# Sun positions at the epochs jd: its samples where it has them, Hermite
+# interpolation otherwise (after a partial update, or for a body fetched
+# with another STEP_SIZE), and its first or last sample outside its range
+def _sun_positions(sun, jd):
+    rows = sun.index.locate(jd)
+    if np.all(rows >= 0):
+        return sun.positions[rows]
+    inside = np.clip(jd, sun.jd[0], sun.jd[-1])
+    if not np.array_equal(inside, jd):
+        logger.warning("Sun track %s - %s does not cover %s - %s; holding its end positions",
+                       sun.jd[0], sun.jd[-1], jd[0], jd[-1])
+    return HermiteEphemeris.from_track(sun)(inside)
+
+# Build the pyramid of every body of a PlanetDataset
+def build_pyramids(dataset, factor=8):
+    sun = dataset[SUN_ID] if SUN_ID in dataset else None
+    pyramids = {}
+    for body_id, track in dataset.items():
+        sun_positions = _sun_positions(sun, track.jd) if sun is not None and body_id != SUN_ID else None
+        distance = sun_distance(track.positions, sun_positions)
+        pyramids[body_id] = TimePyramid.build(track.jd, track.positions, distance, factor)
+    return pyramids
+
+# Save pyramids to path. Level 0 repeats the track, so only its distances
+# are saved; load_pyramids takes the rest from the dataset.
+def save_pyramids(path, pyramids):
+    arrays = {'bodies': np.array(list(pyramids))}
+    for body_id, pyramid in pyramids.items():
+        arrays[f'{body_id}_factor'] = np.array(pyramid.factor)
+        arrays[f'{body_id}_levels'] = np.array(len(pyramid.levels))
+        arrays[f'{body_id}_0_distance'] = pyramid.levels[0].mean
+        for k, level in enumerate(pyramid.levels[1:], 1):
+            for field in Level._fields:
+                arrays[f'{body_id}_{k}_{field}'] = getattr(level, field)
+    with atomic_write(path) as file:
+        np.savez(file, **arrays)
+
+def load_pyramids(path, dataset):
+    pyramids = {}
+    with np.load(path) as data:
+        for body_id in map(str, data['bodies']):
+            track = dataset[body_id]
+            distance = data[f'{body_id}_0_distance']
+            levels = [Level(track.jd, track.positions, np.ones(len(track.jd), dtype=np.int64), distance, distance, distance)]
+            for k in range(1, int(data[f'{body_id}_levels'])):
+                levels.append(Level(*(data[f'{body_id}_{k}_{field}'] for field in Level._fields)))
+            pyramids[body_id] = TimePyramid(levels, int(data[f'{body_id}_factor']))
+    return pyramids
+
+def main(argv=None):
+    # Imported here: sagan.dataset imports this module
+    from sagan.dataset import PlanetDataset
+
+    parser = argparse.ArgumentParser(description="Build and save the temporal pyramids of a PlanetData folder")
+    parser.add_argument('data_folder')
+    parser.add_argument('-o', '--output', help=f"output file (default: <data_folder>/{PYRAMID_FILENAME})")
+    parser.add_argument('--factor', type=int, default=8, help="samples merged per level")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    out_path = args.output or os.path.join(args.data_folder, PYRAMID_FILENAME)
+    pyramids = build_pyramids(PlanetDataset(args.data_folder), args.factor)
+    save_pyramids(out_path, pyramids)
+    print(f"Wrote {out_path} ({len(pyramids)} bodies) in {time.perf_counter() - started:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import numpy as np
+
+from sagan import instrument
+from sagan.orbits import element_columns, orbital_plane, rotation_matrices
+
+# Curvature-adaptive orbit sampling.
+#
+# Along the ellipse x = a (cos E - e), y = b sin E the speed is a q and the
+# curvature b / (a^2 q^3), with q = sqrt(1 - e^2 cos^2 E). A chord of arc
+# length s deviates from the curve by about curvature * s^2 / 8, so a step
+# dE keeps the chordal error at tolerance when
+#
+#   dE = sqrt(8 tolerance q / b)
+#
+# i.e. a point density dN/dE = sqrt(b / (8 tolerance)) / sqrt(q). Points are
+# placed at equal steps of the integrated density: densest at perihelion
+# and aphelion where the ellipse bends most, and only as many as the
+# tolerance needs. Results are ragged, as a flat array plus offsets, where
+# body i owns rows offsets[i]:offsets[i + 1].
+
+# Fixed E grid used to integrate the density; the integrand is smooth, so
+# this is exact to well under one point for any e < 0.99
+_GRID = 512
+
+# Tolerance in au for a maximum error of max_error_px pixels when extent_au
+# is drawn across pixels pixels
+def pixel_tolerance(extent_au, pixels, max_error_px=0.5):
+    return max_error_px * extent_au / pixels
+
+def _density(a, e, tolerance, E):
+    b = a * np.sqrt(1 - e**2)
+    q = np.sqrt(1 - (e * np.cos(E))**2)
+    return np.sqrt(b / (8 * tolerance)) / np.sqrt(q)
+
+# Cumulative point count along E in [0, 2 pi] on the integration grid,
+# shape (N, _GRID + 1), by the trapezoidal rule
+def _cumulative(a, e, tolerance):
+    E = np.linspace(0, 2 * np.pi, _GRID + 1)
+    density = _density(a[:, None], e[:, None], tolerance[:, None], E)
+    steps = 0.5 * (density[:, 1:] + density[:, :-1]) * (E[1] - E[0])
+    cumulative = np.zeros(density.shape)
+    np.cumsum(steps, axis=1, out=cumulative[:, 1:])
+    return E, cumulative
+
+# Smallest number of segments per orbit that keeps the chordal error
+# within tolerance (same length unit as a, scalar or per body)
+def segment_counts(a, e, tolerance, min_segments=8):
+    a, e, tolerance = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in np.broadcast_arrays(a, e, tolerance))
+    _, cumulative = _cumulative(a.ravel(), e.ravel(), tolerance.ravel())
+    return np.maximum(np.ceil(cumulative[:, -1]), min_segments).astype(np.intp).reshape(a.shape)
+
+# Eccentric anomalies for closed orbit polylines: segments[i] + 1 values
+# per body, from 0 to 2 pi inclusive. Returns (E, offsets).
+def adaptive_anomalies(a, e, tolerance, min_segments=8):
+    a, e, tolerance = (np.asarray(v, dtype=np.float64).ravel() for v in np.broadcast_arrays(a, e, tolerance))
+    E_grid, cumulative = _cumulative(a, e, tolerance)
+    segments = np.maximum(np.ceil(cumulative[:, -1]), min_segments).astype(np.intp)
+    counts = segments + 1
+    offsets = np.zeros(a.size + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+
+    # Invert every body's cumulative count in one np.interp call: normalise
+    # each to [0, 1] and shift body i by 2 i, which keeps the concatenation
+    # strictly increasing across bodies
+    body = np.repeat(np.arange(a.size), counts)
+    k = np.arange(offsets[-1]) - offsets[body]
+    targets = 2 * body + k / segments[body]
+    normalised = cumulative / cumulative[:, -1:] + 2 * np.arange(a.size)[:, None]
+    E = np.interp(targets, normalised.ravel(), np.tile(E_grid, a.size))
+    return E, offsets
+
+# Adaptive counterpart of orbits.orbit_positions. Returns (positions,
+# offsets) with positions a (total, 3) array of ecliptic positions in au;
+# the orbit of body i is positions[offsets[i]:offsets[i + 1]], closed (its
+# first and last points coincide). tolerance is the largest allowed
+# distance between the polyline and the ellipse, in au, scalar or per body;
+# see pixel_tolerance for a screen-space budget.
+@instrument.traced('sampling.adaptive_orbit_positions', rows=lambda result: len(result[0]))
+def adaptive_orbit_positions(elements, tolerance, min_segments=8):
+    a, e, I, L, long_peri, long_node = element_columns(elements)
+    E, offsets = adaptive_anomalies(a, e, tolerance, min_segments)
+    body = np.repeat(np.arange(a.size), np.diff(offsets))
+    xy = orbital_plane(a[body], e[body], E)
+    R = rotation_matrices(I, long_peri, long_node)
+    positions = np.einsum('nij,nj->ni', R[body, :, :2], xy)
+    return positions, offsets
+
+# Largest distance between each polyline and its ellipse, measured at the
+# midpoint anomaly of every segment (where a chord strays furthest).
+# E and offsets as returned by adaptive_anomalies.
+def chordal_error(a, e, E, offsets):
+    a, e = (np.asarray(v, dtype=np.float64).ravel() for v in np.broadcast_arrays(a, e))
+    body = np.repeat(np.arange(a.size), np.diff(offsets))
+    points = orbital_plane(a[body], e[body], E)
+
+    # Segments never cross from one body to the next
+    inner = np.ones(len(E) - 1, dtype=bool)
+    inner[offsets[1:-1] - 1] = False
+    start = np.flatnonzero(inner)
+    p0, p1 = points[start], points[start + 1]
+    owner = body[start]
+    middle = orbital_plane(a[owner], e[owner], 0.5 * (E[start] + E[start + 1]))
+
+    chord = p1 - p0
+    length = np.linalg.norm(chord, axis=1)
+    offset = middle - p0
+    distance = np.abs(chord[:, 0] * offset[:, 1] - chord[:, 1] * offset[:, 0]) / length
+    error = np.zeros(a.size)
+    np.maximum.at(error, owner, distance)
+    return error
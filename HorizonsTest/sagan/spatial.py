@@ -0,0 +1,418 @@
+import numpy as np
+
+from sagan import instrument
+from sagan.dates import to_jd
+from sagan.interp import HermiteEphemeris
+
+# Spatial index over the positions of many bodies at one epoch, for
+# batched radius, k-nearest, box and frustum queries (culling and label
+# placement precomputed offline, for any number of bodies).
+#
+#   index = SpatialIndex.from_dataset(dataset, '2024-01-01')
+#   offsets, ids = index.radius(centres, 1e7)   # ids[offsets[i]:offsets[i + 1]]
+#   ids, distance = index.knn(centres, 8)
+#   index.refit(next_positions)                  # next epoch, same bodies
+#
+# The index is an octree kept implicitly: points are binned into cubic
+# cells of cell_size and sorted by the Morton (Z-order) code of their cell.
+# Dropping the last 3 * level bits of a code gives the cell at that level
+# of the octree, with an edge 2**level times larger, and every cell at
+# every level is a contiguous run of the sorted points. Only occupied
+# cells exist; a level's cells are derived from the one below the first
+# time it is used.
+#
+# Radius and k-nearest queries look up the 27 or 125 cells around each
+# query at the level matching its radius, so crowded and empty regions
+# cost the same. Box and frustum queries walk down from the top levels,
+# taking whole cells that lie inside the query without testing their
+# points and splitting only the cells that cross its boundary. All of it
+# is vectorized over a chunk of queries at a time.
+# Moving to an adjacent epoch keeps the cell size and re-sorts starting
+# from the previous order, which is already close to sorted.
+#
+# Query results come as CSR-style offsets and point ids like the tracks of
+# sagan.sampling: the hits of query i are ids[offsets[i]:offsets[i + 1]].
+
+# Bits of each axis in a Morton code; cell coordinates stay within +-2**20
+KEY_BITS = 21
+_BIAS = 1 << (KEY_BITS - 1)
+
+# Queries handled together; bounds the (query, cell) pairs held at once
+QUERY_CHUNK = 4096
+
+# Most cells at the level box and frustum walks start from
+TOP_CELLS = 64
+
+_SPREAD = [(32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+           (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)]
+
+# Spread the low 21 bits of v two bits apart
+def _spread(v):
+    v = v.astype(np.uint64) & np.uint64(0x1fffff)
+    for shift, mask in _SPREAD:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+# Morton code of biased cell coordinates (..., 3)
+def morton(coords):
+    code = (_spread(coords[..., 0]) << np.uint64(2)) | (_spread(coords[..., 1]) << np.uint64(1)) | \
+        _spread(coords[..., 2])
+    return code.astype(np.int64)
+
+# Cell edge at which a typical point shares its cell with about per_cell
+# points: the finest power-of-two coarsening of a very fine grid whose
+# point-weighted mean occupancy reaches per_cell. Weighting by points
+# sizes the cells for the crowded regions; sparse ones are served by the
+# coarser levels of the octree.
+def default_cell_size(points, per_cell=2):
+    points = np.asarray(points, dtype=np.float64)
+    # Leaves coordinates room to grow fourfold before refit runs out of bits
+    fine = (float(np.abs(points).max()) or 1.0) / (_BIAS / 4)
+    codes = np.sort(morton(np.floor(points / fine).astype(np.int64) + _BIAS))
+    for level in range(KEY_BITS):
+        runs = np.diff(np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True]))
+        if np.sum(runs.astype(np.float64) ** 2) >= per_cell * len(points):
+            break
+        codes = codes >> 3
+    return fine * (1 << level)
+
+# Positions of bodies at one epoch, interpolated from the samples either
+# side of it (see sagan.interp). Returns the body ids and a (B, 3) array.
+def epoch_positions(dataset, epoch, bodies=None):
+    epoch = float(to_jd(epoch))
+    bodies = [str(body_id) for body_id in bodies or dataset.bodies]
+    positions = np.empty((len(bodies), 3))
+    for i, body_id in enumerate(bodies):
+        track = dataset[body_id]
+        row = int(np.searchsorted(track.jd, epoch))
+        if (row == 0 and epoch < track.jd[0]) or (row == len(track) and epoch > track.jd[-1]):
+            raise ValueError(f"Epoch {epoch} is outside the samples of body {body_id}")
+        first, last = max(row - 2, 0), min(row + 2, len(track))
+        window = track.between(track.jd[first], track.jd[last - 1])
+        positions[i] = HermiteEphemeris.from_track(window)(epoch) if len(window) > 1 else window.positions[0]
+    return bodies, positions
+
+# Inward planes (nx, ny, nz, d), n.p + d >= 0 inside, of a perspective
+# camera at eye looking at target. fov_deg is the vertical field of view
+# and aspect the width / height, as in Unity's Camera.
+def frustum_planes(eye, target, up=(0.0, 0.0, 1.0), fov_deg=60.0, aspect=1.0, near=0.0, far=np.inf):
+    eye = np.asarray(eye, dtype=np.float64)
+    forward = np.asarray(target, dtype=np.float64) - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    true_up = np.cross(right, forward)
+
+    tan_y = np.tan(np.radians(fov_deg) / 2)
+    tan_x = tan_y * aspect
+    normals = [forward, -forward,
+               forward * tan_x + right, forward * tan_x - right,
+               forward * tan_y + true_up, forward * tan_y - true_up]
+    planes = np.zeros((6, 4))
+    for i, normal in enumerate(normals):
+        normal = normal / np.linalg.norm(normal)
+        planes[i, :3] = normal
+        planes[i, 3] = -normal @ eye
+    planes[0, 3] -= near
+    if np.isfinite(far):
+        planes[1, 3] += far
+    else:
+        planes[1] = [0.0, 0.0, 0.0, 1.0]
+    return planes
+
+# Rows of every (query, start, end) run, query-major
+def _expand(query, start, end):
+    count = end - start
+    first = np.cumsum(count) - count
+    owner = np.repeat(np.arange(len(count)), count)
+    return query[owner], start[owner] + np.arange(len(owner)) - first[owner]
+
+class SpatialIndex:
+    def __init__(self, points, cell_size=None, per_cell=2, ids=None):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 3 or not len(points):
+            raise ValueError("Need an (n, 3) array with at least one point")
+        self.cell_size = float(cell_size or default_cell_size(points, per_cell))
+        self.ids = None if ids is None else np.asarray(ids)
+        self._bin(points)
+
+    # Index bodies of a dataset at epoch; positions are in the dataset's
+    # units and ids are the body ids
+    @classmethod
+    def from_dataset(cls, dataset, epoch, bodies=None, **options):
+        bodies, positions = epoch_positions(dataset, epoch, bodies)
+        return cls(positions, ids=np.array(bodies), **options)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _coords(self, points):
+        return np.floor(points / self.cell_size).astype(np.int64) + _BIAS
+
+    def _bin(self, points, order=None):
+        coords = self._coords(points)
+        if coords.min() < 0 or coords.max() >= 2 * _BIAS:
+            raise ValueError(f"Points span more than 2**{KEY_BITS} cells of {self.cell_size}; use larger cells")
+        codes = morton(coords)
+        if order is None:
+            order = np.argsort(codes, kind='stable')
+        else:
+            # Nearly sorted already: the merge sort behind 'stable' runs in
+            # about linear time here
+            order = order[np.argsort(codes[order], kind='stable')]
+
+        self.points = points
+        self.order = order
+        self.sorted_points = points[order]
+        self.sorted_coords = coords[order]
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        self._levels = [(codes[starts], starts, np.r_[starts[1:], len(points)])]
+
+    # Rebin new positions of the same points (e.g. the next epoch) with the
+    # same cell size
+    def refit(self, points):
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        if points.shape != self.points.shape:
+            raise ValueError(f"Expected {self.points.shape} positions, got {points.shape}")
+        with instrument.span('spatial.refit') as span:
+            self._bin(points, self.order)
+            span.add(rows=len(points))
+        return self
+
+    # Occupied cells of an octree level: (codes, start rows, end rows)
+    def level(self, level):
+        while len(self._levels) <= level:
+            codes, starts, ends = self._levels[-1]
+            parents = codes >> 3
+            first = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+            self._levels.append((parents[first], starts[first], np.r_[starts[first[1:]], len(self.points)]))
+        return self._levels[level]
+
+    # Lowest corners and edge of cells of a level, from their start rows
+    def _cell_bounds(self, level, starts):
+        cell = self.sorted_coords[starts] >> level
+        return ((cell << level) - _BIAS) * self.cell_size, self.cell_size * (1 << level)
+
+    # Order of (query, row) hits by query, then point; one int64 key sorts
+    # faster than a lexsort
+    def _id_order(self, query, rows):
+        return np.argsort(query * len(self.points) + self.order[rows])
+
+    def _result_ids(self, rows):
+        point_ids = self.order[rows]
+        return point_ids if self.ids is None else self.ids[point_ids]
+
+    # (query, cell slot) of the occupied cells within reach cells of each
+    # query's cell at a level, query-major
+    def _near_cells(self, centres, level, reach):
+        codes = self.level(level)[0]
+        steps = np.arange(-reach, reach + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3)
+        cells = (self._coords(centres) >> level)[:, None] + offsets
+        valid = np.all((cells >= 0) & (cells < (2 * _BIAS) >> level), axis=2)
+        query = np.repeat(np.arange(len(centres)), len(offsets))[valid.ravel()]
+        keys = morton(cells[valid])
+        slot = np.minimum(np.searchsorted(codes, keys), len(codes) - 1)
+        hit = codes[slot] == keys
+        return query[hit], slot[hit]
+
+    # (query, sorted row) of the points in those cells
+    def _near(self, centres, level, reach):
+        _, starts, ends = self.level(level)
+        query, slot = self._near_cells(centres, level, reach)
+        return _expand(query, starts[slot], ends[slot])
+
+    # Lowest level at which the cell of each centre holds at least wanted
+    # points (or all of them), one lookup per level
+    def _start_levels(self, centres, wanted):
+        wanted = min(wanted, len(self.points))
+        codes = morton(self._coords(centres))
+        levels = np.full(len(centres), KEY_BITS)
+        todo = np.arange(len(centres))
+        for level in range(KEY_BITS):
+            cells, starts, ends = self.level(level)
+            keys = codes[todo] >> (3 * level)
+            slot = np.minimum(np.searchsorted(cells, keys), len(cells) - 1)
+            enough = (cells[slot] == keys) & (ends[slot] - starts[slot] >= wanted)
+            levels[todo[enough]] = level
+            todo = todo[~enough]
+            if not len(todo):
+                break
+        return levels
+
+    # Points within r of each centre. r is one radius or one per centre.
+    # Returns offsets (Q + 1) and ids, each query's hits in id order or,
+    # with sort, nearest first; with return_distance also their distances.
+    def radius(self, centres, r, sort=False, return_distance=False):
+        centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+        r = np.broadcast_to(np.asarray(r, dtype=np.float64), (len(centres),))
+        with instrument.span('spatial.radius', queries=len(centres)) as span:
+            offsets, rows, distances = self._radius_rows(centres, r, sort)
+            span.add(rows=len(rows))
+        if return_distance:
+            return offsets, self._result_ids(rows), distances
+        return offsets, self._result_ids(rows)
+
+    # radius() in sorted point rows. Each query uses the level whose cells
+    # are at least r / 2, so 5**3 cells around it cover its sphere.
+    def _radius_rows(self, centres, r, sort):
+        levels = np.ceil(np.log2(np.maximum(r / (2 * self.cell_size), 1.0)))
+        levels = np.minimum(levels, KEY_BITS).astype(np.intp)
+        query, rows = [], []
+        for level in np.unique(levels):
+            members = np.flatnonzero(levels == level)
+            reach = int(min(np.ceil(r[members].max() / (self.cell_size * (1 << level))), 2))
+            for c0 in range(0, len(members), QUERY_CHUNK):
+                chunk = members[c0:c0 + QUERY_CHUNK]
+                q, found = self._near(centres[chunk], level, reach)
+                offset = self.sorted_points[found] - centres[chunk[q]]
+                keep = np.einsum('ij,ij->i', offset, offset) <= r[chunk[q]] ** 2
+                query.append(chunk[q[keep]])
+                rows.append(found[keep])
+        query = np.concatenate(query) if query else np.zeros(0, dtype=np.intp)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intp)
+        distances = np.linalg.norm(self.sorted_points[rows] - centres[query], axis=1)
+
+        order = np.lexsort((distances, query)) if sort else self._id_order(query, rows)
+        counts = np.bincount(query, minlength=len(centres))
+        return np.r_[0, np.cumsum(counts)], rows[order], distances[order]
+
+    # The k nearest points of each centre, nearest first: (Q, k) ids and
+    # distances. Without ids the missing entries, when there are fewer
+    # than k points, are -1 (inf distance). Each centre starts at the level
+    # where its own cell holds k / 4 points (a sphere of one cell edge is
+    # about four cells) and goes up a level until k points lie within one
+    # edge, the distance the 27 cells around it are known to cover.
+    def knn(self, centres, k):
+        centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+        rows = np.full((len(centres), k), -1, dtype=np.intp)
+        distance = np.full((len(centres), k), np.inf)
+        pending = np.arange(len(centres))
+
+        with instrument.span('spatial.knn', queries=len(centres), k=k) as span:
+            start = self._start_levels(centres, -(-k // 4))
+            level = start.min() if len(start) else 0
+            while len(pending):
+                edge = self.cell_size * (1 << level)
+                active = start[pending] <= level
+                left = [pending[~active]]
+                active = pending[active]
+                for c0 in range(0, len(active), QUERY_CHUNK):
+                    chunk = active[c0:c0 + QUERY_CHUNK]
+                    query, found = self._near(centres[chunk], level, 1)
+                    offset = self.sorted_points[found] - centres[chunk[query]]
+                    d2 = np.einsum('ij,ij->i', offset, offset)
+                    candidates = np.bincount(query, minlength=len(chunk))
+                    within = np.bincount(query, weights=d2 <= edge * edge, minlength=len(chunk))
+                    # Once the cells hold every point nothing can be missing
+                    everything = (candidates == len(self.points)) | (level >= KEY_BITS)
+                    done = (within >= k) | everything
+
+                    # Only points within the covered edge can be among the k
+                    # nearest, unless the cells hold every point
+                    keep = done[query] & ((d2 <= edge * edge) | everything[query])
+                    query, found, d2 = query[keep], found[keep], d2[keep]
+                    if not len(query):
+                        left.append(chunk[~done])
+                        continue
+                    # Candidates come grouped by query, so one sort on
+                    # query + d2 / (a bound on d2) puts each group nearest first
+                    order = np.argsort(query + d2 / (2 * d2.max() + 1e-300))
+                    query, found, d2 = query[order], found[order], d2[order]
+                    counts = np.bincount(query, minlength=len(chunk))
+                    rank = np.arange(len(query)) - (np.cumsum(counts) - counts)[query]
+                    take = rank < k
+                    rows[chunk[query[take]], rank[take]] = found[take]
+                    distance[chunk[query[take]], rank[take]] = np.sqrt(d2[take])
+                    left.append(chunk[~done])
+                pending = np.concatenate(left)
+                level += 1
+            span.add(rows=int(np.isfinite(distance).sum()))
+
+        missing = rows < 0
+        ids = self._result_ids(np.where(missing, 0, rows))
+        if self.ids is None:
+            ids[missing] = -1
+        return ids, distance
+
+    # Points inside each axis-aligned box low..high (each (Q, 3) or (3,)),
+    # as offsets and ids
+    def box(self, low, high):
+        low, high = np.broadcast_arrays(np.asarray(low, dtype=np.float64).reshape(-1, 3),
+                                        np.asarray(high, dtype=np.float64).reshape(-1, 3))
+
+        def classify(query, corner, edge):
+            outside = np.any((corner > high[query]) | (corner + edge < low[query]), axis=1)
+            inside = np.all((corner >= low[query]) & (corner + edge <= high[query]), axis=1)
+            return outside, inside
+
+        def contains(query, points):
+            return np.all((points >= low[query]) & (points <= high[query]), axis=1)
+
+        with instrument.span('spatial.box', queries=len(low)) as span:
+            return self._walk(len(low), classify, contains, span)
+
+    # Points inside each frustum: planes is (6, 4) or (Q, 6, 4) as made by
+    # frustum_planes
+    def frustum(self, planes):
+        planes = np.asarray(planes, dtype=np.float64).reshape(-1, 6, 4)
+        normals, d = planes[..., :3], planes[..., 3]
+
+        def classify(query, corner, edge):
+            n = normals[query]
+            # Cell corners farthest along and against each plane normal
+            ahead = np.einsum('ipk,ipk->ip', corner[:, None] + edge * (n >= 0), n) + d[query]
+            behind = np.einsum('ipk,ipk->ip', corner[:, None] + edge * (n < 0), n) + d[query]
+            return np.any(ahead < 0, axis=1), np.all(behind >= 0, axis=1)
+
+        def contains(query, points):
+            return np.all(np.einsum('ik,ipk->ip', points, normals[query]) + d[query] >= 0, axis=1)
+
+        with instrument.span('spatial.frustum', queries=len(planes)) as span:
+            return self._walk(len(planes), classify, contains, span)
+
+    # Top-down walk for box and frustum queries. classify(query, corner,
+    # edge) tells which (query, cell) pairs are entirely outside or inside;
+    # contains(query, points) tests the points of cells still crossing the
+    # boundary at level 0.
+    def _walk(self, n, classify, contains, span):
+        top = 0
+        while len(self.level(top)[0]) > TOP_CELLS and top < KEY_BITS:
+            top += 1
+        top_cells = len(self.level(top)[0])
+
+        query, rows = [], []
+        per_chunk = max(1, QUERY_CHUNK // top_cells)
+        for c0 in range(0, n, per_chunk):
+            chunk = np.arange(c0, min(c0 + per_chunk, n))
+            pair_query = np.repeat(chunk, top_cells)
+            slot = np.tile(np.arange(top_cells), len(chunk))
+            for level in range(top, -1, -1):
+                codes, starts, ends = self.level(level)
+                outside, inside = classify(pair_query, *self._cell_bounds(level, starts[slot]))
+                q, found = _expand(pair_query[inside], starts[slot[inside]], ends[slot[inside]])
+                query.append(q)
+                rows.append(found)
+
+                crossing = ~outside & ~inside
+                pair_query, slot = pair_query[crossing], slot[crossing]
+                if level == 0:
+                    q, found = _expand(pair_query, starts[slot], ends[slot])
+                    keep = contains(q, self.sorted_points[found])
+                    query.append(q[keep])
+                    rows.append(found[keep])
+                else:
+                    # The children of a cell are the run of the level below
+                    # whose codes start with its code
+                    below = self.level(level - 1)[0]
+                    first = np.searchsorted(below, codes[slot] << 3)
+                    last = np.searchsorted(below, (codes[slot] + 1) << 3)
+                    pair_query, slot = _expand(pair_query, first, last)
+
+        query = np.concatenate(query) if query else np.zeros(0, dtype=np.intp)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intp)
+        order = self._id_order(query, rows)
+        span.add(rows=len(rows))
+        counts = np.bincount(query, minlength=n)
+        return np.r_[0, np.cumsum(counts)], self._result_ids(rows[order])
@@ -0,0 +1,154 @@
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from sagan.dates import format_horizons_dates, parse_step, to_jd
+from sagan.horizons import END_MARKER, START_MARKER
+from sagan.orbits import AU_KM, GAUSS_K
+
+# Local stand-in for the Horizons batch interface, so fetchers can be
+# exercised and benchmarked offline. Every object gets a deterministic
+# circular orbit and responses are formatted like a VEC_TABLE=3 reply.
+
+def _orbit_for(obj_id):
+    seed = zlib.crc32(str(obj_id).encode())
+    radius_au = 0.4 + (seed % 300) / 10.0
+    phase = (seed >> 9) % 360
+    inclination = np.radians((seed >> 17) % 10)
+    return radius_au, np.radians(phase), inclination
+
+# Position [km] and velocity [km/s] of a stub object at the given JDs
+def synthetic_state(obj_id, jd):
+    radius_au, phase, inclination = _orbit_for(obj_id)
+    jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+    n = GAUSS_K / radius_au**1.5  # rad/day
+    angle = phase + n * (jd - 2451545.0)
+    radius = radius_au * AU_KM
+    speed = radius * n / 86400.0
+
+    pos = np.empty((jd.size, 3))
+    pos[:, 0] = radius * np.cos(angle)
+    pos[:, 1] = radius * np.sin(angle) * np.cos(inclination)
+    pos[:, 2] = radius * np.sin(angle) * np.sin(inclination)
+    vel = np.empty((jd.size, 3))
+    vel[:, 0] = -speed * np.sin(angle)
+    vel[:, 1] = speed * np.cos(angle) * np.cos(inclination)
+    vel[:, 2] = speed * np.cos(angle) * np.sin(inclination)
+    return pos, vel
+
+# Records between the $$SOE/$$EOE markers for the given JDs
+def vector_table_records(obj_id, jd):
+    pos, vel = synthetic_state(obj_id, jd)
+    dates = format_horizons_dates(jd)
+    distance = np.linalg.norm(pos, axis=1)
+    rate = np.einsum('ij,ij->i', pos, vel) / distance
+    lines = []
+    for i in range(len(dates)):
+        x, y, z = pos[i]
+        vx, vy, vz = vel[i]
+        lines.append(f"{jd[i]:.9f} = {dates[i]} ")
+        lines.append(f" X ={x: .15E} Y ={y: .15E} Z ={z: .15E}")
+        lines.append(f" VX={vx: .15E} VY={vy: .15E} VZ={vz: .15E}")
+        lines.append(f" LT={distance[i] / 299792.458: .15E} RG={distance[i]: .15E} RR={rate[i]: .15E}")
+    return "\n".join(lines)
+
+# Full response text, including the header and footer around the markers
+def vector_table_response(obj_id, jd):
+    rule = "*" * 79
+    return "\n".join([
+        rule,
+        f" Revised: stub            Stub body {obj_id}",
+        rule,
+        f"Target body name: Stub body ({obj_id})",
+        "Center body name: Solar System Barycenter (0)",
+        "Output units    : KM-S",
+        rule,
+        START_MARKER,
+        vector_table_records(obj_id, jd),
+        END_MARKER,
+        rule,
+        "",
+    ])
+
+class StubHorizonsServer:
+    # latency: seconds slept before answering each request.
+    # fail_first: number of 503 answers given to each distinct query before
+    # it succeeds, to exercise retries.
+    def __init__(self, latency=0.0, fail_first=0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.request_count = 0
+        self._failures = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/horizons_batch.cgi"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _should_fail(self, key):
+        with self._lock:
+            self.request_count += 1
+            failures = self._failures.get(key, 0)
+            if failures < self.fail_first:
+                self._failures[key] = failures + 1
+                return True
+        return False
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {key: values[0].strip("'") for key, values in parse_qs(urlparse(self.path).query).items()}
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub._should_fail(self.path):
+                    self.send_error(503, "Service Unavailable")
+                    return
+
+                body = stub._responses.get(self.path)
+                if body is None:
+                    try:
+                        step = parse_step(query.get('STEP_SIZE', '1 DAYS')) or 1.0
+                        start, stop = to_jd([query['START_TIME'], query['STOP_TIME']])
+                        jd = start + step * np.arange(int(np.floor((stop - start) / step + 1e-9)) + 1)
+                        body = vector_table_response(query['COMMAND'], jd).encode()
+                    except (KeyError, ValueError) as error:
+                        self.send_error(400, f"Bad query: {error}")
+                        return
+                    stub._responses[self.path] = body
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
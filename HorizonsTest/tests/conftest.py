@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The tests import sagan from the HorizonsTest folder, wherever pytest runs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sagan.planetdata import horizons_to_file_units, write_positions_txt  # noqa: E402
+from sagan.stubserver import StubHorizonsServer, synthetic_state  # noqa: E402
+
+@pytest.fixture
+def stub():
+    with StubHorizonsServer() as server:
+        yield server
+
+@pytest.fixture
+def flaky_stub():
+    # Every distinct query fails twice with 503 before it succeeds
+    with StubHorizonsServer(fail_first=2) as server:
+        yield server
+
+# A PlanetData folder of stub bodies on circular orbits, sampled every five
+# days over 50 years, for tests that need a dataset but no fetching
+SYNTHETIC_BODIES = ('10', '199', '299', '399', '699', '899')
+SYNTHETIC_JD = 2451545.0 + np.arange(0, 18262, 5.0)
+
+@pytest.fixture(scope='session')
+def synthetic_folder(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('synthetic')
+    for body_id in SYNTHETIC_BODIES:
+        positions, _ = synthetic_state(body_id, SYNTHETIC_JD)
+        write_positions_txt(str(folder / f'planet_{body_id}_positions.txt'), SYNTHETIC_JD,
+                            horizons_to_file_units(positions))
+    return str(folder)
@@ -0,0 +1,78 @@
+from itertools import combinations
+
+import numpy as np
+
+from sagan.approach import close_approaches, conjunctions
+from sagan.dataset import PlanetDataset
+from sagan.planetdata import SCALE_SPACE
+
+# Sampled local minima of value per pair, (i, j) -> (sample rows, values),
+# found the slow way: every pair at every epoch
+def _sampled_minima(values):
+    inner = values[1:-1]
+    rows = np.flatnonzero((inner <= values[:-2]) & (inner < values[2:])) + 1
+    return rows, values[rows]
+
+def _distances(positions):
+    return {(a, b): np.linalg.norm(positions[a] - positions[b], axis=1) * SCALE_SPACE
+            for a, b in combinations(sorted(positions), 2)}
+
+def _angles(positions, center):
+    directions = {body_id: p - positions[center] for body_id, p in positions.items() if body_id != center}
+    angles = {}
+    for a, b in combinations(sorted(directions), 2):
+        da, db = directions[a], directions[b]
+        cosine = np.einsum('ij,ij->i', da, db) / np.linalg.norm(da, axis=1) / np.linalg.norm(db, axis=1)
+        angles[a, b] = np.degrees(np.arccos(np.clip(cosine, -1, 1)))
+    return angles
+
+# Every sampled minimum within limit has one event of its pair within a
+# sample, no deeper than the event, and every event sits next to a sampled
+# minimum that it undercuts
+def _check(events, jd, pair_values, limit):
+    step = jd[1] - jd[0]
+    assert np.all(events['value'] <= limit)
+    matched = 0
+    for (a, b), values in pair_values.items():
+        rows, minima = _sampled_minima(values)
+        pair_events = events[((events['body_a'] == a) & (events['body_b'] == b)) |
+                             ((events['body_a'] == b) & (events['body_b'] == a))]
+        for event in pair_events:
+            near = np.abs(jd[rows] - event['jd']) <= step
+            assert near.sum() == 1, (a, b, event)
+            assert event['value'] <= minima[near][0] * (1 + 1e-9)
+        for row, value in zip(rows, minima):
+            if value <= limit:
+                assert np.sum(np.abs(pair_events['jd'] - jd[row]) <= step) == 1, (a, b, jd[row])
+                matched += 1
+        # No minimum is reported twice
+        assert len(np.unique(pair_events['jd'])) == len(pair_events)
+        assert np.all(np.diff(np.sort(pair_events['jd'])) > step)
+    assert matched > 0
+    assert np.all(np.diff(events['jd']) >= 0)
+
+def test_close_approaches_match_brute_force(synthetic_folder):
+    dataset = PlanetDataset(synthetic_folder)
+    jd, tracks = dataset.shared_tracks(dataset.bodies)
+    distances = _distances({track.body_id: track.positions for track in tracks})
+    limit = 3.0e8
+    # Small blocks and chunks so the scan crosses chunk and block edges
+    events = close_approaches(dataset, limit, block=16, memory_bytes=2**16)
+    _check(events, jd, distances, limit)
+    whole = close_approaches(dataset, limit)
+    np.testing.assert_allclose(np.sort(whole['jd']), np.sort(events['jd']))
+
+def test_conjunctions_match_brute_force(synthetic_folder):
+    dataset = PlanetDataset(synthetic_folder)
+    jd, tracks = dataset.shared_tracks(dataset.bodies)
+    angles = _angles({track.body_id: track.positions for track in tracks}, '10')
+    events = conjunctions(dataset, 10.0, block=16, memory_bytes=2**16)
+    assert not np.any((events['body_a'] == '10') | (events['body_b'] == '10'))
+    _check(events, jd, angles, 10.0)
+
+def test_range_and_bodies_restrict_the_search(synthetic_folder):
+    dataset = PlanetDataset(synthetic_folder)
+    jd = dataset['10'].jd
+    events = close_approaches(dataset, 3.0e8, jd[100], jd[2000], bodies=['10', '299', '699'])
+    assert np.all((events['jd'] >= jd[100]) & (events['jd'] <= jd[2000]))
+    assert set(events['body_a']) | set(events['body_b']) <= {'10', '299', '699'}
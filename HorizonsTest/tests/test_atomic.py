@@ -0,0 +1,30 @@
+import os
+import stat
+
+import pytest
+
+from sagan import atomic
+from sagan.atomic import atomic_write
+
+def test_result_gets_open_permissions(tmp_path):
+    umask = os.umask(0o027)
+    try:
+        # The cached value is read from the process, like a fresh import
+        atomic._umask = None
+        with atomic_write(str(tmp_path / 'out.bin')) as file:
+            file.write(b'data')
+        assert stat.S_IMODE(os.stat(tmp_path / 'out.bin').st_mode) == 0o640
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(umask)
+        atomic._umask = None
+
+def test_failed_write_leaves_the_target_untouched(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), 'w') as file:
+            file.write('new')
+            raise RuntimeError
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['out.txt']
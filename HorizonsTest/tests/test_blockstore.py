@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+
+from sagan.blockstore import BLOCKS_FILENAME, BlockStore, convert_dataset_blocks
+from sagan.dataset import PlanetDataset
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Assets', 'Resources',
+                           'PlanetData', 'default')
+
+# Last of the 7 significant digits the txt files give a body's largest
+# coordinate
+def _ulp(positions):
+    return 10.0 ** (np.floor(np.log10(np.abs(positions).max())) - 6)
+
+def test_default_quantum_is_lossless_for_every_body(tmp_path):
+    out_path, bodies = convert_dataset_blocks(DATA_FOLDER, str(tmp_path / BLOCKS_FILENAME), block_rows=100)
+    store = BlockStore(out_path)
+    assert '10' in bodies
+    for body_id, (jd, positions) in bodies.items():
+        assert np.array_equal(store.jd(body_id), jd)
+        error = np.abs(store.positions(body_id) - positions).max()
+        assert error <= _ulp(positions) / 2, body_id
+        assert np.array_equal(store.between(body_id, jd[150], jd[250])[1], store.positions(body_id)[150:251])
+
+def test_dataset_uses_blocks_only_when_asked(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    for name in os.listdir(DATA_FOLDER):
+        if name.endswith('_positions.txt'):
+            with open(os.path.join(DATA_FOLDER, name), 'rb') as source:
+                (folder / name).write_bytes(source.read())
+    convert_dataset_blocks(str(folder))
+    assert PlanetDataset(str(folder))._store is None
+    assert isinstance(PlanetDataset(str(folder), blocks=True)._store, BlockStore)
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from sagan.build import MANIFEST_FILENAME, build_dataset, load_manifest, update_dataset, verify_manifest
+from sagan.dataset import PlanetDataset
+from sagan.planetdata import read_positions_jd
+
+STEP = "'1 DAYS'"
+
+def _build(stub, folder, body_ids=('399', '499'), start='2000-01-01', end='2000-03-01', step=STEP):
+    return build_dataset(list(body_ids), str(folder), start, end, window_days=20, max_workers=4, url=stub.url,
+                         STEP_SIZE=step)
+
+def _file(folder, body_id):
+    return os.path.join(str(folder), f'planet_{body_id}_positions.txt')
+
+def test_build_update_verify_round_trip(stub, tmp_path):
+    written, failed = _build(stub, tmp_path / 'updated')
+    assert failed == [] and len(written) == 2
+    assert verify_manifest(str(tmp_path / 'updated')) == []
+    assert not os.path.exists(tmp_path / 'updated' / '.build')
+
+    appended, failed = update_dataset(str(tmp_path / 'updated'), '2000-04-15', window_days=20, url=stub.url)
+    assert failed == [] and appended == {'399': 45, '499': 45}
+    assert verify_manifest(str(tmp_path / 'updated')) == []
+    assert len(load_manifest(str(tmp_path / 'updated'))['bodies']['399']['segments']) == 2
+
+    # Appending gives the same files as building the whole range at once
+    _build(stub, tmp_path / 'whole', end='2000-04-15')
+    for body_id in ('399', '499'):
+        with open(_file(tmp_path / 'updated', body_id), 'rb') as updated, \
+                open(_file(tmp_path / 'whole', body_id), 'rb') as whole:
+            assert updated.read() == whole.read()
+
+def test_update_is_a_no_op_when_up_to_date(stub, tmp_path):
+    _build(stub, tmp_path)
+    requests = stub.request_count
+    assert update_dataset(str(tmp_path), '2000-03-01', url=stub.url) == ({}, [])
+    assert stub.request_count == requests
+
+def test_update_drops_an_interrupted_append(stub, tmp_path):
+    _build(stub, tmp_path)
+    with open(_file(tmp_path, '399'), 'ab') as file:
+        file.write(b'A.D. 2000-Mar-02 00:00:00.0000 TDB, 1.0')
+    appended, _ = update_dataset(str(tmp_path), '2000-03-10', url=stub.url)
+    assert appended == {'399': 9, '499': 9}
+    assert verify_manifest(str(tmp_path)) == []
+    jd, _ = read_positions_jd(_file(tmp_path, '399'))
+    assert np.allclose(np.diff(jd), 1.0)
+
+def test_verify_reports_modified_and_missing_files(stub, tmp_path):
+    _build(stub, tmp_path)
+    with open(_file(tmp_path, '399'), 'rb+') as file:
+        file.seek(100)
+        byte = file.read(1)
+        file.seek(100)
+        file.write(b'9' if byte != b'9' else b'8')
+    os.remove(_file(tmp_path, '499'))
+    assert sorted(verify_manifest(str(tmp_path))) == ['399', '499']
+
+def test_update_keeps_each_body_on_its_own_step(stub, tmp_path):
+    _build(stub, tmp_path / 'daily', body_ids=('399',))
+    _build(stub, tmp_path / 'two_day', body_ids=('499',), step="'2 DAYS'")
+    folder = tmp_path / 'daily'
+    os.replace(_file(tmp_path / 'two_day', '499'), _file(folder, '499'))
+
+    appended, failed = update_dataset(str(folder), '2000-03-21', url=stub.url)
+    assert failed == [] and appended == {'399': 20, '499': 10}
+    dataset = PlanetDataset(str(folder))
+    assert np.allclose(np.diff(dataset['399'].jd), 1.0)
+    assert np.allclose(np.diff(dataset['499'].jd), 2.0)
+
+def test_step_mismatch_leaves_files_untouched(stub, tmp_path):
+    _build(stub, tmp_path, body_ids=('399',))
+    path = _file(tmp_path, '399')
+    with open(path, 'ab') as file:
+        file.write(b'partial')
+    size = os.path.getsize(path)
+    with pytest.raises(ValueError, match='day step'):
+        update_dataset(str(tmp_path), '2000-03-21', url=stub.url, STEP_SIZE="'2 DAYS'")
+    assert os.path.getsize(path) == size
+
+def test_bootstrap_truncates_only_when_updating(stub, tmp_path):
+    _build(stub, tmp_path, body_ids=('399',))
+    os.remove(os.path.join(str(tmp_path), MANIFEST_FILENAME))
+    path = _file(tmp_path, '399')
+    with open(path, 'ab') as file:
+        file.write(b'A.D. 2000-Mar-02 00:00:00.0000 TDB, 1.0')
+    size = os.path.getsize(path)
+    with pytest.raises(ValueError, match='day step'):
+        update_dataset(str(tmp_path), '2000-03-21', url=stub.url, STEP_SIZE="'2 DAYS'")
+    assert os.path.getsize(path) == size
+
+    appended, failed = update_dataset(str(tmp_path), '2000-03-10', url=stub.url)
+    assert failed == [] and appended == {'399': 9}
+    jd, _ = read_positions_jd(path)
+    assert np.allclose(np.diff(jd), 1.0) and len(jd) == 70
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from sagan.dates import (DateIndex, format_horizons_dates, format_query_time, jd_to_datetime64,
+                         parse_horizons_dates, to_jd)
+
+# Calendar dates (proleptic Gregorian, as numpy counts them) around the
+# leap-year rules, month and year ends, the 1582 reform and both ends of
+# datetime64[ns], with their Julian Dates
+KNOWN = [
+    ('2000-01-01T12:00', 2451545.0),   # J2000
+    ('1858-11-17', 2400000.5),         # MJD zero
+    ('1970-01-01', 2440587.5),
+    ('1582-10-15', 2299160.5),         # first day of the Gregorian calendar
+    ('1582-10-04', 2299149.5),         # proleptic, not the Julian calendar's 2299159.5
+    ('1900-02-28', 2415078.5),
+    ('1900-03-01', 2415079.5),         # 1900 is not a leap year
+    ('2000-02-29', 2451603.5),         # 2000 is
+    ('2100-03-01', 2488128.5),
+    ('1600-02-29', 2305506.5),
+    ('1677-09-21', 2333835.5),         # before datetime64[ns] begins
+    ('2262-04-12', 2547339.5),         # after it ends
+    ('9999-12-31T23:59:59', 5373484.499988426),
+]
+
+@pytest.mark.parametrize('date, jd', KNOWN)
+def test_known_julian_dates(date, jd):
+    assert to_jd(date) == pytest.approx(jd, abs=1e-9)
+    assert to_jd(np.datetime64(date, 'ns') if '1677' < date[:4] < '2262' else np.datetime64(date)) == \
+        pytest.approx(jd, abs=1e-9)
+
+def test_leap_days_are_counted():
+    assert to_jd('2000-03-01') - to_jd('2000-02-28') == 2
+    assert to_jd('1900-03-01') - to_jd('1900-02-28') == 1
+    assert to_jd('2001-01-01') - to_jd('2000-01-01') == 366
+    assert to_jd('2101-01-01') - to_jd('2100-01-01') == 365
+
+# Every day of the leap-rule years, at odd times of day, through each
+# conversion and back
+def test_round_trips():
+    days = np.concatenate([to_jd(f'{year}-01-01') + np.arange(367) for year in (1600, 1700, 1900, 2000, 2024, 2100)])
+    jd = days + np.tile([0.0, 0.25, 0.5 + 1e-4, 0.999], len(days) // 4 + 1)[:len(days)]
+
+    np.testing.assert_allclose(to_jd(jd_to_datetime64(jd, 'us')), jd, rtol=0, atol=1e-9)
+
+    dates = format_horizons_dates(jd)
+    assert dates[0] == 'A.D. 1600-Jan-01 00:00:00.0000 TDB'
+    np.testing.assert_allclose(parse_horizons_dates(dates), jd, rtol=0, atol=1e-9)
+    # The strptime fallback agrees with the vectorized parser
+    np.testing.assert_allclose(parse_horizons_dates([' ' + date + '  ' for date in dates[:50]]), jd[:50],
+                               rtol=0, atol=1e-9)
+    np.testing.assert_allclose(parse_horizons_dates([d[5:-4] for d in dates[:50]]), jd[:50], rtol=0, atol=1e-9)
+
+    # Query times drop the fraction of a second
+    np.testing.assert_allclose(to_jd([format_query_time(value).replace(' ', 'T') for value in jd]), jd,
+                               rtol=0, atol=1 / 86400)
+
+# Julian Day Number of a Gregorian date by Fliegel and Van Flandern's
+# integer formula, independent of numpy's calendar
+def _jdn(year, month, day):
+    a = (14 - month) // 12
+    y, m = year + 4800 - a, month + 12 * a - 3
+    return day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+def test_every_month_end_matches_the_integer_formula():
+    for year in (1582, 1600, 1700, 1899, 1900, 2000, 2023, 2024, 2100, 2400, 9999):
+        for month in range(1, 13):
+            first = np.datetime64(f'{year:04d}-{month:02d}-01')
+            last = (first.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+            day = int(str(last)[-2:])
+            assert _jdn(year + month // 12, month % 12 + 1, 1) - _jdn(year, month, day) == 1
+            assert to_jd(last) == _jdn(year, month, day) - 0.5
+            assert parse_horizons_dates(format_horizons_dates(_jdn(year, month, day) - 0.5))[0] == \
+                _jdn(year, month, day) - 0.5
+
+def test_month_and_year_ends():
+    for date, following in (('1999-12-31', 'Jan-01'), ('2000-02-29', 'Mar-01'), ('1900-02-28', 'Mar-01'),
+                            ('2024-04-30', 'May-01')):
+        assert format_horizons_dates(to_jd(date) + 1)[0][10:16] == following
+
+def test_date_index_accepts_every_form():
+    index = DateIndex(to_jd('2000-01-01') + np.arange(400.0))
+    assert index.range('2000-02-28', '2000-03-01') == slice(58, 61)
+    assert index.range(np.datetime64('2000-12-31'), None) == slice(365, 400)
+    assert index.nearest(to_jd('2000-02-29T13:00')) == 60
@@ -0,0 +1,51 @@
+import numpy as np
+
+from sagan.cache import ResponseCache
+from sagan.fetch import fetch_many, make_session
+from sagan.horizons import fetch_horizons_data, horizons_params
+from sagan.parse import parse_vector_text
+
+OBJECTS = {'399': ('2000-01-01', '2000-01-31'), '499': ('2000-01-01', '2000-01-31')}
+
+def test_fetch_many_returns_every_object(stub):
+    texts = fetch_many(OBJECTS, url=stub.url, max_workers=4)
+    assert set(texts) == set(OBJECTS)
+    for text in texts.values():
+        table = parse_vector_text(text)
+        assert len(table.jd) == 31
+        assert np.allclose(np.diff(table.jd), 1.0)
+    assert stub.request_count == len(OBJECTS)
+
+def test_transient_errors_are_retried(flaky_stub):
+    texts = fetch_many(OBJECTS, url=flaky_stub.url, retries=3, backoff=0)
+    assert all(text is not None for text in texts.values())
+    # Two 503s and one success per query
+    assert flaky_stub.request_count == 3 * len(OBJECTS)
+
+def test_exhausted_retries_give_none(flaky_stub):
+    texts = fetch_many(OBJECTS, url=flaky_stub.url, retries=1, backoff=0)
+    assert texts == {'399': None, '499': None}
+
+def test_cache_answers_repeated_queries(stub, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    session = make_session(retries=0)
+    first = fetch_horizons_data('399', '2000-01-01', '2000-01-31', session=session, url=stub.url, cache=cache)
+    again = fetch_horizons_data('399', '2000-01-01', '2000-01-31', session=session, url=stub.url, cache=cache)
+    assert first == again
+    assert stub.request_count == 1
+
+    # A span inside the cached one is sliced out of it
+    inner = fetch_horizons_data('399', '2000-01-10', '2000-01-20', session=session, url=stub.url, cache=cache)
+    assert len(parse_vector_text(inner).jd) == 11
+    assert stub.request_count == 1
+
+def test_cache_keeps_servers_apart(stub, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    fetch_horizons_data('399', '2000-01-01', '2000-01-31', url=stub.url, cache=cache)
+    calls = []
+    params = horizons_params('399', '2000-01-01', '2000-01-31')
+    assert cache.get_or_fetch(params, calls.append, stub.url) is not None
+    assert calls == []
+    # The same query for the real Horizons is not answered from the stub's spans
+    assert cache.get_or_fetch(params, lambda query: calls.append(query) or None) is None
+    assert len(calls) == 1
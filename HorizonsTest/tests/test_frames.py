@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from sagan.dataset import PlanetDataset
+from sagan.frames import (ECLIPTIC, EQUATORIAL, dataset_frame, plane_rotation, ref_plane, rotate, transform)
+
+def _positions(seed=0):
+    return np.random.default_rng(seed).uniform(-1e4, 1e4, (4, 500, 3))
+
+@pytest.mark.parametrize('unity_axes', [False, True])
+def test_ecliptic_equatorial_round_trip_is_identity(unity_axes):
+    positions = _positions()
+    there = transform(positions, source=EQUATORIAL, target=ECLIPTIC, unity_axes=unity_axes)
+    back = transform(there, source=ECLIPTIC, target=EQUATORIAL, unity_axes=unity_axes)
+    np.testing.assert_allclose(back, positions, rtol=0, atol=1e-11 * np.abs(positions).max())
+    matrix = plane_rotation(EQUATORIAL, ECLIPTIC, unity_axes)
+    np.testing.assert_allclose(matrix @ plane_rotation(ECLIPTIC, EQUATORIAL, unity_axes), np.eye(3), atol=1e-15)
+    assert np.linalg.det(matrix) == pytest.approx(1.0)
+
+def test_ecliptic_pole_is_tilted_by_the_obliquity():
+    pole = rotate(np.array([0.0, 0.0, 1.0]), plane_rotation(ECLIPTIC, EQUATORIAL))
+    assert np.degrees(np.arccos(pole[2])) * 3600 == pytest.approx(84381.448, abs=1e-6)
+    assert pole[0] == 0.0 and pole[1] < 0
+
+def test_in_place_rotation_over_chunks_matches_a_copy():
+    positions = _positions(1)
+    expected = rotate(positions, plane_rotation(unity_axes=True))
+    rotate(positions, plane_rotation(unity_axes=True), out=positions, chunk_rows=37)
+    np.testing.assert_array_equal(positions, expected)
+
+def test_center_on_the_sun_is_a_subtraction(synthetic_folder):
+    dataset = PlanetDataset(synthetic_folder)
+    bodies, jd, helio = dataset_frame(dataset, ['199', '399', '699'], center='10')
+    sun = dataset['10'].positions
+    for body_id, positions in zip(bodies, helio):
+        np.testing.assert_array_equal(positions, dataset[body_id].positions - sun)
+    np.testing.assert_array_equal(jd, dataset['10'].jd)
+
+    _, _, ecliptic = dataset_frame(dataset, ['399'], center='10', plane=ECLIPTIC)
+    np.testing.assert_allclose(ecliptic[0], (dataset['399'].positions - sun) @ plane_rotation(unity_axes=True).T)
+
+def test_ref_plane_accepts_horizons_values():
+    assert ref_plane("'F'") == ref_plane('frame') == EQUATORIAL
+    assert ref_plane('E') == ref_plane("'ECLIPTIC'") == ECLIPTIC
+    with pytest.raises(ValueError):
+        ref_plane('B')
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from sagan.kepler import kepler_equation, solve_kepler, solve_kepler_batch
+
+# Eccentricities on both sides of 0.8, where the starting guess switches to
+# Danby's, and mean anomalies over several turns, negative ones included
+E_GRID = np.linspace(0, 0.99, 34, endpoint=False)
+M_GRID = np.linspace(-7, 13, 81)
+
+def test_batch_matches_scalar_newton():
+    M, e = np.meshgrid(M_GRID, E_GRID)
+    E = solve_kepler_batch(M, e, tol=1e-10)
+    expected = np.vectorize(solve_kepler)(M, e, tol=1e-10)
+    assert E.shape == M.shape
+    assert np.any(e >= 0.8)
+    np.testing.assert_allclose(E, expected, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(kepler_equation(E, M, e), 0, atol=1e-12)
+
+def test_scalar_input_gives_a_scalar():
+    assert np.ndim(solve_kepler_batch(1.0, 0.5)) == 0
+
+def test_non_convergence_warns():
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        solve_kepler_batch(M_GRID, 0.95, max_iter=1)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from sagan.parse import END_MARKER, START_MARKER, parse_vector_stream, parse_vector_text
+from sagan.stubserver import synthetic_state, vector_table_records
+
+JD = 2451545.0 + np.arange(200) * 0.5
+
+# The stub prints 16 significant digits, so the parse is exact to ~1e-15
+def _check(table, obj_id):
+    pos, vel = synthetic_state(obj_id, JD)
+    np.testing.assert_allclose(table.jd, JD, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(table.pos, pos, rtol=1e-14)
+    np.testing.assert_allclose(table.vel, vel, rtol=1e-14)
+
+@pytest.mark.parametrize('obj_id', ['10', '399', '499'])
+def test_vector_text_round_trip(obj_id):
+    _check(parse_vector_text(vector_table_records(obj_id, JD)), obj_id)
+
+# Chunk sizes that cut records in every place: mid-number, mid-label,
+# between rows and inside the markers
+@pytest.mark.parametrize('size', [1, 7, 64, 1000, 1 << 20])
+def test_vector_stream_round_trip(size):
+    data = b"header\n" + START_MARKER + b"\n" + vector_table_records('399', JD).encode() + b"\n" + END_MARKER + b"\nfooter"
+    chunks = [data[start:start + size] for start in range(0, len(data), size)]
+    _check(parse_vector_stream(chunks), '399')
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from sagan.dataset import PlanetDataset
+from sagan.planetdata import SCALE_SPACE
+from sagan.pyramid import SUN_ID, build_pyramids, load_pyramids, save_pyramids
+
+# Distance from the Sun in km at every raw row, straight from the tracks
+def _raw_distance(dataset, body_id):
+    positions = dataset[body_id].positions
+    if body_id != SUN_ID:
+        positions = positions - dataset[SUN_ID].positions
+    return np.linalg.norm(positions, axis=1) * SCALE_SPACE
+
+@pytest.fixture(scope='module')
+def dataset(synthetic_folder):
+    return PlanetDataset(synthetic_folder)
+
+@pytest.mark.parametrize('factor', [2, 8, 10])
+def test_levels_match_direct_reductions(dataset, factor):
+    pyramids = build_pyramids(dataset, factor)
+    assert set(pyramids) == set(dataset.bodies)
+    for body_id, pyramid in pyramids.items():
+        track = dataset[body_id]
+        distance = _raw_distance(dataset, body_id)
+        assert len(pyramid.levels[-1].jd) <= factor
+        for k, level in enumerate(pyramid.levels):
+            block = factor ** k
+            starts = np.arange(0, len(distance), block)
+            assert len(level.jd) == len(starts)
+            np.testing.assert_array_equal(level.jd, track.jd[starts])
+            np.testing.assert_array_equal(level.positions, track.positions[starts].astype(np.float32))
+            for i, start in enumerate(starts):
+                rows = distance[start:start + block]
+                assert level.count[i] == len(rows)
+                assert level.min[i] == rows.min() and level.max[i] == rows.max()
+                assert level.mean[i] == pytest.approx(rows.mean(), rel=1e-12)
+
+def test_stats_match_direct_reductions(dataset):
+    pyramid = build_pyramids(dataset)['399']
+    jd, distance = dataset['399'].jd, _raw_distance(dataset, '399')
+    rng = np.random.default_rng(0)
+    for first, last in [(0, len(jd) - 1), (5, 5), (7, 8)] + [tuple(sorted(rng.integers(len(jd), size=2)))
+                                                              for _ in range(50)]:
+        low, high, mean = pyramid.stats(jd[first], jd[last])
+        rows = distance[first:last + 1]
+        assert (low, high) == (rows.min(), rows.max())
+        assert mean == pytest.approx(rows.mean(), rel=1e-12)
+    assert np.isnan(pyramid.stats(jd[-1] + 10, jd[-1] + 20)).all()
+
+def test_save_and_load_round_trip(dataset, tmp_path):
+    pyramids = build_pyramids(dataset)
+    save_pyramids(str(tmp_path / 'pyramid.npz'), pyramids)
+    loaded = load_pyramids(str(tmp_path / 'pyramid.npz'), dataset)
+    for body_id, pyramid in pyramids.items():
+        for level, loaded_level in zip(pyramid.levels, loaded[body_id].levels, strict=True):
+            # Level 0 comes back from the dataset in float64, not float32
+            for field, value in level._asdict().items():
+                np.testing.assert_allclose(getattr(loaded_level, field), value, rtol=1e-7)
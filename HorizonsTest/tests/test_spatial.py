@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from sagan.spatial import SpatialIndex, frustum_planes
+
+# Clusters of very different density plus a sparse background, so queries
+# run at several octree levels
+def _points(seed=0, n=3000):
+    rng = np.random.default_rng(seed)
+    clusters = [rng.normal(centre, spread, (n // 4, 3))
+                for centre, spread in (((0, 0, 0), 0.01), ((5, -3, 1), 0.5), ((-20, 10, 4), 3.0))]
+    return np.concatenate(clusters + [rng.uniform(-50, 50, (n - 3 * (n // 4), 3))])
+
+def _queries(points, seed=1, count=60):
+    rng = np.random.default_rng(seed)
+    near = points[rng.integers(len(points), size=count // 2)] + rng.normal(0, 0.1, (count // 2, 3))
+    return np.concatenate([near, rng.uniform(-60, 60, (count - count // 2, 3))])
+
+# Hits of every query as sets, from CSR offsets and ids
+def _sets(offsets, ids):
+    return [set(ids[offsets[i]:offsets[i + 1]].tolist()) for i in range(len(offsets) - 1)]
+
+@pytest.fixture(scope='module')
+def points():
+    return _points()
+
+@pytest.fixture(scope='module')
+def index(points):
+    return SpatialIndex(points)
+
+def test_radius_matches_brute_force(index, points):
+    centres = _queries(points)
+    r = np.random.default_rng(2).uniform(0.01, 15, len(centres))
+    distance = np.linalg.norm(points[None] - centres[:, None], axis=2)
+    offsets, ids, found = index.radius(centres, r, sort=True, return_distance=True)
+    assert _sets(offsets, ids) == [set(np.flatnonzero(row <= radius).tolist()) for row, radius in zip(distance, r)]
+    for i in range(len(centres)):
+        hits = slice(offsets[i], offsets[i + 1])
+        np.testing.assert_allclose(found[hits], distance[i, ids[hits]])
+        assert np.all(np.diff(found[hits]) >= 0)
+
+def test_knn_matches_brute_force(index, points):
+    centres = _queries(points)
+    distance = np.linalg.norm(points[None] - centres[:, None], axis=2)
+    for k in (1, 8, 40):
+        ids, found = index.knn(centres, k)
+        np.testing.assert_allclose(found, np.sort(distance, axis=1)[:, :k])
+        np.testing.assert_allclose(np.take_along_axis(distance, ids, axis=1), found)
+
+def test_box_matches_brute_force(index, points):
+    rng = np.random.default_rng(3)
+    low = _queries(points) - rng.uniform(0, 10, (60, 3))
+    high = low + rng.uniform(0, 20, (60, 3))
+    offsets, ids = index.box(low, high)
+    inside = np.all((points[None] >= low[:, None]) & (points[None] <= high[:, None]), axis=2)
+    assert _sets(offsets, ids) == [set(np.flatnonzero(row).tolist()) for row in inside]
+
+def test_frustum_matches_brute_force(index, points):
+    rng = np.random.default_rng(4)
+    planes = np.stack([frustum_planes(rng.uniform(-80, 80, 3), target, fov_deg=rng.uniform(10, 90),
+                                      near=1.0, far=rng.uniform(20, 200))
+                       for target in _queries(points, count=20)])
+    offsets, ids = index.frustum(planes)
+    inside = np.all(np.einsum('pk,qfk->qpf', points, planes[..., :3]) + planes[:, None, :, 3] >= 0, axis=2)
+    assert _sets(offsets, ids) == [set(np.flatnonzero(row).tolist()) for row in inside]
+    assert any(offsets[1:] - offsets[:-1])
+
+def test_refit_matches_a_fresh_index(points):
+    index = SpatialIndex(points)
+    moved = points + np.random.default_rng(5).normal(0, 0.5, points.shape)
+    index.refit(moved)
+    fresh = SpatialIndex(moved, cell_size=index.cell_size)
+    centres = _queries(moved)
+    assert _sets(*index.radius(centres, 2.0)) == _sets(*fresh.radius(centres, 2.0))
+    np.testing.assert_allclose(index.knn(centres, 5)[1], fresh.knn(centres, 5)[1])
+    with pytest.raises(ValueError):
+        index.refit(moved[:10])
+
+def test_empty_queries(index, points):
+    far = np.full((2, 3), 1e6)
+    offsets, ids = index.radius(far, 1.0)
+    assert offsets.tolist() == [0, 0, 0] and len(ids) == 0
+    offsets, ids = index.box(far, far + 1)
+    assert offsets.tolist() == [0, 0, 0] and len(ids) == 0
+    offsets, ids = index.radius(np.empty((0, 3)), 1.0)
+    assert offsets.tolist() == [0] and len(ids) == 0
+
+    small = SpatialIndex(points[:3], ids=np.array(['a', 'b', 'c']))
+    ids, distance = small.knn(points[:1], 5)
+    assert ids[0, 0] == 'a' and np.isinf(distance[0, 3:]).all()
+    ids, distance = SpatialIndex(points[:3]).knn(points[:1], 5)
+    assert ids[0, 3:].tolist() == [-1, -1]